@@ -0,0 +1,127 @@
+"""
+End-to-end ingestion benchmark against the local FMP stand-in (src/mock_fmp.py).
+
+Runs constituents, prices and every fundamentals import into a scratch DATA_DIR/DB_DIR
+and reports, per stage: seconds, requests/sec, rows/sec, bytes written and peak RSS.
+Each stage runs in a fresh process, so its peak RSS is its own. A second (warm) pass
+measures the incremental path. Nothing touches the real store.
+"""
+import argparse, json, multiprocessing as mp, os, queue, sys, tempfile, time, urllib.request
+from pathlib import Path
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+def _peak_rss_mb() -> float | None:
+    if resource is None:
+        return None
+    kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(kb / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+def _dir_bytes(path: Path) -> int:
+    return sum(p.stat().st_size for p in path.rglob("*.parquet"))
+
+def _server_stats(base_url: str) -> dict:
+    with urllib.request.urlopen(f"{base_url}/__stats") as r:
+        return json.load(r)
+
+def _run_stage(name: str, out: mp.Queue):
+    # a fresh (spawned) process per stage: ru_maxrss is a lifetime peak, so sharing one
+    # process would report the largest earlier stage for every later one
+    from src import metrics, storage
+    from src.import_fundamentals import fundamentals_task
+    from src.import_prices import import_prices
+    from src.import_symbols import fetch_sp500_constituents
+    from src.scheduler import run_tasks
+
+    t0 = time.perf_counter()
+    if name == "constituents":
+        res = {"rows_added": len(fetch_sp500_constituents())}
+        storage.ensure_db()
+    elif name == "prices":
+        res = import_prices()
+    else:
+        res = run_tasks([fundamentals_task(name)], desc=name)[name]
+    out.put({"seconds": time.perf_counter() - t0, "rows": res.get("rows_added", 0) + res.get("rows_written", 0),
+             "peak_rss_mb": _peak_rss_mb(), "stages": metrics.report("bench")["stages"]})
+
+def _stage_result(proc, out) -> dict:
+    while True:
+        try:
+            res = out.get(timeout=1.0)
+        except queue.Empty:
+            if not proc.is_alive():
+                raise RuntimeError(f"benchmark stage process exited with code {proc.exitcode}")
+            continue
+        proc.join()
+        return res
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--symbols", type=int, default=100)
+    ap.add_argument("--years", type=int, default=5)
+    ap.add_argument("--periods", type=int, default=5)
+    ap.add_argument("--latency-ms", type=float, default=20.0)
+    ap.add_argument("--rate-429", type=float, default=0.0)
+    ap.add_argument("--rpm", type=int, default=60000, help="REQUESTS_PER_MINUTE for the run")
+    ap.add_argument("--engine", choices=["threads", "async"], default="threads")
+    ap.add_argument("--no-warm", action="store_true", help="skip the second, incremental pass")
+    ap.add_argument("--out", type=Path, help="also write the results as JSON")
+    args = ap.parse_args()
+
+    from src.mock_fmp import serve
+    ports = mp.Queue()
+    server = mp.Process(target=serve, args=(ports,), daemon=True, kwargs=dict(
+        n_symbols=args.symbols, years=args.years, periods=args.periods,
+        latency=args.latency_ms / 1000, rate_429=args.rate_429, retry_after=0.5))
+    server.start()
+    base_url = f"http://127.0.0.1:{ports.get(timeout=30)}"
+
+    scratch = Path(tempfile.mkdtemp(prefix="fmp-bench-"))
+    # config reads these at import, so set them before importing anything from src that needs it
+    os.environ.update(DATA_DIR=str(scratch / "data"), DB_DIR=str(scratch / "db"), FMP_BASE_URL=base_url,
+                      API_KEY=os.environ.get("API_KEY") or "bench", REQUESTS_PER_MINUTE=str(args.rpm),
+                      HTTP_ENGINE=args.engine, RATE_LIMIT_FILE="")
+
+    from src import config, storage  # stage processes inherit the environment set above
+    from src.import_fundamentals import FUNDAMENTALS
+
+    stages = ["constituents", "prices", *FUNDAMENTALS]
+    passes = ["cold"] if args.no_warm else ["cold", "warm"]
+    spawn = mp.get_context("spawn")
+
+    results, stage_metrics = [], []
+    try:
+        for pass_name in passes:
+            for name in stages:
+                if pass_name == "warm" and name == "constituents":
+                    continue
+                before_req, before_bytes = _server_stats(base_url)["requests"], _dir_bytes(config.PARQUET_DIR)
+                out = spawn.Queue()
+                proc = spawn.Process(target=_run_stage, args=(name, out))
+                proc.start()
+                res = _stage_result(proc, out)
+                secs, rows = res["seconds"], res["rows"]
+                reqs = _server_stats(base_url)["requests"] - before_req
+                results.append({"pass": pass_name, "stage": name, "seconds": round(secs, 3), "requests": reqs,
+                                "req_per_s": round(reqs / secs, 1), "rows": rows, "rows_per_s": round(rows / secs, 1),
+                                "bytes_written": _dir_bytes(config.PARQUET_DIR) - before_bytes,
+                                "peak_rss_mb": res["peak_rss_mb"]})
+                stage_metrics += [{"pass": pass_name, **m} for m in res["stages"]]
+            storage.ensure_db()
+    finally:
+        server.terminate()
+
+    print(f"\n{'pass':<5} {'stage':<17} {'secs':>8} {'req/s':>8} {'rows/s':>10} {'bytes':>12} {'rss MB':>7}")
+    for r in results:
+        print(f"{r['pass']:<5} {r['stage']:<17} {r['seconds']:>8.2f} {r['req_per_s']:>8.1f} {r['rows_per_s']:>10.1f} "
+              f"{r['bytes_written']:>12,} {r['peak_rss_mb'] or '-':>7}")
+    print(f"\nscratch store: {scratch}")
+    if args.out:
+        args.out.write_text(json.dumps({"args": {k: str(v) for k, v in vars(args).items()}, "results": results,
+                                         "stages": stage_metrics}, indent=2))
+
+if __name__ == "__main__":
+    main()
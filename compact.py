@@ -0,0 +1,22 @@
+import argparse, logging
+from src import config, storage, versions
+from src.datasets import DATASETS
+from src.merge_parquet import compact_dir
+from src.schemas import SCHEMAS
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+log = logging.getLogger("compact")
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Merge delta segments into the per-symbol base files")
+    ap.add_argument("--dataset", action="append", choices=sorted(DATASETS), help="dataset to compact (repeatable; default all)")
+    ap.add_argument("--min-bytes", type=int, default=0, help="only compact symbols with at least this many pending delta bytes")
+    args = ap.parse_args()
+
+    for name in args.dataset or list(DATASETS):
+        ds = DATASETS[name]
+        res = compact_dir(ds.dir, list(ds.key_cols), min_bytes=args.min_bytes, schema=SCHEMAS.get(name))
+        log.info("%s: %s", name, res)
+        if res["segments_merged"]:
+            versions.bump(name)
+    storage.ensure_db()
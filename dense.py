@@ -0,0 +1,12 @@
+import argparse, logging
+from src.dense_panel import update_dense_panel
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+log = logging.getLogger("dense")
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Rebuild the memory-mapped (date x symbol) price panel")
+    ap.parse_args()
+
+    res = update_dense_panel(None)  # import_prices appends new days incrementally
+    log.info("%s", res)
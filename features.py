@@ -0,0 +1,14 @@
+import argparse, logging
+from src import storage
+from src.price_features import update_price_features
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+log = logging.getLogger("features")
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Rebuild v_price_features (returns, volatility, moving averages, drawdowns)")
+    ap.parse_args()
+
+    res = update_price_features(None)  # import_prices keeps it current incrementally
+    log.info("%s", res)
+    storage.ensure_db()
@@ -1,15 +1,21 @@
-import logging
-from src import storage
+import argparse, logging
+from src import config, metrics, storage
 from src.import_fundamentals import (
     import_balance_sheet, import_income_statement,
     import_key_metrics, import_ratios, import_revenue_segments
 )
+from src.journal import RunJournal
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
 log = logging.getLogger("fundamentals")
 
 if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Incremental fundamentals import")
+    ap.add_argument("--resume", action="store_true", help="skip jobs a crashed run already committed")
+    args = ap.parse_args()
+
     storage.ensure_db()
+    journal = RunJournal("fundamentals", resume=args.resume)
     for fn in [
         import_balance_sheet,
         import_income_statement,
@@ -17,6 +23,12 @@ if __name__ == "__main__":
         import_ratios,
         import_revenue_segments,
     ]:
-        res = fn()
+        res = fn(journal=journal)
         log.info("%s", res)
         storage.ensure_db()
+    if config.PIT_PANEL:
+        from src.pit_panel import update_pit_panel
+        update_pit_panel()  # apply new filings from their filing date on
+        storage.ensure_db()
+    journal.finish()
+    log.info("Run report: %s", metrics.finish_run("fundamentals"))
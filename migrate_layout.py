@@ -0,0 +1,20 @@
+import argparse, logging
+from src import storage, versions
+from src.datasets import DATASETS
+from src.partitioned import migrate_to_partitioned, migrate_to_symbol_files
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+log = logging.getLogger("migrate_layout")
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Convert datasets between per-symbol files and year partitions")
+    ap.add_argument("--dataset", action="append", choices=sorted(DATASETS), help="dataset to convert (repeatable; default all)")
+    ap.add_argument("--to", choices=["partitioned", "symbol"], default="partitioned", help="target layout")
+    args = ap.parse_args()
+
+    migrate = migrate_to_partitioned if args.to == "partitioned" else migrate_to_symbol_files
+    for name in args.dataset or list(DATASETS):
+        res = migrate(DATASETS[name])
+        log.info("%s", res)
+        versions.bump(name)
+    storage.ensure_db()
@@ -0,0 +1,15 @@
+import argparse, logging
+from src import storage
+from src.pit_panel import update_pit_panel
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+log = logging.getLogger("pit")
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Update the daily point-in-time panel (v_pit_panel)")
+    ap.add_argument("--full", action="store_true", help="rebuild every symbol instead of only the changed tail")
+    args = ap.parse_args()
+
+    res = update_pit_panel(full=args.full)
+    log.info("%s", res)
+    storage.ensure_db()
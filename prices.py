@@ -1,12 +1,21 @@
-import logging
-from src import storage
+import argparse, logging
+from src import metrics, storage
 from src.import_prices import import_prices
+from src.journal import RunJournal
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
 log = logging.getLogger("prices")
 
 if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Incremental dividend-adjusted price import")
+    ap.add_argument("--full", action="store_true", help="re-fetch full history (backfill) instead of the watermark window")
+    ap.add_argument("--resume", action="store_true", help="skip jobs a crashed run already committed")
+    args = ap.parse_args()
+
     storage.ensure_db()  # ensure v_sp500_constituents exists
-    res = import_prices()
+    journal = RunJournal("prices", resume=args.resume)
+    res = import_prices(full=args.full, journal=journal)
     log.info("Prices import summary: %s", res)
     storage.ensure_db()
+    journal.finish()
+    log.info("Run report: %s", metrics.finish_run("prices"))
@@ -0,0 +1,24 @@
+import argparse, logging, signal
+from src import config
+from src.query_server import QueryServer
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+log = logging.getLogger("query_server")
+
+def _stop(*_):
+    raise KeyboardInterrupt
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Serve read-only queries over a Unix socket from one warm DuckDB connection")
+    ap.add_argument("--socket", default=str(config.QUERY_SOCKET), help="socket path (default QUERY_SOCKET)")
+    args = ap.parse_args()
+
+    server = QueryServer(args.socket)
+    signal.signal(signal.SIGTERM, _stop)
+    log.info("Listening on %s", server.path)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
@@ -0,0 +1,23 @@
+import argparse, logging
+from src import metrics, storage
+from src.journal import RunJournal
+from src.refresh import ALL_DATASETS, refresh
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+log = logging.getLogger("refresh")
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Refresh prices and fundamentals under one request budget")
+    ap.add_argument("--dataset", action="append", choices=ALL_DATASETS, help="dataset to refresh (repeatable; default all)")
+    ap.add_argument("--full-prices", action="store_true", help="re-fetch full price history (backfill)")
+    ap.add_argument("--materialize", action="store_true", help="also refresh the native t_<dataset> tables")
+    ap.add_argument("--resume", action="store_true", help="skip jobs a crashed run already committed")
+    args = ap.parse_args()
+
+    storage.ensure_db()  # ensure v_sp500_constituents exists
+    journal = RunJournal("refresh", resume=args.resume)
+    for res in refresh(args.dataset, full_prices=args.full_prices, journal=journal):
+        log.info("%s", res)
+    storage.ensure_db(materialize=args.materialize or None)
+    journal.finish()
+    log.info("Run report: %s", metrics.finish_run("refresh"))
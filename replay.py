@@ -0,0 +1,16 @@
+import argparse, logging
+from src import metrics, storage
+from src.import_fundamentals import FUNDAMENTALS, replay_fundamentals
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+log = logging.getLogger("replay")
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Rebuild fundamentals Parquet files from cached responses (offline)")
+    ap.add_argument("--dataset", action="append", choices=FUNDAMENTALS, help="dataset to replay (repeatable; default all)")
+    args = ap.parse_args()
+
+    for res in replay_fundamentals(args.dataset):
+        log.info("%s", res)
+    storage.ensure_db()
+    log.info("Run report: %s", metrics.finish_run("replay"))
@@ -0,0 +1,20 @@
+import argparse, logging
+from src import storage, versions
+from src.datasets import DATASETS
+from src.merge_parquet import rewrite_dir
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+log = logging.getLogger("rewrite")
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Rewrite existing Parquet files with their dataset's writer profile")
+    ap.add_argument("--dataset", action="append", choices=sorted(DATASETS), help="dataset to rewrite (repeatable; default all)")
+    ap.add_argument("--force", action="store_true", help="also rewrite files that already match the profile")
+    args = ap.parse_args()
+
+    for name in args.dataset or list(DATASETS):
+        res = rewrite_dir(DATASETS[name].dir, force=args.force)
+        log.info("%s: %s", name, res)
+        if res["rewritten"]:
+            versions.bump(name)
+    storage.ensure_db()
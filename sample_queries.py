@@ -1,29 +1,53 @@
 # sample_queries.py
-import duckdb
-from src import config
+from src import manifest
+from src.datasets import DATASETS
+from src.query_client import QueryClient, available
 
-con = duckdb.connect(config.DB_FILE.as_posix(), read_only=True)
+if available():  # a running query_server.py answers from its warm connection
+    query = QueryClient()
+else:
+    from src import query
+
+view_exists = query.exists
+
+BY_VIEW = {ds.view: ds for ds in DATASETS.values()}
 
-def view_exists(view_name: str) -> bool:
-    row = con.execute(
-        "SELECT COUNT(*) FROM information_schema.views WHERE table_name = ?",
-        [view_name]
-    ).fetchone()
-    return bool(row and row[0] > 0)
+def manifest_for(view: str):
+    # metadata-only answers when the dataset's manifest is exact (no pending delta segments)
+    ds = BY_VIEW.get(view)
+    if ds is None:
+        return None
+    m = manifest.load(ds.dir)
+    return m if m.files and m.exact else None
 
 def print_count(label: str, view: str):
     if not view_exists(view):
         print(f"{label}: view {view} not found (run the importer first).")
         return
-    n = con.execute(f"SELECT COUNT(*) AS n FROM {view}").fetchone()[0]
+    if (m := manifest_for(view)) is not None:
+        print(f"{label}: {m.row_count():,} rows")
+        return
+    n = query.sql(f"SELECT COUNT(*) AS n FROM {view}")["n"][0].as_py()
     print(f"{label}: {n:,} rows")
 
 def print_date_range(label: str, view: str, date_col: str = "date"):
     if not view_exists(view):
         print(f"{label} range: view {view} not found.")
         return
+    if (m := manifest_for(view)) is not None and date_col == "date":
+        row = m.summary()
+        if not row["total_rows"]:
+            print(f"{label} range: (no rows)")
+            return
+        print(
+            f"{label} range: "
+            f"min={row['min_date'].date()} (symbol={row['min_symbol']}), "
+            f"max={row['max_date'].date()} (symbol={row['max_symbol']}); "
+            f"rows={row['total_rows']:,}, symbols={row['distinct_symbols']:,}"
+        )
+        return
     # Guard: if the view exists but has no rows, skip
-    empty = con.execute(f"SELECT COUNT(*)=0 FROM {view}").fetchone()[0]
+    empty = query.sql(f"SELECT COUNT(*) = 0 AS empty FROM {view}")["empty"][0].as_py()
     if empty:
         print(f"{label} range: (no rows)")
         return
@@ -38,7 +62,7 @@ def print_date_range(label: str, view: str, date_col: str = "date"):
           COUNT(DISTINCT symbol) AS distinct_symbols
         FROM {view}
     """
-    df = con.execute(q).fetchdf()
+    df = query.sql(q).to_pandas()
     row = df.iloc[0]
     print(
         f"{label} range: "
@@ -58,19 +82,19 @@ print_count("Revenue segments", "v_revenue_segments")
 
 print("\n-- Latest ROIC top 10 (key metrics) --")
 if view_exists("v_key_metrics"):
-    print(con.execute("""
+    print(query.sql("""
         SELECT symbol, date, returnOnInvestedCapital
         FROM v_key_metrics
         QUALIFY row_number() OVER (PARTITION BY symbol ORDER BY date DESC) = 1
         ORDER BY returnOnInvestedCapital DESC NULLS LAST
         LIMIT 10
-    """).fetchdf())
+    """).to_pandas())
 else:
     print("v_key_metrics not found (run fundamentals.py).")
 
 print("\n-- Segment mix (most recent per symbol) --")
 if view_exists("v_revenue_segments"):
-    print(con.execute("""
+    print(query.sql("""
         WITH latest AS (
           SELECT symbol, max(date) AS max_date FROM v_revenue_segments GROUP BY 1
         )
@@ -79,7 +103,7 @@ if view_exists("v_revenue_segments"):
         FROM v_revenue_segments r
         JOIN latest l ON r.symbol = l.symbol AND r.date = l.max_date
         ORDER BY r.symbol, segment_share DESC
-    """).fetchdf())
+    """).to_pandas())
 else:
     print("v_revenue_segments not found (run fundamentals.py).")
 
@@ -0,0 +1,113 @@
+from __future__ import annotations
+import asyncio, json, logging, time
+from datetime import date
+
+from . import config, metrics
+from .fmp_http import retry_after_seconds
+from .rate_limit import TokenBucketLimiter, shared_limiter
+from .schemas import parse_payload
+
+try:  # optional dependency, only needed for HTTP_ENGINE=async
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+log = logging.getLogger(__name__)
+
+class AsyncFMPClient:
+    """
+    asyncio counterpart of PricesClient + FundamentalsClient: one bounded keep-alive
+    connection pool (gzip on), rate-limit waits and retry backoff as awaitable sleeps,
+    so thousands of requests can be in flight without holding threads.
+    Use as `async with AsyncFMPClient() as client: ...`.
+    """
+    def __init__(self, limiter: TokenBucketLimiter | None = None,
+                 max_connections: int = config.ASYNC_MAX_CONNECTIONS, attempts: int = 5):
+        if aiohttp is None:
+            raise RuntimeError("HTTP_ENGINE=async needs aiohttp (pip install aiohttp)")
+        self.limiter = limiter or shared_limiter()
+        self.api_key = config.API_KEY  # raises now, not once per request, when it is missing
+        self.max_connections = max_connections
+        self.attempts = attempts
+        self.session: aiohttp.ClientSession | None = None
+
+    async def __aenter__(self) -> AsyncFMPClient:
+        connector = aiohttp.TCPConnector(limit=self.max_connections, ttl_dns_cache=300, keepalive_timeout=60)
+        self.session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=30),
+            headers={"Accept-Encoding": "gzip, deflate"},
+        )
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.session.close()
+
+    async def get_raw(self, url: str, params: dict, label: str) -> bytes | None:
+        """Same contract as fmp_http.get_raw: response body, or None on final failure."""
+        for attempt in range(self.attempts):
+            wait = self.limiter.reserve()
+            metrics.observe("rate_limit_wait", max(0.0, wait))
+            if wait > 0:
+                await asyncio.sleep(wait)
+            if attempt:
+                metrics.count("http_retries")
+            t0 = time.perf_counter()
+            try:
+                async with self.session.get(url, params=params) as r:
+                    if r.status == 200:
+                        self.limiter.reward()
+                        body = await r.read()
+                        metrics.observe("http", time.perf_counter() - t0, nbytes=len(body))
+                        return body
+                    metrics.observe("http", time.perf_counter() - t0)
+                    if r.status == 429:
+                        metrics.count("http_429")
+                        self.limiter.penalize(retry_after_seconds(r.headers.get("Retry-After")))
+                    elif r.status in (503, 504):
+                        metrics.count(f"http_{r.status}")
+                        await asyncio.sleep(retry_after_seconds(r.headers.get("Retry-After")) or 2 ** attempt)
+                    else:
+                        metrics.count("http_failed")
+                        log.error("HTTP %s for %s: %s", r.status, label, (await r.text())[:200])
+                        return None
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                metrics.count("http_errors")
+                log.warning("Request error %s (try %d): %s", label, attempt+1, e)
+                await asyncio.sleep(2 ** attempt)
+        metrics.count("http_failed")
+        return None
+
+    async def get_json(self, url: str, params: dict, label: str):
+        raw = await self.get_raw(url, params, label)
+        return json.loads(raw) if raw else None
+
+    async def historical_divadj_raw(self, symbol: str, start: date | None = None, end: date | None = None) -> bytes:
+        params = {"symbol": symbol, "apikey": self.api_key}
+        if start is not None:
+            params["from"] = start.isoformat()
+        if end is not None:
+            params["to"] = end.isoformat()
+        return await self.get_raw(config.FMP_PRICES_URL, params, symbol) or b""
+
+    async def historical_divadj(self, symbol: str, start: date | None = None, end: date | None = None) -> list[dict]:
+        raw = await self.historical_divadj_raw(symbol, start, end)
+        data = json.loads(raw) if raw else []
+        return data if isinstance(data, list) else []
+
+    async def get_symbol_raw(self, base_url: str, symbol: str) -> bytes:
+        return await self.get_raw(base_url, {"symbol": symbol, "apikey": self.api_key}, symbol) or b""
+
+    async def _get(self, base_url: str, symbol: str) -> list[dict]:
+        return parse_payload(await self.get_symbol_raw(base_url, symbol))
+
+    async def balance_sheet(self, symbol: str):
+        return await self._get(config.FMP_BALANCE_SHEET_URL, symbol)
+    async def income_statement(self, symbol: str):
+        return await self._get(config.FMP_INCOME_STATEMENT_URL, symbol)
+    async def key_metrics(self, symbol: str):
+        return await self._get(config.FMP_KEY_METRICS_URL, symbol)
+    async def ratios(self, symbol: str):
+        return await self._get(config.FMP_RATIOS_URL, symbol)
+    async def revenue_segments(self, symbol: str):
+        return await self._get(config.FMP_REVENUE_SEGMENTS_URL, symbol)
@@ -0,0 +1,142 @@
+from __future__ import annotations
+import io, logging
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+import duckdb, numpy as np, pandas as pd
+import pyarrow as pa
+
+from . import config, metrics, storage
+from .datasets import DATASETS
+from .schemas import I64, SCHEMAS, parse_payload
+
+log = logging.getLogger(__name__)
+
+# Daily price updates from FMP's bulk EOD file: one request per trading day returns every
+# symbol, instead of one history request per symbol. The days fetched start at the oldest
+# watermark in the batch, so each symbol's own watermark day doubles as the overlap check
+# for dividend-adjustment drift (see import_prices._reconcile). Symbols the bulk files
+# cannot serve cleanly stay on the per-symbol path:
+#   - no watermark or a stale one (entrants, backfills, long outages)
+#   - missing from a published day, or missing their watermark row (gaps)
+#   - adjClose moved on the watermark day (full history re-fetch)
+
+@dataclass
+class BatchResult:
+    routed: dict[str, pd.DataFrame | bytes] = field(default_factory=dict)  # symbol -> rows after its watermark
+    refetch: set[str] = field(default_factory=set)                         # adjustment drift: full history
+    requests: int = 0
+
+def plan_days(marks, symbols: list[str], today: date | None = None) -> tuple[dict[str, date], list[date]]:
+    """(symbol -> watermark for the symbols the bulk files can serve, trading days to request)."""
+    today = today or date.today()
+    cutoff = today - timedelta(days=config.PRICE_BATCH_MAX_DAYS)
+    batched = {s: wm for s in symbols if (wm := marks.get(s)) is not None and cutoff <= wm < today}
+    if not batched:
+        return {}, []
+    start = min(batched.values())
+    days = [d for d in (start + timedelta(days=i) for i in range((today - start).days + 1)) if d.weekday() < 5]
+    if not any(d > start for d in days):
+        return {}, []  # only a weekend since the watermark
+    return batched, days
+
+def bulk_frame(raw: bytes | None) -> pd.DataFrame:
+    """One bulk EOD response (FMP's CSV, or a JSON list) as prices-schema rows."""
+    schema = SCHEMAS["prices"]
+    body = (raw or b"").strip()
+    if not body or body == b"[]":
+        return schema.empty_table().to_pandas(types_mapper={I64: pd.Int64Dtype()}.get)
+    if body[:1] in (b"[", b"{"):
+        df = pd.DataFrame(parse_payload(body))
+    else:
+        df = pd.read_csv(io.BytesIO(body), dtype={"symbol": str})
+    if "adjClose" in df and "close" in df:
+        # the bulk file has raw open/high/low; scale them by the day's adjustment factor
+        factor = df["adjClose"] / df["close"].where(df["close"] != 0)
+        for col in ("open", "high", "low"):
+            adj = "adj" + col.capitalize()
+            if adj not in df and col in df:
+                df[adj] = df[col] * factor
+    df = df.reindex(columns=schema.names)
+    df["date"] = pd.to_datetime(df["date"], errors="coerce")
+    for f in schema:
+        if f.name not in ("symbol", "date"):
+            df[f.name] = pd.to_numeric(df[f.name], errors="coerce")
+    df["volume"] = df["volume"].round().astype("Int64")
+    table = pa.Table.from_pandas(df.dropna(subset=["symbol", "date"]), schema=schema, preserve_index=False)
+    return table.to_pandas(types_mapper={I64: pd.Int64Dtype()}.get)
+
+def _stored_at(batched: dict[str, date]) -> pd.DataFrame:
+    """Stored adjClose of each symbol on its watermark day: symbol, date, stored."""
+    ds = DATASETS["prices"]
+    wms = pd.DataFrame({"symbol": list(batched), "wm": pd.to_datetime(list(batched.values()))})
+    con = duckdb.connect()
+    try:
+        src = storage.pruned_source(ds, list(batched), min(batched.values()), max(batched.values()))
+        if ds.view in src:
+            storage._maybe_create_view_for_dir(con, ds.view, ds.dir, ds.key_cols)
+        con.register("wms", wms)
+        return con.execute(f"""
+            SELECT p.symbol, CAST(p.date AS TIMESTAMP) AS date, p.adjClose AS stored
+            FROM {src} p JOIN wms w ON p.symbol = w.symbol AND CAST(p.date AS DATE) = CAST(w.wm AS DATE)
+        """).fetchdf()
+    finally:
+        con.close()
+
+def split(bulk: pd.DataFrame, batched: dict[str, date], published: list[date]) -> BatchResult:
+    """
+    Route bulk rows to their symbols in one pass. published lists the days whose bulk
+    file had rows; a batched symbol missing from one of them after its watermark, or
+    from its own watermark day, is left out of the result (per-symbol fetch).
+    """
+    res = BatchResult()
+    wm = pd.Series(pd.to_datetime(list(batched.values())), index=list(batched))
+    rows = bulk[bulk["symbol"].isin(wm.index)]
+    rows = rows.assign(_wm=rows["symbol"].map(wm).to_numpy())
+    overlap = rows[rows["date"] == rows["_wm"]].merge(_stored_at(batched), on=["symbol", "date"])
+    # same tolerance as import_prices._reconcile
+    moved = (overlap["adjClose"] - overlap["stored"]).abs() > \
+        config.PRICE_DRIFT_TOLERANCE * overlap["stored"].abs() + 1e-4
+    res.refetch = set(overlap.loc[moved, "symbol"])
+    checked = set(overlap["symbol"]) - res.refetch
+
+    fresh = rows[rows["date"] > rows["_wm"]].drop(columns="_wm")
+    days = np.array(sorted(published), dtype="datetime64[D]")
+    expected = len(days) - np.searchsorted(days, wm.to_numpy().astype("datetime64[D]"), side="right")
+    got = fresh.groupby("symbol").size().reindex(wm.index, fill_value=0).to_numpy()
+    complete = set(wm.index[got == expected]) & checked
+    for sym, g in fresh[fresh["symbol"].isin(complete)].groupby("symbol", sort=False):
+        res.routed[sym] = g.sort_values("date").reset_index(drop=True)
+    for sym in complete - set(res.routed):
+        res.routed[sym] = b""  # nothing published after its watermark yet
+    return res
+
+def ingest(client, marks, symbols: list[str], today: date | None = None) -> BatchResult:
+    """
+    Fetch the bulk EOD files covering symbols' watermark windows and split them per symbol.
+    Returns an empty result (everything per-symbol) when batching would not save
+    requests or a bulk request fails, e.g. on plans without bulk access.
+    """
+    batched, days = plan_days(marks, symbols, today)
+    if not days or len(days) >= len(batched):
+        return BatchResult()
+    frames, published = [], []
+    for i, d in enumerate(days):
+        raw = client.eod_bulk_raw(d)
+        metrics.count("price_bulk_requests")
+        if raw is None:
+            log.warning("eod-bulk %s failed; falling back to per-symbol price fetches", d)
+            return BatchResult(requests=i + 1)
+        df = bulk_frame(raw)
+        if not df.empty:
+            frames.append(df)
+            published.append(d)
+    if not frames:
+        return BatchResult(requests=len(days))
+    res = split(pd.concat(frames, ignore_index=True), batched, published)
+    res.requests = len(days)
+    if res.refetch:
+        metrics.count("price_adjustment_drift", len(res.refetch))
+    log.info("EOD bulk: %d requests for %d symbols (%d routed, %d adjustment drift, %d per-symbol)",
+             len(days), len(batched), len(res.routed), len(res.refetch),
+             len(batched) - len(res.routed) - len(res.refetch))
+    return res
@@ -0,0 +1,157 @@
+from __future__ import annotations
+import json, logging, os, uuid
+from datetime import date, timedelta
+import duckdb
+
+from . import config, storage
+from .datasets import DATASETS
+from .membership import FetchPlan
+
+log = logging.getLogger(__name__)
+
+# Statements only change around a company's filings, so a fundamentals run fetches a
+# symbol only once its next filing is due: last filing + the median gap between its
+# past filings (DEFAULT_CADENCE_DAYS with fewer than two), opened FILING_WINDOW_DAYS
+# early and kept open until the new period shows up. Every FUNDAMENTALS_SWEEP_DAYS
+# a dataset is swept in full, which catches restatements and late revisions.
+# Symbols with nothing to schedule by (no stored rows, e.g. companies that never
+# report revenue segments, or a dataset still lagging its reference FILING_WINDOW_DAYS
+# after the reference filed) are retried once per DEFAULT_CADENCE_DAYS, counted from
+# their last attempt (STATE_DIR/fundamentals_attempts.json).
+
+DEFAULT_CADENCE_DAYS = 91
+_MIN_GAP_DAYS = 20  # amendments filed days apart would otherwise shrink the cadence
+
+def _view_exists(con: duckdb.DuckDBPyConnection, view: str) -> bool:
+    return con.execute("SELECT COUNT(*) FROM information_schema.views WHERE table_name = ?", [view]).fetchone()[0] > 0
+
+def _has_filing_date(con: duckdb.DuckDBPyConnection, view: str) -> bool:
+    return any(r[0] == "filingDate" for r in con.execute(f"DESCRIBE {view}").fetchall())
+
+def _filings_sql(con: duckdb.DuckDBPyConnection, view: str) -> str:
+    lag = f"date + INTERVAL {config.PIT_FILING_LAG_DAYS} DAY"
+    filed = f"coalesce(filingDate, {lag})" if _has_filing_date(con, view) else lag
+    return f"SELECT DISTINCT symbol, CAST(date AS DATE) AS period, CAST({filed} AS DATE) AS filed FROM {view}"
+
+def schedule(dataset: str, today: date | None = None) -> dict[str, tuple[date, date]]:
+    """
+    symbol -> (next filing expected, window opens) for every symbol with stored rows,
+    or None when there is no filing history to go by. Datasets without filingDate
+    (key_metrics, ratios, segments) follow the income statement's filings; their window
+    stays open while they lag its latest period, for FILING_WINDOW_DAYS after it was filed.
+    """
+    today = today or date.today()
+    ds, ref = DATASETS[dataset], DATASETS["income_statement"]
+    con = duckdb.connect()
+    try:
+        for d in {ds, ref}:
+            storage._maybe_create_view_for_dir(con, d.view, d.dir, d.key_cols)
+        if not _view_exists(con, ds.view):
+            return {}
+        own = _filings_sql(con, ds.view)
+        src = own
+        if not _has_filing_date(con, ds.view) and _view_exists(con, ref.view) and _has_filing_date(con, ref.view):
+            src = _filings_sql(con, ref.view)
+        rows = con.execute(f"""
+            WITH f AS (SELECT DISTINCT symbol, filed FROM ({src})),
+            g AS (
+                SELECT symbol, filed, date_diff('day', lag(filed) OVER (PARTITION BY symbol ORDER BY filed), filed) AS gap
+                FROM f
+            ),
+            c AS (
+                SELECT symbol, max(filed) AS last_filed,
+                       coalesce(median(gap) FILTER (WHERE gap >= {_MIN_GAP_DAYS}), {DEFAULT_CADENCE_DAYS}) AS cadence
+                FROM g GROUP BY 1
+            ),
+            lagging AS (  -- periods the reference has but this dataset does not
+                SELECT r.symbol, max(r.period) AS ref_period FROM ({src}) r GROUP BY 1
+            )
+            SELECT o.symbol, c.last_filed, c.cadence, max(o.period) < l.ref_period AS behind
+            FROM ({own}) o
+            LEFT JOIN c USING (symbol)
+            LEFT JOIN lagging l USING (symbol)
+            GROUP BY o.symbol, c.last_filed, c.cadence, l.ref_period
+        """).fetchall()
+    finally:
+        con.close()
+    out = {}
+    window = timedelta(days=config.FILING_WINDOW_DAYS)
+    for sym, last_filed, cadence, behind in rows:
+        if last_filed is None or (behind and (today - last_filed).days > config.FILING_WINDOW_DAYS):
+            out[sym] = None  # no filing history to go by / stopped following the reference
+            continue
+        if behind:
+            out[sym] = (last_filed, last_filed)  # catching up with the reference's new period
+            continue
+        expected = last_filed + timedelta(days=round(cadence))
+        out[sym] = (expected, expected - window)
+    return out
+
+def _sweep_path():
+    return config.STATE_DIR / "fundamentals_sweeps.json"
+
+def _load_sweeps() -> dict[str, str]:
+    try:
+        with open(_sweep_path(), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+def sweep_due(dataset: str, today: date | None = None) -> bool:
+    last = _load_sweeps().get(dataset)
+    today = today or date.today()
+    return last is None or (today - date.fromisoformat(last)).days >= config.FUNDAMENTALS_SWEEP_DAYS
+
+def record_sweep(dataset: str, today: date | None = None):
+    sweeps = _load_sweeps()
+    sweeps[dataset] = (today or date.today()).isoformat()
+    path = _sweep_path()
+    tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(sweeps, f, sort_keys=True, indent=0)
+    os.replace(tmp, path)  # atomic replace
+
+def _attempts_path():
+    return config.STATE_DIR / "fundamentals_attempts.json"
+
+def _load_attempts() -> dict[str, dict[str, str]]:
+    try:
+        with open(_attempts_path(), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+def record_attempts(dataset: str, symbols: list[str], today: date | None = None):
+    """Remember that symbols were requested for dataset today (backs off the unscheduled ones)."""
+    if not symbols:
+        return
+    attempts = _load_attempts()
+    day = (today or date.today()).isoformat()
+    attempts.setdefault(dataset, {}).update({s: day for s in symbols})
+    path = _attempts_path()
+    tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(attempts, f, sort_keys=True, indent=0)
+    os.replace(tmp, path)  # atomic replace
+
+def due_symbols(plan: FetchPlan, today: date | None = None) -> tuple[list[str], bool]:
+    """
+    (symbols to fetch, is_full_sweep) for a fundamentals dataset: backfills always,
+    incumbents when their filing window is open, or, with nothing to schedule by,
+    DEFAULT_CADENCE_DAYS after their last attempt.
+    """
+    today = today or date.today()
+    if not config.FILING_PLANNER or sweep_due(plan.dataset, today):
+        return plan.symbols, True
+    sched = schedule(plan.dataset, today)
+    tried = _load_attempts().get(plan.dataset, {})
+
+    def is_due(s: str) -> bool:
+        if sched.get(s) is not None:
+            return sched[s][1] <= today
+        last = tried.get(s)
+        return last is None or (today - date.fromisoformat(last)).days >= DEFAULT_CADENCE_DAYS
+
+    due = [s for s in plan.incremental if is_due(s)]
+    log.info("%s: %d of %d incumbents inside their filing window", plan.dataset, len(due), len(plan.incremental))
+    return sorted(due + plan.backfill), False
@@ -0,0 +1,153 @@
+"""
+Append-only change log of the rows each upsert inserted or modified, for consumers
+that want "everything since sequence N" instead of rescanning datasets.
+
+Changed rows keep their dataset columns plus _seq (segment sequence), _op ("insert",
+"update", or "upsert" for delta-mode writes that skip reading the base file) and _ts.
+Each upsert stages its rows in CHANGELOG_DIR/<dataset>/_staged/ right after its data
+file is replaced, so they are on disk before the job is journaled; a flush (sink close,
+or CHANGELOG_FLUSH_ROWS staged) publishes every staged file of the dataset, including
+ones left by a killed run, as one CHANGELOG_DIR/<dataset>/<seq:012d>.parquet. Sequence
+numbers come from a file-locked counter and are assigned at publish time, so they
+increase in the order segments become visible, across processes too. A crash between
+publishing a segment and clearing its staged files publishes those rows again later:
+delivery is at-least-once.
+"""
+from __future__ import annotations
+import os, struct, threading, time, uuid
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from . import config
+
+try:  # cross-process counter locking
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+_SEQ = struct.Struct("<q")
+STAGED_DIRNAME = "_staged"
+_lock = threading.Lock()
+_staged_rows: dict[str, int] = {}  # rows this process staged since its last flush
+
+def diff_rows(df_old: pd.DataFrame | None, df_new: pd.DataFrame, key_cols: list[str]) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """(inserted, updated) rows of df_new against df_old; rows equal to the stored ones are neither."""
+    new = df_new.drop_duplicates(subset=key_cols, keep="last")
+    if df_old is None or df_old.empty:
+        return new, new.iloc[:0]
+    stored = pd.MultiIndex.from_frame(df_old[key_cols])
+    known = pd.MultiIndex.from_frame(new[key_cols]).isin(stored)
+    inserted, cand = new[~known], new[known]
+    if cand.empty:
+        return inserted, cand
+    cols = [c for c in cand.columns if c in df_old.columns]
+    both = pd.concat([df_old[cols], cand[cols]], ignore_index=True)
+    same = both.duplicated(keep="first").to_numpy()[len(df_old):]  # NaN == NaN here
+    return inserted, cand[~same]
+
+def record(dataset: str, inserted: pd.DataFrame | None = None, updated: pd.DataFrame | None = None,
+           upserted: pd.DataFrame | None = None):
+    """Stage changed rows of dataset on disk; published by flush()."""
+    if not config.CHANGELOG:
+        return
+    frames = [df.assign(_op=op) for op, df in (("insert", inserted), ("update", updated), ("upsert", upserted))
+              if df is not None and not df.empty]
+    if not frames:
+        return
+    df = pd.concat(frames, ignore_index=True).assign(_ts=pd.Timestamp(time.time_ns(), unit="ns"))
+    d = config.CHANGELOG_DIR / dataset / STAGED_DIRNAME
+    d.mkdir(parents=True, exist_ok=True)
+    name = f"{time.time_ns():020d}-{uuid.uuid4().hex[:8]}"  # sorts in staging order
+    tmp = d / f".{name}.tmp"
+    pq.write_table(pa.Table.from_pandas(df, preserve_index=False), tmp, compression="zstd")
+    os.replace(tmp, d / f"{name}.parquet")
+    with _lock:
+        _staged_rows[dataset] = _staged_rows.get(dataset, 0) + len(df)
+        full = _staged_rows[dataset] >= config.CHANGELOG_FLUSH_ROWS
+    if full:
+        flush(dataset)
+
+class _Counter:
+    """Sequence file under an exclusive OS lock; held while a segment is published."""
+    def __enter__(self):
+        self.fd = os.open(config.STATE_DIR / "changelog.seq", os.O_RDWR | os.O_CREAT, 0o644)
+        if fcntl is not None:
+            fcntl.flock(self.fd, fcntl.LOCK_EX)
+        else:
+            msvcrt.locking(self.fd, msvcrt.LK_LOCK, _SEQ.size)
+        return self
+
+    def next(self) -> int:
+        os.lseek(self.fd, 0, os.SEEK_SET)
+        raw = os.read(self.fd, _SEQ.size)
+        seq = (_SEQ.unpack(raw)[0] if len(raw) == _SEQ.size else 0) + 1
+        os.lseek(self.fd, 0, os.SEEK_SET)
+        os.write(self.fd, _SEQ.pack(seq))
+        return seq
+
+    def __exit__(self, *exc):
+        if fcntl is not None:
+            fcntl.flock(self.fd, fcntl.LOCK_UN)
+        else:
+            os.lseek(self.fd, 0, os.SEEK_SET)
+            msvcrt.locking(self.fd, msvcrt.LK_UNLCK, _SEQ.size)
+        os.close(self.fd)
+
+def flush(dataset: str | None = None) -> list[int]:
+    """Publish staged changes (one segment per dataset; all datasets when None). Returns the sequence ids written."""
+    if dataset is not None:
+        names = [dataset]
+    elif config.CHANGELOG_DIR.is_dir():
+        names = sorted(p.parent.name for p in config.CHANGELOG_DIR.glob(f"*/{STAGED_DIRNAME}"))
+    else:
+        names = []
+    seqs = []
+    for name in names:
+        with _lock:
+            _staged_rows.pop(name, None)
+        d = config.CHANGELOG_DIR / name
+        if not any((d / STAGED_DIRNAME).glob("*.parquet")):
+            continue
+        with _Counter() as counter:  # one publisher at a time, so no staged file is published twice
+            staged = sorted((d / STAGED_DIRNAME).glob("*.parquet"))
+            if not staged:
+                continue
+            seq = counter.next()
+            table = pa.concat_tables([pq.read_table(p) for p in staged], promote_options="default")
+            table = table.append_column("_seq", pa.array([seq] * table.num_rows, pa.int64()))
+            tmp = d / f".{uuid.uuid4().hex}.tmp"
+            pq.write_table(table, tmp, compression="zstd")
+            os.replace(tmp, d / f"{seq:012d}.parquet")  # visible only once its seq is taken
+            for p in staged:
+                os.remove(p)
+        seqs.append(seq)
+    return seqs
+
+def segments(dataset: str, since: int = 0) -> list[tuple[int, os.PathLike]]:
+    """(seq, path) of every published segment of dataset with seq > since, oldest first."""
+    d = config.CHANGELOG_DIR / dataset
+    out = [(int(p.stem), p) for p in d.glob("*.parquet")] if d.is_dir() else []
+    return sorted(s for s in out if s[0] > since)
+
+def read_since(dataset: str, since: int = 0) -> pd.DataFrame:
+    """Changed rows of dataset published after sequence `since` (pass the last _seq you processed)."""
+    segs = segments(dataset, since)
+    if not segs:
+        return pd.DataFrame()
+    return pd.concat([pd.read_parquet(p) for _, p in segs], ignore_index=True)
+
+def latest_seq(dataset: str) -> int:
+    segs = segments(dataset)
+    return segs[-1][0] if segs else 0
+
+def prune(dataset: str, through: int) -> int:
+    """Delete segments with seq <= through (every consumer has processed them). Returns files removed."""
+    n = 0
+    for seq, p in segments(dataset):
+        if seq > through:
+            break
+        os.remove(p)
+        n += 1
+    return n
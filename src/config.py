@@ -4,43 +4,127 @@ from pathlib import Path
 from dotenv import load_dotenv
 
 ROOT = Path(__file__).resolve().parents[1]
-DATA_DIR = ROOT / "data"
+load_dotenv(ROOT / ".env")
+# DATA_DIR / DB_DIR overrides point a run at a scratch store (e.g. bench.py)
+DATA_DIR = Path(os.getenv("DATA_DIR", str(ROOT / "data")))
 PARQUET_DIR = DATA_DIR / "parquet"
-DB_DIR = ROOT / "db"
+DB_DIR = Path(os.getenv("DB_DIR", str(ROOT / "db")))
+STATE_DIR = DATA_DIR / "state"  # watermarks and other per-dataset bookkeeping
 DB_DIR.mkdir(parents=True, exist_ok=True)
 PARQUET_DIR.mkdir(parents=True, exist_ok=True)
+STATE_DIR.mkdir(parents=True, exist_ok=True)
 
 DB_FILE = DB_DIR / "market.duckdb"
 
 # Datasets
-PARQUET_CONSTITUENTS = PARQUET_DIR / "sp500_constituents.parquet"
+PARQUET_CONSTITUENTS = PARQUET_DIR / "sp500_constituents.parquet"  # latest snapshot
+CONSTITUENT_SNAPSHOTS_DIR = PARQUET_DIR / "sp500_constituents_snapshots"  # one file per fetch day
+PARQUET_MEMBERSHIP = PARQUET_DIR / "sp500_membership.parquet"  # (symbol, start, end) spells
 PARQUET_PRICES_DIR = PARQUET_DIR / "prices"
 PARQUET_BALANCE_SHEET_DIR = PARQUET_DIR / "balance_sheet"
 PARQUET_INCOME_STATEMENT_DIR = PARQUET_DIR / "income_statement"
 PARQUET_KEY_METRICS_DIR = PARQUET_DIR / "key_metrics"
 PARQUET_RATIOS_DIR = PARQUET_DIR / "ratios"
 PARQUET_REVENUE_SEGMENTS_DIR = PARQUET_DIR / "revenue_segments"
+PARQUET_PRICE_FEATURES_DIR = PARQUET_DIR / "price_features"  # derived from prices
+PARQUET_PIT_PANEL_DIR = PARQUET_DIR / "pit_panel"  # derived: prices + fundamentals as known each day
 
 for p in [
     PARQUET_PRICES_DIR, PARQUET_BALANCE_SHEET_DIR, PARQUET_INCOME_STATEMENT_DIR,
-    PARQUET_KEY_METRICS_DIR, PARQUET_RATIOS_DIR, PARQUET_REVENUE_SEGMENTS_DIR
+    PARQUET_KEY_METRICS_DIR, PARQUET_RATIOS_DIR, PARQUET_REVENUE_SEGMENTS_DIR,
+    PARQUET_PRICE_FEATURES_DIR, PARQUET_PIT_PANEL_DIR,
 ]:
     p.mkdir(parents=True, exist_ok=True)
 
-# Load API key and perf settings
-load_dotenv(ROOT / ".env")
-API_KEY = os.getenv("API_KEY", "").strip()
-if not API_KEY:
-    raise RuntimeError("Missing API_KEY in .env")
+def __getattr__(name: str):
+    # API_KEY is read on first use, so query-only clients (query_client, sample_queries) never need one
+    if name == "API_KEY":
+        key = os.getenv("API_KEY", "").strip()
+        if not key:
+            raise RuntimeError("Missing API_KEY in .env")
+        return key
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
+# Perf settings
 MAX_WORKERS = int(os.getenv("MAX_WORKERS", "16"))
 REQUESTS_PER_MINUTE = int(os.getenv("REQUESTS_PER_MINUTE", "700"))  # headroom < 750
+# "threads" (requests + worker pool) or "async" (aiohttp event loop; pip install aiohttp)
+HTTP_ENGINE = os.getenv("HTTP_ENGINE", "threads").strip().lower()
+ASYNC_MAX_CONNECTIONS = int(os.getenv("ASYNC_MAX_CONNECTIONS", "64"))  # keep-alive pool size
+ASYNC_MAX_IN_FLIGHT = int(os.getenv("ASYNC_MAX_IN_FLIGHT", "1024"))
+# Pipeline between fetch -> decode -> write stages (bounded queues give backpressure)
+PIPELINE_QUEUE_SIZE = int(os.getenv("PIPELINE_QUEUE_SIZE", "64"))
+DECODE_WORKERS = int(os.getenv("DECODE_WORKERS", "2"))
+DECODE_PROCESSES = os.getenv("DECODE_PROCESSES", "0").strip().lower() in ("1", "true", "yes")  # decode in a process pool
+WRITE_WORKERS = int(os.getenv("WRITE_WORKERS", "4"))
+RATE_LIMIT_BURST = int(os.getenv("RATE_LIMIT_BURST", "4"))
+# Optional path shared by every process hitting the same API key (e.g. prices.py + fundamentals.py)
+RATE_LIMIT_FILE = os.getenv("RATE_LIMIT_FILE", "").strip()
+
+# Skip decode/merge/write for fundamentals payloads identical to the last stored one
+RESPONSE_CACHE = os.getenv("RESPONSE_CACHE", "1").strip().lower() in ("1", "true", "yes")
+RESPONSE_CACHE_FILE = Path(os.getenv("RESPONSE_CACHE_FILE", str(STATE_DIR / "responses.sqlite")))
+RESPONSE_CACHE_PAYLOADS = os.getenv("RESPONSE_CACHE_PAYLOADS", "0").strip().lower() in ("1", "true", "yes")  # keep bodies for replay.py
+
+# Recompute returns / volatility / moving averages / drawdowns for the tail touched by each price run
+PRICE_FEATURES = os.getenv("PRICE_FEATURES", "1").strip().lower() in ("1", "true", "yes")
+# Daily point-in-time panel of prices + latest-filed fundamentals, updated after imports
+PIT_PANEL = os.getenv("PIT_PANEL", "1").strip().lower() in ("1", "true", "yes")
+PIT_FILING_LAG_DAYS = int(os.getenv("PIT_FILING_LAG_DAYS", "90"))  # assumed filing delay when none is reported
+# Memory-mapped (date x symbol) adjClose / volume matrices appended after each price run (see dense_panel.py)
+DENSE_PANEL = os.getenv("DENSE_PANEL", "1").strip().lower() in ("1", "true", "yes")
+DENSE_PANEL_DIR = Path(os.getenv("DENSE_PANEL_DIR", str(DATA_DIR / "dense")))
+# Windowed price fetches re-request this many calendar days before the watermark; if the
+# stored adjClose there moved by more than the relative tolerance (a new dividend), the
+# symbol's full history is re-fetched
+PRICE_OVERLAP_DAYS = int(os.getenv("PRICE_OVERLAP_DAYS", "7"))
+PRICE_DRIFT_TOLERANCE = float(os.getenv("PRICE_DRIFT_TOLERANCE", "1e-6"))
+# Daily price updates read FMP's bulk end-of-day file (one request per trading day, every
+# symbol) for symbols whose watermark is at most PRICE_BATCH_MAX_DAYS old; the rest, and
+# any gaps, use the per-symbol history endpoint (see batch_prices.py)
+PRICE_BATCH = os.getenv("PRICE_BATCH", "1").strip().lower() in ("1", "true", "yes")
+PRICE_BATCH_MAX_DAYS = int(os.getenv("PRICE_BATCH_MAX_DAYS", "7"))
+# Fundamentals runs fetch a symbol only near its next expected filing (see cadence.py)
+FILING_PLANNER = os.getenv("FILING_PLANNER", "1").strip().lower() in ("1", "true", "yes")
+FILING_WINDOW_DAYS = int(os.getenv("FILING_WINDOW_DAYS", "7"))  # window opens this long before the due date
+FUNDAMENTALS_SWEEP_DAYS = int(os.getenv("FUNDAMENTALS_SWEEP_DAYS", "28"))  # full re-fetch per dataset at least this often
+# Run reports: per-stage timings as JSON under REPORT_DIR, plus an optional Prometheus textfile
+METRICS = os.getenv("METRICS", "1").strip().lower() in ("1", "true", "yes")
+REPORT_DIR = Path(os.getenv("REPORT_DIR", str(STATE_DIR / "reports")))
+METRICS_PROM_FILE = os.getenv("METRICS_PROM_FILE", "").strip()  # e.g. node_exporter textfile dir/fmp.prom
+
+# Storage: "rewrite" upserts the whole symbol file, "delta" appends small segments under <dataset>/_delta
+STORAGE_MODE = os.getenv("STORAGE_MODE", "rewrite").strip().lower()
+DELTA_COMPACT_BYTES = int(os.getenv("DELTA_COMPACT_BYTES", str(4 * 1024 * 1024)))  # per symbol
+DELTA_COMPACT_SEGMENTS = int(os.getenv("DELTA_COMPACT_SEGMENTS", "32"))  # per symbol
+# Datasets stored Hive-partitioned as <dataset>/year=YYYY/ (also detected on disk after migrate_layout.py)
+PARTITIONED_DATASETS = {s.strip() for s in os.getenv("PARTITIONED_DATASETS", "").split(",") if s.strip()}
+PARTITION_ROW_GROUP_SIZE = int(os.getenv("PARTITION_ROW_GROUP_SIZE", "32768"))
+PARTITION_FLUSH_ROWS = int(os.getenv("PARTITION_FLUSH_ROWS", "500000"))  # buffered rows before a partitioned sink writes mid-run
+# Append-only log of the rows every upsert inserted / changed (see changelog.py)
+CHANGELOG = os.getenv("CHANGELOG", "1").strip().lower() in ("1", "true", "yes")
+CHANGELOG_DIR = Path(os.getenv("CHANGELOG_DIR", str(DATA_DIR / "changelog")))
+CHANGELOG_FLUSH_ROWS = int(os.getenv("CHANGELOG_FLUSH_ROWS", "100000"))  # buffered rows per dataset before a segment is published
+# Parquet writer defaults for every dataset file (per-dataset sort keys etc. in writer_profiles.py)
+PARQUET_COMPRESSION = os.getenv("PARQUET_COMPRESSION", "zstd").strip().lower()
+PARQUET_COMPRESSION_LEVEL = int(os.getenv("PARQUET_COMPRESSION_LEVEL", "3"))
+PARQUET_ROW_GROUP_SIZE = int(os.getenv("PARQUET_ROW_GROUP_SIZE", "65536"))
+PARQUET_BLOOM_FILTERS = os.getenv("PARQUET_BLOOM_FILTERS", "1").strip().lower() in ("1", "true", "yes")  # on symbol, year= partitions
+# Keep native t_<dataset> tables in market.duckdb next to the views, refreshed incrementally by ensure_db
+MATERIALIZE = os.getenv("MATERIALIZE", "0").strip().lower() in ("1", "true", "yes")
+QUERY_SOURCE = os.getenv("QUERY_SOURCE", "view").strip().lower()  # "view" (Parquet) or "table" (materialized)
+# src/query.py result cache (Arrow tables, invalidated by dataset version stamps)
+QUERY_CACHE_SIZE = int(os.getenv("QUERY_CACHE_SIZE", "128"))  # entries
+QUERY_CACHE_BYTES = int(os.getenv("QUERY_CACHE_BYTES", str(256 * 1024 * 1024)))
+QUERY_SOCKET = Path(os.getenv("QUERY_SOCKET", str(STATE_DIR / "query.sock")))  # query_server.py listens here
 
-# FMP endpoints
-FMP_CONSTITUENTS_URL = "https://financialmodelingprep.com/stable/sp500-constituent"
-FMP_PRICES_URL = "https://financialmodelingprep.com/stable/historical-price-eod/dividend-adjusted"
-FMP_BALANCE_SHEET_URL = "https://financialmodelingprep.com/stable/balance-sheet-statement"
-FMP_INCOME_STATEMENT_URL = "https://financialmodelingprep.com/stable/income-statement"
-FMP_KEY_METRICS_URL = "https://financialmodelingprep.com/stable/key-metrics"
-FMP_RATIOS_URL = "https://financialmodelingprep.com/stable/ratios"
-FMP_REVENUE_SEGMENTS_URL = "https://financialmodelingprep.com/stable/revenue-product-segmentation"
+# FMP endpoints (FMP_BASE_URL can point at src/mock_fmp.py for benchmarks)
+FMP_BASE_URL = os.getenv("FMP_BASE_URL", "https://financialmodelingprep.com").rstrip("/")
+FMP_CONSTITUENTS_URL = f"{FMP_BASE_URL}/stable/sp500-constituent"
+FMP_PRICES_URL = f"{FMP_BASE_URL}/stable/historical-price-eod/dividend-adjusted"
+FMP_EOD_BULK_URL = f"{FMP_BASE_URL}/stable/eod-bulk"  # ?date=YYYY-MM-DD, CSV of every symbol
+FMP_BALANCE_SHEET_URL = f"{FMP_BASE_URL}/stable/balance-sheet-statement"
+FMP_INCOME_STATEMENT_URL = f"{FMP_BASE_URL}/stable/income-statement"
+FMP_KEY_METRICS_URL = f"{FMP_BASE_URL}/stable/key-metrics"
+FMP_RATIOS_URL = f"{FMP_BASE_URL}/stable/ratios"
+FMP_REVENUE_SEGMENTS_URL = f"{FMP_BASE_URL}/stable/revenue-product-segmentation"
@@ -0,0 +1,25 @@
+from __future__ import annotations
+from dataclasses import dataclass
+from pathlib import Path
+from . import config
+
+@dataclass(frozen=True)
+class Dataset:
+    name: str
+    view: str
+    dir: Path
+    key_cols: tuple[str, ...]
+    url: str = ""  # FMP endpoint, queried with ?symbol= (empty for derived datasets)
+
+# Per-symbol datasets and the natural keys used by their upserts
+DATASETS: dict[str, Dataset] = {d.name: d for d in [
+    Dataset("prices", "v_prices", config.PARQUET_PRICES_DIR, ("symbol","date"), config.FMP_PRICES_URL),
+    Dataset("balance_sheet", "v_balance_sheet", config.PARQUET_BALANCE_SHEET_DIR, ("symbol","date","period"), config.FMP_BALANCE_SHEET_URL),
+    Dataset("income_statement", "v_income_statement", config.PARQUET_INCOME_STATEMENT_DIR, ("symbol","date","period"), config.FMP_INCOME_STATEMENT_URL),
+    Dataset("key_metrics", "v_key_metrics", config.PARQUET_KEY_METRICS_DIR, ("symbol","date","period"), config.FMP_KEY_METRICS_URL),
+    Dataset("ratios", "v_ratios", config.PARQUET_RATIOS_DIR, ("symbol","date","period"), config.FMP_RATIOS_URL),
+    Dataset("revenue_segments", "v_revenue_segments", config.PARQUET_REVENUE_SEGMENTS_DIR, ("symbol","date","segment"), config.FMP_REVENUE_SEGMENTS_URL),
+    # derived (see price_features.py)
+    Dataset("price_features", "v_price_features", config.PARQUET_PRICE_FEATURES_DIR, ("symbol","date")),
+    Dataset("pit_panel", "v_pit_panel", config.PARQUET_PIT_PANEL_DIR, ("symbol","date")),  # see pit_panel.py
+]}
@@ -0,0 +1,186 @@
+from __future__ import annotations
+import json, logging, os, uuid
+from itertools import chain
+from dataclasses import dataclass
+from datetime import date
+from pathlib import Path
+import duckdb
+import numpy as np
+import pandas as pd
+
+from . import config, storage, versions
+from .datasets import DATASETS
+
+log = logging.getLogger(__name__)
+
+# (date x symbol) float64 matrices of v_prices columns as raw row-major files under
+# DENSE_PANEL_DIR, plus meta.json (symbols, shape, file generation) and dates.npy.
+# New trading days are appended as rows; columns are allocated with spare capacity so
+# index entrants fill a free column in place. Anything else (dates before the first
+# row, a missing day in the middle, no free column) rebuilds into a new generation
+# of files, so processes still mapping the old one keep a consistent view. A rebuild
+# deletes only the generations before the previous one: a reader that read the old
+# meta.json just before the switch can still open its files, and load() re-reads
+# meta.json once if they are gone anyway.
+
+FIELDS = ("adjClose", "volume")
+DTYPE = np.dtype("<f8")
+_HEADROOM = 1.25  # spare symbol columns allocated on a rebuild
+
+def _dir() -> Path:
+    return config.DENSE_PANEL_DIR
+
+def _file(field: str, gen: str) -> Path:
+    return _dir() / f"{field}.{gen}.f64"
+
+def _read_meta() -> dict | None:
+    try:
+        with open(_dir() / "meta.json", "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+def _write_meta(meta: dict, dates: np.ndarray):
+    d = _dir()
+    tmp = d / f"dates.{uuid.uuid4().hex}.tmp"
+    with open(tmp, "wb") as f:
+        np.save(f, dates.astype("datetime64[D]"))
+    os.replace(tmp, d / f"dates.{meta['gen']}.npy")
+    tmp = d / f"meta.{uuid.uuid4().hex}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+    os.replace(tmp, d / "meta.json")  # atomic replace: readers see the new shape only now
+
+@dataclass
+class DensePanel:
+    """Read-only, zero-copy views over the mapped files: arrays[field][date_idx, symbol_idx]."""
+    dates: np.ndarray          # datetime64[D], ascending
+    symbols: list[str]
+    arrays: dict[str, np.ndarray]
+
+    def __getitem__(self, field: str) -> np.ndarray:
+        return self.arrays[field]
+
+    def col(self, symbol: str) -> int:
+        return self.symbols.index(symbol)
+
+    def rows(self, start: date | str | None = None, end: date | str | None = None) -> slice:
+        lo = 0 if start is None else int(np.searchsorted(self.dates, np.datetime64(start, "D"), "left"))
+        hi = len(self.dates) if end is None else int(np.searchsorted(self.dates, np.datetime64(end, "D"), "right"))
+        return slice(lo, hi)
+
+def load(fields: tuple[str, ...] = FIELDS) -> DensePanel | None:
+    """Map the current panel read-only (pages are shared through the OS page cache), or None."""
+    try:
+        return _load(fields)
+    except FileNotFoundError:  # meta.json named a generation two rebuilds old by the time we opened it
+        return _load(fields)
+
+def _load(fields: tuple[str, ...]) -> DensePanel | None:
+    meta = _read_meta()
+    if meta is None:
+        return None
+    n, cap, k = meta["n_dates"], meta["capacity"], len(meta["symbols"])
+    dates = np.load(_dir() / f"dates.{meta['gen']}.npy")[:n]
+    arrays = {}
+    for field in fields:
+        if n == 0:
+            arrays[field] = np.empty((0, k), DTYPE)
+            continue
+        mm = np.memmap(_file(field, meta["gen"]), dtype=DTYPE, mode="r", shape=(n, cap))
+        arrays[field] = mm[:, :k]
+    return DensePanel(dates, list(meta["symbols"]), arrays)
+
+def _rows(con: duckdb.DuckDBPyConnection, starts: pd.DataFrame | None) -> pd.DataFrame:
+    view = DATASETS["prices"].view
+    cols = ", ".join(f"p.{f}" for f in FIELDS)
+    if starts is None:
+        return con.execute(f"SELECT p.symbol, CAST(p.date AS DATE) AS date, {cols} FROM {view} p").fetchdf()
+    con.register("starts", starts)
+    return con.execute(f"""
+        SELECT p.symbol, CAST(p.date AS DATE) AS date, {cols}
+        FROM {view} p JOIN starts s USING (symbol) WHERE p.date >= s.start""").fetchdf()
+
+def _rebuild(df: pd.DataFrame) -> dict:
+    dates = np.sort(df["date"].astype("datetime64[ns]").unique()).astype("datetime64[D]")
+    symbols = sorted(df["symbol"].unique())
+    cap = max(len(symbols), int(len(symbols) * _HEADROOM) + 1)
+    gen = f"{pd.Timestamp.now():%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:8]}"
+    old = _read_meta()
+    r = np.searchsorted(dates, df["date"].to_numpy().astype("datetime64[D]"))
+    c = df["symbol"].map({s: i for i, s in enumerate(symbols)}).to_numpy()
+    for field in FIELDS:
+        arr = np.full((len(dates), cap), np.nan, DTYPE)
+        arr[r, c] = df[field].to_numpy(dtype=DTYPE, na_value=np.nan)
+        tmp = _file(field, gen).with_suffix(".tmp")
+        arr.tofile(tmp)
+        os.replace(tmp, _file(field, gen))
+    meta = {"gen": gen, "n_dates": len(dates), "capacity": cap, "symbols": symbols, "fields": list(FIELDS)}
+    _write_meta(meta, dates)
+    # keep the previous generation for readers between reading meta.json and opening its files
+    keep = {gen} | ({old["gen"]} if old is not None else set())
+    for p in chain(_dir().glob("*.f64"), _dir().glob("dates.*.npy")):
+        if p.name.split(".")[1] not in keep:
+            p.unlink(missing_ok=True)
+    return {"rebuilt": True, "rows": len(dates), "symbols": len(symbols), "cells": len(df)}
+
+def _apply(df: pd.DataFrame, meta: dict) -> dict | None:
+    """Write df into the current generation in place; None when it needs a rebuild."""
+    dates = np.load(_dir() / f"dates.{meta['gen']}.npy")[:meta["n_dates"]]
+    d = df["date"].to_numpy().astype("datetime64[D]")
+    new_dates = np.unique(d[d > dates[-1]]) if len(dates) else np.unique(d)
+    old_part = d[d <= dates[-1]] if len(dates) else d[:0]
+    if len(old_part) and not np.isin(old_part, dates).all():
+        return None  # before the first row or a day the panel skipped
+    symbols = list(meta["symbols"])
+    entrants = sorted(set(df["symbol"]) - set(symbols))
+    if len(symbols) + len(entrants) > meta["capacity"]:
+        return None
+    symbols += entrants
+    all_dates = np.concatenate([dates, new_dates])
+    n, cap = len(all_dates), meta["capacity"]
+    col = {s: i for i, s in enumerate(symbols)}
+    r = np.searchsorted(all_dates, d)
+    c = df["symbol"].map(col).to_numpy()
+    for field in FIELDS:
+        path = _file(field, meta["gen"])
+        with open(path, "r+b") as f:
+            f.truncate(meta["n_dates"] * cap * DTYPE.itemsize)  # drop any torn append
+            f.seek(0, os.SEEK_END)
+            np.full((len(new_dates), cap), np.nan, DTYPE).tofile(f)
+        mm = np.memmap(path, dtype=DTYPE, mode="r+", shape=(n, cap))
+        mm[r, c] = df[field].to_numpy(dtype=DTYPE, na_value=np.nan)
+        mm.flush()
+        del mm
+    _write_meta({**meta, "n_dates": n, "symbols": symbols}, all_dates)
+    return {"rebuilt": False, "rows": n, "symbols": len(symbols), "appended_dates": len(new_dates),
+            "cells": len(df)}
+
+def update_dense_panel(changed: dict[str, date] | None = None) -> dict:
+    """
+    Bring the dense panel up to date with v_prices. changed maps symbol -> earliest
+    price date written (as collected by prices_task); None rebuilds from every row.
+    """
+    _dir().mkdir(parents=True, exist_ok=True)
+    if changed is not None and not changed:
+        return {"rebuilt": False, "cells": 0}
+    meta = _read_meta()
+    prices = DATASETS["prices"]
+    con = duckdb.connect()
+    try:
+        storage._maybe_create_view_for_dir(con, prices.view, prices.dir, prices.key_cols)
+        if con.execute("SELECT COUNT(*) FROM information_schema.views WHERE table_name = ?",
+                       [prices.view]).fetchone()[0] == 0:
+            return {"rebuilt": False, "cells": 0}
+        if changed is None or meta is None:
+            res = _rebuild(_rows(con, None))
+        else:
+            starts = pd.DataFrame({"symbol": list(changed), "start": pd.to_datetime(list(changed.values()))})
+            res = _apply(_rows(con, starts), meta)
+            if res is None:
+                res = _rebuild(_rows(con, None))
+    finally:
+        con.close()
+    versions.bump("dense_panel")
+    log.info("Dense panel: %s", res)
+    return res
@@ -0,0 +1,69 @@
+from __future__ import annotations
+import json, time, logging
+from email.utils import parsedate_to_datetime
+import requests
+from requests.adapters import HTTPAdapter
+
+from . import config, metrics
+
+log = logging.getLogger(__name__)
+
+def new_session(pool_size: int = config.MAX_WORKERS) -> requests.Session:
+    """Session whose keep-alive pool is as large as the worker pool (requests defaults to 10)."""
+    s = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size)
+    s.mount("https://", adapter)
+    s.mount("http://", adapter)
+    return s
+
+def retry_after_seconds(value: str | None) -> float | None:
+    """Parse a Retry-After header (delta-seconds or HTTP-date)."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+def get_raw(session: requests.Session, limiter, url: str, params: dict, label: str, attempts: int = 5) -> bytes | None:
+    """
+    GET url under the shared limiter and return the raw response body, or None if
+    the request failed for good. 429s slow the limiter down for every worker;
+    successes let it recover.
+    """
+    for attempt in range(attempts):
+        limiter.acquire()
+        if attempt:
+            metrics.count("http_retries")
+        t0 = time.perf_counter()
+        try:
+            r = session.get(url, params=params, timeout=30)
+            metrics.observe("http", time.perf_counter() - t0, nbytes=len(r.content))
+            if r.status_code == 200:
+                limiter.reward()
+                return r.content
+            elif r.status_code == 429:
+                metrics.count("http_429")
+                limiter.penalize(retry_after_seconds(r.headers.get("Retry-After")))
+            elif r.status_code in (503, 504):
+                metrics.count(f"http_{r.status_code}")
+                time.sleep(retry_after_seconds(r.headers.get("Retry-After")) or 2 ** attempt)
+            else:
+                metrics.count("http_failed")
+                log.error("HTTP %s for %s: %s", r.status_code, label, r.text[:200])
+                return None
+        except requests.RequestException as e:
+            metrics.count("http_errors")
+            log.warning("Request error %s (try %d): %s", label, attempt+1, e)
+            time.sleep(2 ** attempt)
+    metrics.count("http_failed")
+    return None
+
+def get_json(session: requests.Session, limiter, url: str, params: dict, label: str, attempts: int = 5):
+    """get_raw, decoded. Returns None on failure or an empty body."""
+    raw = get_raw(session, limiter, url, params, label, attempts)
+    return json.loads(raw) if raw else None
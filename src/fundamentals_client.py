@@ -1,35 +1,26 @@
 from __future__ import annotations
-import time, logging, requests
-from .rate_limit import MinuteRateLimiter
+import logging, requests
+from .fmp_http import get_raw, new_session
+from .schemas import parse_payload
+from .rate_limit import TokenBucketLimiter, shared_limiter
 from . import config
 
 log = logging.getLogger(__name__)
 
 class FundamentalsClient:
-    def __init__(self, session: requests.Session | None = None, rpm: int = config.REQUESTS_PER_MINUTE):
-        self.session = session or requests.Session()
-        self.limiter = MinuteRateLimiter(rpm)
+    def __init__(self, session: requests.Session | None = None, rpm: int | None = None,
+                 limiter: TokenBucketLimiter | None = None):
+        self.session = session or new_session()
+        # one process-wide budget unless the caller asks for a dedicated one
+        self.limiter = limiter or (TokenBucketLimiter(rpm) if rpm else shared_limiter())
+        self.api_key = config.API_KEY  # raises now, not once per request, when it is missing
+
+    def get_symbol_raw(self, base_url: str, symbol: str) -> bytes:
+        params = {"symbol": symbol, "apikey": self.api_key}
+        return get_raw(self.session, self.limiter, base_url, params, symbol) or b""
 
     def _get(self, base_url: str, symbol: str):
-        params = {"symbol": symbol, "apikey": config.API_KEY}
-        for attempt in range(5):
-            self.limiter.acquire()
-            try:
-                r = self.session.get(base_url, params=params, timeout=30)
-                if r.status_code == 200:
-                    data = r.json()
-                    if data is None:
-                        return []
-                    return data if isinstance(data, list) else [data]
-                elif r.status_code in (429, 503, 504):
-                    time.sleep(2 ** attempt)
-                else:
-                    log.error("HTTP %s for %s: %s", r.status_code, symbol, r.text[:200])
-                    return []
-            except requests.RequestException as e:
-                log.warning("Request error %s (try %d): %s", symbol, attempt+1, e)
-                time.sleep(2 ** attempt)
-        return []
+        return parse_payload(self.get_symbol_raw(base_url, symbol))
 
     def balance_sheet(self, symbol: str):    
         return self._get(config.FMP_BALANCE_SHEET_URL, symbol)
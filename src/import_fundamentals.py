@@ -1,14 +1,17 @@
 from __future__ import annotations
 import logging
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from typing import Callable
-import pandas as pd
+from functools import partial
 import duckdb
-from tqdm.auto import tqdm
 
-from . import config
+from . import cadence, config, membership
 from .fundamentals_client import FundamentalsClient
-from .merge_parquet import upsert_parquet
+from .datasets import DATASETS
+from .journal import RunJournal
+from .partitioned import is_partitioned
+from .response_cache import PayloadGate, ResponseCache
+from .scheduler import DatasetTask, run_tasks
+from .schemas import decode_frame
+from .sinks import open_sink
 
 log = logging.getLogger(__name__)
 
@@ -19,110 +22,110 @@ def _load_symbols() -> list[str]:
     finally:
         con.close()
 
-def _to_df(records: list[dict]) -> pd.DataFrame:
-    if not records:
-        return pd.DataFrame()
-    df = pd.DataFrame(records)
-    for col in ("date","filingDate","acceptedDate"):
-        if col in df.columns:
-            df[col] = pd.to_datetime(df[col], errors="coerce")
-    if "fiscalYear" in df.columns:
-        df["fiscalYear"] = pd.to_numeric(df["fiscalYear"], errors="coerce").astype("Int64")
-    # gentle numeric casts where obvious (leave others as-is to avoid surprises)
-    return df
-
-def _normalize_segments(records: list[dict]) -> pd.DataFrame:
-    if not records:
-        return pd.DataFrame()
-    rows = []
-    for row in records:
-        base = {
-            "symbol": row.get("symbol"),
-            "reportedCurrency": row.get("reportedCurrency"),
-            "period": row.get("period"),
-            "fiscalYear": row.get("fiscalYear"),
-            "date": row.get("date"),
-        }
-        data = row.get("data") or {}
-        for seg, rev in data.items():
-            r = base.copy()
-            r["segment"] = seg
-            r["revenue"] = rev
-            rows.append(r)
-    df = pd.DataFrame(rows)
-    if not df.empty:
-        df["date"] = pd.to_datetime(df["date"], errors="coerce")
-        df["fiscalYear"] = pd.to_numeric(df["fiscalYear"], errors="coerce").astype("Int64")
-        df["revenue"] = pd.to_numeric(df["revenue"], errors="coerce")
-    return df
-
-def _fetch_upsert(dataset_name: str,
-                  getter: Callable[[FundamentalsClient, str], list[dict]],
-                  out_dir,
-                  key_cols: list[str],
-                  normalize: Callable[[list[dict]], pd.DataFrame] | None,
-                  max_workers: int):
-    client = FundamentalsClient()
-    symbols = _load_symbols()
-
-    totals = {"dataset": dataset_name, "symbols_done": 0, "rows_added": 0, "files_touched": 0}
-    with ThreadPoolExecutor(max_workers=max_workers) as ex:
-        futs = {ex.submit(getter, client, s): s for s in symbols}
-        for fut in tqdm(as_completed(futs), total=len(futs), desc=dataset_name):
-            sym = futs[fut]
-            try:
-                data = fut.result()
-            except Exception as e:
-                log.exception("[%s] error %s: %s", dataset_name, sym, e)
-                continue
-            df = normalize(data) if normalize else _to_df(data)
-            if df.empty:
-                continue
-            if "symbol" not in df.columns:
-                df["symbol"] = sym
-            out_path = (out_dir / f"{sym}.parquet").as_posix()
-            added = upsert_parquet(df, out_path, key_cols=key_cols)
-            totals["rows_added"] += added
-            totals["files_touched"] += 1
-            totals["symbols_done"] += 1
+def _fetch_raw(client: FundamentalsClient, url: str, symbol: str) -> bytes:
+    return client.get_symbol_raw(url, symbol)
+
+async def _afetch_raw(url: str, client, symbol: str) -> bytes:
+    return await client.get_symbol_raw(url, symbol)
+
+def _gated(gate: PayloadGate, fetch, symbol: str) -> bytes:
+    return gate.check(symbol, fetch(symbol))
+
+async def _agated(gate: PayloadGate, afetch, client, symbol: str) -> bytes:
+    return gate.check(symbol, await afetch(client, symbol))
+
+def _cached(cache: ResponseCache, dataset_name: str, symbol: str) -> bytes:
+    return cache.payload(dataset_name, symbol)
+
+def _commit_and_close(gate: PayloadGate, cache: ResponseCache):
+    try:
+        gate.commit()
+    finally:
+        cache.close()
+
+# fundamentals datasets fetched per symbol; schemas and endpoints live in SCHEMAS / DATASETS
+FUNDAMENTALS = ["balance_sheet", "income_statement", "key_metrics", "ratios", "revenue_segments"]
+
+def fundamentals_task(dataset_name: str, symbols: list[str] | None = None,
+                      client: FundamentalsClient | None = None, priority: int = 1,
+                      cache: ResponseCache | None = None) -> DatasetTask:
+    """
+    Fundamentals refresh as a scheduler task. With a response cache (config.RESPONSE_CACHE),
+    payloads byte-identical to the last stored one skip decode, merge and write. Pass
+    the run's cache when running several tasks; one opened here is closed by on_close.
+    """
+    ds = DATASETS[dataset_name]
+    task = DatasetTask(
+        name=dataset_name,
+        symbols=symbols if symbols is not None else _load_symbols(),
+        fetch=partial(_fetch_raw, client or FundamentalsClient(), ds.url),
+        decode=partial(decode_frame, dataset_name),  # response bytes -> Arrow (fixed schema) -> frame
+        sink=open_sink(ds),
+        priority=priority,
+        afetch=partial(_afetch_raw, ds.url),
+    )
+    owned = cache is None and config.RESPONSE_CACHE
+    if owned:
+        cache = ResponseCache()
+    if cache is not None:
+        # a deleted symbol file must be re-written even if the payload did not change
+        on_disk = (lambda sym: True) if is_partitioned(ds) else (lambda sym: (ds.dir / f"{sym}.parquet").exists())
+        gate = PayloadGate(cache, dataset_name, on_disk)
+        task.fetch = partial(_gated, gate, task.fetch)
+        task.afetch = partial(_agated, gate, task.afetch)
+        task.on_written = gate.mark_written
+        task.on_close = partial(_commit_and_close, gate, cache) if owned else gate.commit
+    return task
+
+def replay_task(dataset_name: str, cache: ResponseCache, priority: int = 1) -> DatasetTask:
+    """Rebuild a dataset from the payloads kept in the response cache, without any network access."""
+    return DatasetTask(
+        name=dataset_name,
+        symbols=cache.symbols(dataset_name, with_payload=True),
+        fetch=partial(_cached, cache, dataset_name),
+        decode=partial(decode_frame, dataset_name),
+        sink=open_sink(DATASETS[dataset_name]),
+        priority=priority,
+    )
+
+def replay_fundamentals(datasets: list[str] | None = None, max_workers: int = config.MAX_WORKERS) -> list[dict]:
+    names = datasets or FUNDAMENTALS
+    cache = ResponseCache()
+    try:
+        totals = run_tasks([replay_task(n, cache) for n in names], max_workers=max_workers,
+                           desc="replay", engine="threads")
+    finally:
+        cache.close()
+    return [totals[n] for n in names]
+
+def _fetch_upsert(dataset_name: str, max_workers: int, journal: RunJournal | None = None) -> dict:
+    plan = membership.fetch_plan(dataset_name)
+    symbols, sweep = cadence.due_symbols(plan)
+    cache = ResponseCache() if config.RESPONSE_CACHE else None
+    try:
+        task = membership.track(fundamentals_task(dataset_name, symbols=symbols, cache=cache), plan)
+        if journal is not None:
+            journal.attach(task)
+        totals = run_tasks([task], max_workers=max_workers, desc=dataset_name)[dataset_name]
+    finally:
+        if cache is not None:
+            cache.close()
+    cadence.record_attempts(dataset_name, symbols)
+    if sweep:
+        cadence.record_sweep(dataset_name)
     return totals
 
-def import_balance_sheet(max_workers: int = config.MAX_WORKERS):
-    return _fetch_upsert("balance_sheet",
-                         FundamentalsClient.balance_sheet,
-                         config.PARQUET_BALANCE_SHEET_DIR,
-                         ["symbol","date","period"],
-                         None,
-                         max_workers)
-
-def import_income_statement(max_workers: int = config.MAX_WORKERS):
-    return _fetch_upsert("income_statement",
-                         FundamentalsClient.income_statement,
-                         config.PARQUET_INCOME_STATEMENT_DIR,
-                         ["symbol","date","period"],
-                         None,
-                         max_workers)
-
-def import_key_metrics(max_workers: int = config.MAX_WORKERS):
-    return _fetch_upsert("key_metrics",
-                         FundamentalsClient.key_metrics,
-                         config.PARQUET_KEY_METRICS_DIR,
-                         ["symbol","date","period"],
-                         None,
-                         max_workers)
-
-def import_ratios(max_workers: int = config.MAX_WORKERS):
-    return _fetch_upsert("ratios",
-                         FundamentalsClient.ratios,
-                         config.PARQUET_RATIOS_DIR,
-                         ["symbol","date","period"],
-                         None,
-                         max_workers)
-
-def import_revenue_segments(max_workers: int = config.MAX_WORKERS):
-    return _fetch_upsert("revenue_segments",
-                         FundamentalsClient.revenue_segments,
-                         config.PARQUET_REVENUE_SEGMENTS_DIR,
-                         ["symbol","date","segment"],
-                         _normalize_segments,
-                         max_workers)
+def import_balance_sheet(max_workers: int = config.MAX_WORKERS, journal: RunJournal | None = None):
+    return _fetch_upsert("balance_sheet", max_workers, journal)
+
+def import_income_statement(max_workers: int = config.MAX_WORKERS, journal: RunJournal | None = None):
+    return _fetch_upsert("income_statement", max_workers, journal)
+
+def import_key_metrics(max_workers: int = config.MAX_WORKERS, journal: RunJournal | None = None):
+    return _fetch_upsert("key_metrics", max_workers, journal)
+
+def import_ratios(max_workers: int = config.MAX_WORKERS, journal: RunJournal | None = None):
+    return _fetch_upsert("ratios", max_workers, journal)
+
+def import_revenue_segments(max_workers: int = config.MAX_WORKERS, journal: RunJournal | None = None):
+    return _fetch_upsert("revenue_segments", max_workers, journal)
@@ -1,12 +1,20 @@
 from __future__ import annotations
-import logging
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import json, logging
+from datetime import date, timedelta
+from functools import partial
 import duckdb, pandas as pd
-from tqdm.auto import tqdm
 
-from . import config
-from .merge_parquet import upsert_parquet
+from . import batch_prices, config, membership, metrics, storage
+from .datasets import DATASETS
+from .dense_panel import update_dense_panel
+from .journal import RunJournal
+from .pit_panel import update_pit_panel
+from .price_features import update_price_features
 from .prices_client import PricesClient
+from .scheduler import DatasetTask, run_tasks
+from .schemas import decode_frame, parse_payload
+from .sinks import open_sink
+from .watermarks import WatermarkStore
 
 log = logging.getLogger(__name__)
 
@@ -18,43 +26,164 @@ def _load_symbols() -> list[str]:
     finally:
         con.close()
 
-def _records_to_df(symbol: str, records: list[dict]) -> pd.DataFrame:
-    if not records:
-        return pd.DataFrame()
-    df = pd.DataFrame(records)
-    # enforce known columns; create if missing
-    keep = ["date","adjOpen","adjHigh","adjLow","adjClose","volume"]
-    for c in keep:
-        if c not in df.columns:
-            df[c] = pd.NA
-    df["symbol"] = symbol
-    df["date"] = pd.to_datetime(df["date"], errors="coerce")
-    # cast numerics gently
-    for c in ["adjOpen","adjHigh","adjLow","adjClose","volume"]:
-        if c in df.columns:
-            df[c] = pd.to_numeric(df[c], errors="coerce")
-    return df[["symbol"] + keep].dropna(subset=["date"])
-
-def import_prices(max_workers: int = config.MAX_WORKERS) -> dict:
-    symbols = _load_symbols()
+def _price_window(marks: WatermarkStore, symbol: str, full: bool = False) -> tuple[bool, date | None, date | None]:
+    """(skip, start, end) for one symbol; start None means full history."""
+    wm = None if full else marks.get(symbol)
+    if wm is None:
+        return False, None, None  # new symbol or backfill: full history
+    start, end = wm + timedelta(days=1), date.today()
+    # nothing can have traded since the watermark (same day or only a weekend)
+    if not any((start + timedelta(days=i)).weekday() < 5 for i in range((end - start).days + 1)):
+        return True, None, None
+    # re-request a few stored days too: comparing them tells whether past adjClose moved
+    return False, wm - timedelta(days=config.PRICE_OVERLAP_DAYS), end
+
+def _stored_overlap(marks: WatermarkStore, symbols: list[str]) -> dict[str, dict[str, float]]:
+    """
+    Stored adjClose by ISO date in each symbol's overlap window (the stored days its
+    window request re-reads), for all symbols in one query, as batch_prices._stored_at.
+    """
+    wins = {}
+    for s in symbols:
+        skip, start, _ = _price_window(marks, s)
+        if not skip and start is not None:
+            wins[s] = (start, marks.get(s))
+    if not wins:
+        return {}
+    ds = DATASETS["prices"]
+    frame = pd.DataFrame({"symbol": list(wins), "start": pd.to_datetime([a for a, _ in wins.values()]),
+                          "wm": pd.to_datetime([b for _, b in wins.values()])})
+    con = duckdb.connect()
+    try:
+        src = storage.pruned_source(ds, list(wins), frame["start"].min(), frame["wm"].max())
+        if ds.view in src:
+            storage._maybe_create_view_for_dir(con, ds.view, ds.dir, ds.key_cols)
+        con.register("wins", frame)
+        rows = con.execute(f"""
+            SELECT p.symbol, CAST(p.date AS DATE), p.adjClose
+            FROM {src} p JOIN wins w ON p.symbol = w.symbol
+             AND CAST(p.date AS DATE) BETWEEN CAST(w.start AS DATE) AND CAST(w.wm AS DATE)
+            WHERE p.adjClose IS NOT NULL
+        """).fetchall()
+    finally:
+        con.close()
+    out: dict[str, dict[str, float]] = {}
+    for sym, d, v in rows:
+        out.setdefault(sym, {})[d.isoformat()] = v
+    return out
+
+def _reconcile(symbol: str, wm: date, raw: bytes, stored: dict[str, float]) -> bytes | None:
+    """
+    Check a window payload against the stored overlap closes (see _stored_overlap). Returns only the rows after the
+    watermark when past adjClose values match, or None when the dividend adjustment
+    changed (every earlier row is stale, so the caller re-fetches the full history).
+    """
+    records = [r for r in parse_payload(raw) if r.get("date")]
+    cut = wm.isoformat()
+    overlap = {r["date"][:10]: r.get("adjClose") for r in records if r["date"][:10] <= cut}
+    if overlap:
+        # 1e-4 absorbs FMP's 4-decimal rounding on low-priced symbols
+        moved = [(new, stored[d]) for d, new in overlap.items() if new is not None and d in stored
+                 and abs(new - stored[d]) > config.PRICE_DRIFT_TOLERANCE * abs(stored[d]) + 1e-4]
+        if moved:
+            new, old = moved[0]
+            log.info("%s: adjClose moved in the overlap window (x%.6f on %d days), re-fetching full history",
+                     symbol, new / old if old else float("nan"), len(moved))
+            metrics.count("price_adjustment_drift")
+            return None
+    fresh = [r for r in records if r["date"][:10] > cut]
+    return json.dumps(fresh).encode() if fresh else b""
+
+def _fetch_window(client: PricesClient, marks: WatermarkStore, stored: dict[str, dict[str, float]],
+                  symbol: str, full: bool = False,
+                  backfill: frozenset[str] = frozenset(), routed: dict | None = None) -> bytes | pd.DataFrame:
+    if routed is not None and symbol in routed:
+        return routed.pop(symbol)  # already split out of the bulk EOD files
+    skip, start, end = _price_window(marks, symbol, full or symbol in backfill)
+    if skip:
+        return b""
+    raw = client.historical_divadj_raw(symbol, start=start, end=end)
+    if start is None:
+        return raw
+    out = _reconcile(symbol, marks.get(symbol), raw, stored.get(symbol, {}))
+    return out if out is not None else client.historical_divadj_raw(symbol)
+
+async def _afetch_window(marks: WatermarkStore, stored: dict[str, dict[str, float]], full: bool,
+                         backfill: frozenset[str], routed: dict | None, client, symbol: str) -> bytes | pd.DataFrame:
+    if routed is not None and symbol in routed:
+        return routed.pop(symbol)
+    skip, start, end = _price_window(marks, symbol, full or symbol in backfill)
+    if skip:
+        return b""
+    raw = await client.historical_divadj_raw(symbol, start=start, end=end)
+    if start is None:
+        return raw
+    out = _reconcile(symbol, marks.get(symbol), raw, stored.get(symbol, {}))
+    return out if out is not None else await client.historical_divadj_raw(symbol)
+
+def _decode(symbol: str, payload) -> pd.DataFrame:
+    if isinstance(payload, pd.DataFrame):
+        return payload  # bulk rows are decoded already
+    return decode_frame("prices", symbol, payload)
+
+def prices_task(full: bool = False, symbols: list[str] | None = None, priority: int = 0,
+                changed: dict[str, date] | None = None, backfill: list[str] = (),
+                batch: bool | None = None) -> DatasetTask:
+    """
+    Price refresh as a scheduler task. By default only the window after each symbol's
+    watermark is requested; full=True re-pulls complete histories (backfill), as do
+    the symbols in backfill (index entrants, see membership.fetch_plan).
+    With batch (default config.PRICE_BATCH) recent symbols are served from the bulk
+    EOD files, fetched here up front; only the rest get per-symbol requests.
+    changed, if given, collects symbol -> earliest date written (for derived tables).
+    """
     client = PricesClient()
+    marks = WatermarkStore("prices", config.PARQUET_PRICES_DIR)
+    pending: dict[str, date] = {}
+    symbols = symbols if symbols is not None else _load_symbols()
+    bulk = batch_prices.BatchResult()
+    if (config.PRICE_BATCH if batch is None else batch) and not full:
+        skip = set(backfill)
+        bulk = batch_prices.ingest(client, marks, [s for s in symbols if s not in skip])
+    backfill = frozenset(backfill) | bulk.refetch
+    # overlap closes of every windowed symbol, read once instead of per fetch
+    stored = {} if full else _stored_overlap(marks, [s for s in symbols if s not in backfill and s not in bulk.routed])
+
+    def on_written(sym: str, df: pd.DataFrame):
+        pending[sym] = df["date"].max().date()
+        if changed is not None:
+            changed[sym] = df["date"].min().date()
+
+    def on_close():
+        # only advance watermarks once the sink has committed the rows
+        for sym, d in pending.items():
+            marks.update(sym, d)
+        marks.save()
+
+    return DatasetTask(
+        name="prices",
+        symbols=symbols,
+        fetch=partial(_fetch_window, client, marks, stored, full=full, backfill=backfill, routed=bulk.routed),
+        afetch=partial(_afetch_window, marks, stored, full, backfill, bulk.routed),
+        decode=_decode,
+        sink=open_sink(DATASETS["prices"]),
+        priority=priority,
+        on_written=on_written,
+        on_close=on_close,
+    )
 
-    totals = {"symbols_done":0, "rows_added":0, "files_touched":0}
-    with ThreadPoolExecutor(max_workers=max_workers) as ex:
-        futs = {ex.submit(client.historical_divadj, s): s for s in symbols}
-        for fut in tqdm(as_completed(futs), total=len(futs), desc="Prices"):
-            sym = futs[fut]
-            try:
-                data = fut.result()
-            except Exception as e:
-                log.exception("Error %s: %s", sym, e)
-                continue
-            df = _records_to_df(sym, data)
-            if df.empty:
-                continue
-            out_path = (config.PARQUET_PRICES_DIR / f"{sym}.parquet").as_posix()
-            added = upsert_parquet(df, out_path, key_cols=["symbol","date"])
-            totals["rows_added"] += added
-            totals["files_touched"] += 1
-            totals["symbols_done"] += 1
+def import_prices(max_workers: int = config.MAX_WORKERS, full: bool = False,
+                  journal: RunJournal | None = None) -> dict:
+    changed: dict[str, date] = {}
+    plan = membership.fetch_plan("prices")
+    task = membership.track(prices_task(full=full, symbols=plan.symbols, changed=changed, backfill=plan.backfill), plan)
+    if journal is not None:
+        journal.attach(task)  # also replays jobs committed before a crash into changed / watermarks
+    totals = run_tasks([task], max_workers=max_workers, desc="Prices")["prices"]
+    if config.PRICE_FEATURES:
+        update_price_features(changed)
+    if config.PIT_PANEL:
+        update_pit_panel(changed)
+    if config.DENSE_PANEL:
+        update_dense_panel(changed)
     return totals
@@ -2,11 +2,13 @@ from __future__ import annotations
 import logging
 import pandas as pd
 import requests
-from . import config
+from . import config, membership, versions
+from .rate_limit import shared_limiter
 
 log = logging.getLogger(__name__)
 
 def fetch_sp500_constituents() -> pd.DataFrame:
+    shared_limiter().acquire()
     r = requests.get(
         config.FMP_CONSTITUENTS_URL,
         params={"apikey": config.API_KEY},
@@ -22,5 +24,7 @@ def fetch_sp500_constituents() -> pd.DataFrame:
         if c not in df.columns:
             df[c] = None
 
-    df.to_parquet(config.PARQUET_CONSTITUENTS, index=False)  # snapshot overwrite
+    df.to_parquet(config.PARQUET_CONSTITUENTS, index=False)  # latest snapshot
+    versions.bump("sp500_constituents")
+    membership.record_snapshot(df)  # dated copy + diff: queues entrants for backfill
     return df
@@ -0,0 +1,144 @@
+from __future__ import annotations
+import json, logging, os, threading, time
+from datetime import date
+import pandas as pd
+
+from . import config
+from .datasets import DATASETS
+from .partitioned import is_partitioned
+from .response_cache import content_hash
+
+log = logging.getLogger(__name__)
+
+class RunJournal:
+    """
+    Append-only JSONL of (dataset, symbol, payload hash, rows) for every job a run has
+    finished, at STATE_DIR/journal/<run>.jsonl. An entry is fsync'ed only once the
+    symbol's rows are on disk: after the sink's atomic write for per-symbol files,
+    after the sink flush that wrote them for partitioned datasets (PartitionedSink.on_flush
+    mid-run, or sink.close()), and right after the fetch when the
+    payload was empty. A run started with resume=True skips every journaled job, but
+    replays its (first, last) dates through the task's on_written so watermarks,
+    backfill bookkeeping and derived-table starts still advance; finish() removes the
+    journal once the run got through.
+    """
+    def __init__(self, run: str, resume: bool = False):
+        self.path = config.STATE_DIR / "journal" / f"{run}.jsonl"
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.lock = threading.Lock()
+        self.entries: dict[str, set[str]] = {}
+        self.first: dict[str, dict[str, str]] = {}  # dataset -> symbol -> earliest date written
+        self.last: dict[str, dict[str, str]] = {}   # dataset -> symbol -> latest date written
+        if resume and self.path.exists():
+            with open(self.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        e = json.loads(line)
+                    except json.JSONDecodeError:
+                        break  # torn last line from a crash mid-append
+                    self.entries.setdefault(e["dataset"], set()).add(e["symbol"])
+                    if e.get("first"):
+                        self.first.setdefault(e["dataset"], {})[e["symbol"]] = e["first"]
+                    if e.get("last"):
+                        self.last.setdefault(e["dataset"], {})[e["symbol"]] = e["last"]
+            log.info("Resuming %s: %d jobs already done", run, sum(map(len, self.entries.values())))
+        self.f = open(self.path, "a" if resume else "w", encoding="utf-8")
+
+    def done(self, dataset: str) -> set[str]:
+        return self.entries.get(dataset, set())
+
+    def first_dates(self, dataset: str) -> dict[str, date]:
+        """Earliest date written per symbol by the journaled jobs (feeds derived-table updates on resume)."""
+        return {sym: date.fromisoformat(d) for sym, d in self.first.get(dataset, {}).items()}
+
+    def record(self, dataset: str, symbol: str, payload_hash: str | None = None, rows: int = 0,
+               first: str | None = None, last: str | None = None):
+        line = json.dumps({"dataset": dataset, "symbol": symbol, "hash": payload_hash, "rows": rows,
+                           "first": first, "last": last, "ts": round(time.time(), 3)})
+        with self.lock:
+            self.f.write(line + "\n")
+            self.f.flush()
+            os.fsync(self.f.fileno())
+            self.entries.setdefault(dataset, set()).add(symbol)
+
+    def attach(self, task):
+        """Drop already-journaled symbols from task and journal the rest as they complete."""
+        skip = self.done(task.name)
+        if skip:
+            task.symbols = [s for s in task.symbols if s not in skip]
+        hashes: dict[str, str | None] = {}
+        deferred: list[tuple] = []  # written to a partitioned sink's buffer, not yet flushed
+        flushed: set[str] = set()    # flushed before the main loop saw their write
+        buffered = task.name in DATASETS and is_partitioned(DATASETS[task.name])
+        fetch, afetch, on_written, on_close = task.fetch, task.afetch, task.on_written, task.on_close
+
+        def seen(sym: str, payload):
+            h = content_hash(payload) if isinstance(payload, bytes) else None
+            if isinstance(payload, bytes) and len(payload) < 16 and payload.strip() in (b"", b"[]"):
+                self.record(task.name, sym, h)  # nothing to write
+            else:
+                with self.lock:
+                    hashes[sym] = h
+            return payload
+
+        def _fetch(sym: str):
+            return seen(sym, fetch(sym))
+
+        async def _afetch(client, sym: str):
+            return seen(sym, await afetch(client, sym))
+
+        def _written(sym: str, df):
+            if on_written is not None:
+                on_written(sym, df)
+            with self.lock:
+                h = hashes.pop(sym, None)
+            first = last = None
+            if "date" in df and df["date"].notna().any():
+                first, last = df["date"].min().date().isoformat(), df["date"].max().date().isoformat()
+            if buffered:
+                with self.lock:
+                    # the sink may flush inside write(), before this runs
+                    ready = sym in flushed
+                    flushed.discard(sym)
+                    if not ready:
+                        deferred.append((sym, h, len(df), first, last))
+                if not ready:
+                    return
+            self.record(task.name, sym, h, len(df), first, last)
+
+        def _flushed(symbols: list[str]):
+            with self.lock:
+                syms = set(symbols)
+                ready = [e for e in deferred if e[0] in syms]
+                deferred[:] = [e for e in deferred if e[0] not in syms]
+                flushed.update(syms - {e[0] for e in ready})
+            for entry in ready:
+                self.record(task.name, *entry)
+
+        def _close():
+            if on_close is not None:
+                on_close()
+            for entry in deferred:  # sink.close() has committed the partitions by now
+                self.record(task.name, *entry)
+
+        if on_written is not None:
+            # skipped jobs committed rows before the crash: let the task account for them
+            first, last = self.first.get(task.name, {}), self.last.get(task.name, {})
+            for sym in sorted(skip):
+                if sym in first and sym in last:
+                    on_written(sym, pd.DataFrame({"date": pd.to_datetime([first[sym], last[sym]])}))
+
+        task.fetch, task.on_written, task.on_close = _fetch, _written, _close
+        if buffered and hasattr(task.sink, "on_flush"):
+            task.sink.on_flush = _flushed
+        if afetch is not None:
+            task.afetch = _afetch
+        return task
+
+    def finish(self):
+        """The run completed: the next one starts from scratch."""
+        self.f.close()
+        self.path.unlink(missing_ok=True)
+
+    def close(self):
+        self.f.close()
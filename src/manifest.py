@@ -0,0 +1,197 @@
+from __future__ import annotations
+import hashlib, json, os, threading, uuid
+from datetime import date
+from pathlib import Path
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+MANIFEST_NAME = "_manifest.json"
+
+def dataset_root(path: str | os.PathLike) -> Path:
+    """Dataset directory a data file belongs to (files in _delta/ or year=YYYY/ live one level down)."""
+    parent = Path(path).parent
+    return parent.parent if parent.name.startswith(("_", "year=")) else parent
+
+def schema_hash(schema: pa.Schema) -> str:
+    return hashlib.sha1(str(schema.remove_metadata()).encode()).hexdigest()[:16]
+
+def _day(v) -> str | None:
+    return None if v is None else pd.Timestamp(v).date().isoformat()
+
+def file_stats(table: pa.Table) -> dict:
+    """Row count, date range and per-symbol [rows, min_date, max_date] of one file's contents."""
+    entry = {"rows": table.num_rows, "min_date": None, "max_date": None, "symbols": {},
+             "schema_hash": schema_hash(table.schema)}
+    if table.num_rows == 0 or "symbol" not in table.column_names or "date" not in table.column_names:
+        return entry
+    g = table.select(["symbol", "date"]).group_by("symbol").aggregate(
+        [("date", "min"), ("date", "max"), ("symbol", "count")])
+    for sym, lo, hi, n in zip(*(g[c].to_pylist() for c in ("symbol", "date_min", "date_max", "symbol_count"))):
+        entry["symbols"][sym] = [n, _day(lo), _day(hi)]
+    days = [d for _, lo, hi in entry["symbols"].values() for d in (lo, hi) if d]
+    if days:
+        entry["min_date"], entry["max_date"] = min(days), max(days)
+    return entry
+
+class Manifest:
+    """
+    Per-dataset <dir>/_manifest.json: for every Parquet file (relative path) its
+    row count, date range, symbols, schema hash and mtime/size. Entries are recorded in
+    memory by merge_parquet.write_parquet as each file is published and written out by
+    save() once per batch of writes (sink close, compaction, migration); sync() repairs
+    entries for files changed by anything else, including writes a crash never saved.
+    """
+    def __init__(self, dir_path: Path):
+        self.dir = Path(dir_path)
+        self.path = self.dir / MANIFEST_NAME
+        self.lock = threading.Lock()
+        self.files: dict[str, dict] = {}
+        self._pending: dict[str, dict | None] = {}  # recorded/forgotten since the last save (None = forgotten)
+        self._loaded_mtime = None
+        self._reload()
+
+    def _reload(self):
+        try:
+            mtime = self.path.stat().st_mtime_ns
+        except FileNotFoundError:
+            return
+        if mtime != self._loaded_mtime:
+            with open(self.path, "r", encoding="utf-8") as f:
+                self.files = json.load(f).get("files", {})
+            self._loaded_mtime = mtime
+            for key, entry in self._pending.items():  # unsaved changes stay on top of other processes' writes
+                if entry is None:
+                    self.files.pop(key, None)
+                else:
+                    self.files[key] = entry
+
+    def _save(self):
+        payload = json.dumps({"version": 1, "files": self.files}, sort_keys=True)
+        tmp = f"{self.path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(payload)
+        os.replace(tmp, self.path)  # atomic replace
+        self._loaded_mtime = self.path.stat().st_mtime_ns
+        self._pending.clear()
+
+    def _key(self, path: str | os.PathLike) -> str:
+        return Path(path).resolve().relative_to(self.dir).as_posix()
+
+    def record(self, path: str | os.PathLike, table: pa.Table):
+        st = os.stat(path)
+        entry = {**file_stats(table), "mtime_ns": st.st_mtime_ns, "size": st.st_size}
+        key = self._key(path)
+        with self.lock:
+            self.files[key] = self._pending[key] = entry
+
+    def forget(self, paths: list[str | os.PathLike]):
+        with self.lock:
+            for p in paths:
+                key = self._key(p)
+                self.files.pop(key, None)
+                self._pending[key] = None
+
+    def save(self):
+        """Write the entries recorded or forgotten since the last save, if any."""
+        with self.lock:
+            if self._pending:
+                self._reload()  # pick up writes by other processes
+                self._save()
+
+    def sync(self, save: bool = True) -> int:
+        """
+        Add/refresh entries for files whose mtime or size changed, drop vanished ones.
+        Returns changes. With save=False the repairs stay in memory (readers never write).
+        """
+        with self.lock:
+            self._reload()
+            on_disk = {p.relative_to(self.dir).as_posix(): p.stat() for p in self.dir.rglob("*.parquet")}
+            changed = 0
+            for key in list(self.files):
+                if key not in on_disk:
+                    del self.files[key]
+                    changed += 1
+            for key, st in on_disk.items():
+                e = self.files.get(key)
+                if e and e["mtime_ns"] == st.st_mtime_ns and e["size"] == st.st_size:
+                    continue
+                path = self.dir / key
+                table = pq.read_table(path, columns=[c for c in ("symbol", "date") if c in pq.read_schema(path).names])
+                entry = file_stats(table)
+                entry["schema_hash"] = schema_hash(pq.read_schema(path))
+                self.files[key] = {**entry, "mtime_ns": st.st_mtime_ns, "size": st.st_size}
+                changed += 1
+            if changed and save:
+                self._save()
+            return changed
+
+    # --- metadata-only answers -------------------------------------------------
+
+    @property
+    def exact(self) -> bool:
+        """False while delta segments are pending: their rows may overwrite base rows, so counts are upper bounds."""
+        return not any(k.startswith("_") for k in self.files)
+
+    def coverage(self) -> pd.DataFrame:
+        """symbol, rows, min_date, max_date across all files."""
+        acc: dict[str, list] = {}
+        for e in self.files.values():
+            for sym, (n, lo, hi) in e["symbols"].items():
+                cur = acc.setdefault(sym, [0, lo, hi])
+                cur[0] += n
+                cur[1] = min(filter(None, (cur[1], lo)), default=None)
+                cur[2] = max(filter(None, (cur[2], hi)), default=None)
+        df = pd.DataFrame([(s, n, lo, hi) for s, (n, lo, hi) in sorted(acc.items())],
+                          columns=["symbol", "rows", "min_date", "max_date"])
+        return df.astype({"min_date": "datetime64[ns]", "max_date": "datetime64[ns]"})
+
+    def row_count(self) -> int:
+        return sum(e["rows"] for e in self.files.values())
+
+    def summary(self) -> dict:
+        """Same figures as sample_queries.print_date_range, without touching the data files."""
+        cov = self.coverage().dropna(subset=["min_date"])
+        out = {"total_rows": self.row_count(), "distinct_symbols": len(cov), "exact": self.exact,
+               "min_date": None, "min_symbol": None, "max_date": None, "max_symbol": None}
+        if not cov.empty:
+            lo, hi = cov.loc[cov["min_date"].idxmin()], cov.loc[cov["max_date"].idxmax()]
+            out.update(min_date=lo["min_date"], min_symbol=lo["symbol"], max_date=hi["max_date"], max_symbol=hi["symbol"])
+        return out
+
+    def freshness(self) -> dict:
+        """Latest stored date per symbol and when the dataset was last written."""
+        cov = self.coverage()
+        last = max((e["mtime_ns"] for e in self.files.values()), default=None)
+        return {"max_date": dict(zip(cov["symbol"], cov["max_date"])),
+                "last_write": pd.Timestamp(last, unit="ns") if last else None}
+
+    def files_for(self, symbols: list[str] | None = None, start: date | str | None = None,
+                  end: date | str | None = None) -> list[Path]:
+        """Files that can hold rows for symbols within [start, end], from the recorded stats."""
+        lo = None if start is None else pd.Timestamp(start).date().isoformat()
+        hi = None if end is None else pd.Timestamp(end).date().isoformat()
+        wanted = None if symbols is None else set(symbols)
+        out = []
+        for key, e in sorted(self.files.items()):
+            spans = [v for s, v in e["symbols"].items() if wanted is None or s in wanted]
+            if any((lo is None or (v[2] or "") >= lo) and (hi is None or (v[1] or "") <= hi) for v in spans):
+                out.append(self.dir / key)
+        return out
+
+_open: dict[Path, Manifest] = {}
+_open_lock = threading.Lock()
+
+def open_manifest(dir_path: Path) -> Manifest:
+    """Process-wide Manifest for dir_path (shared so concurrent writers serialize on one lock)."""
+    key = Path(dir_path).resolve()
+    with _open_lock:
+        if key not in _open:
+            _open[key] = Manifest(key)
+        return _open[key]
+
+def load(dir_path: Path) -> Manifest:
+    """Manifest for dir_path, brought up to date with the files on disk (without writing it)."""
+    m = open_manifest(dir_path)
+    m.sync(save=False)
+    return m
@@ -0,0 +1,110 @@
+from __future__ import annotations
+import logging
+from pathlib import Path
+import duckdb
+
+from . import config
+from .datasets import DATASETS, Dataset
+from .merge_parquet import DELTA_DIRNAME, symbol_of
+from .partitioned import PARTITION_GLOB
+
+log = logging.getLogger(__name__)
+
+STATE_TABLE = "_materialized_files"
+
+def table_name(ds: Dataset) -> str:
+    return "t_" + ds.view.removeprefix("v_")
+
+def relation(view: str, source: str | None = None, schema: str | None = None) -> str:
+    """
+    Name to query for a dataset view: the view itself or its materialized table
+    (qualified with schema when market.duckdb is attached). Views without a table,
+    like the constituents and membership views, always stay views.
+    """
+    if (source or config.QUERY_SOURCE) == "table" and any(ds.view == view for ds in DATASETS.values()):
+        return (f"{schema}." if schema else "") + "t_" + view.removeprefix("v_")
+    return view
+
+def _files(ds: Dataset) -> dict[str, tuple[int, int]]:
+    out = {}
+    for pattern in ("*.parquet", f"{DELTA_DIRNAME}/*.parquet", PARTITION_GLOB):
+        for p in ds.dir.glob(pattern):
+            st = p.stat()
+            out[p.as_posix()] = (st.st_mtime_ns, st.st_size)
+    return out
+
+def _unit(path: str) -> tuple[str, str | int]:
+    # what a changed file invalidates: a whole year partition, or one symbol
+    p = Path(path)
+    if p.parent.name.startswith("year="):
+        return "year", int(p.parent.name.split("=", 1)[1])
+    return "symbol", symbol_of(p)
+
+def _table_exists(con: duckdb.DuckDBPyConnection, name: str) -> bool:
+    return con.execute(
+        "SELECT COUNT(*) FROM information_schema.tables WHERE table_name = ? AND table_type = 'BASE TABLE'",
+        [name]).fetchone()[0] > 0
+
+def _save_state(con: duckdb.DuckDBPyConnection, ds: Dataset, files: dict[str, tuple[int, int]]):
+    con.execute(f"DELETE FROM {STATE_TABLE} WHERE dataset = ?", [ds.name])
+    if files:
+        con.executemany(f"INSERT INTO {STATE_TABLE} VALUES (?, ?, ?, ?)",
+                        [(ds.name, f, m, s) for f, (m, s) in files.items()])
+
+def refresh_table(con: duckdb.DuckDBPyConnection, ds: Dataset, full: bool = False) -> dict:
+    """
+    Bring t_<dataset> in line with the Parquet files behind v_<dataset>, re-ingesting
+    only the symbols (or year partitions) whose files changed since the last refresh.
+    """
+    tbl = table_name(ds)
+    res = {"dataset": ds.name, "table": tbl, "mode": "noop", "units": 0}
+    con.execute(f"CREATE TABLE IF NOT EXISTS {STATE_TABLE} "
+                "(dataset VARCHAR, file VARCHAR, mtime_ns BIGINT, size BIGINT)")
+    view_ok = con.execute("SELECT COUNT(*) FROM information_schema.views WHERE table_name = ?",
+                          [ds.view]).fetchone()[0] > 0
+    if not view_ok:
+        con.execute(f"DROP TABLE IF EXISTS {tbl}")
+        _save_state(con, ds, {})
+        return res
+
+    files = _files(ds)
+    known = {f: (m, s) for f, m, s in con.execute(
+        f"SELECT file, mtime_ns, size FROM {STATE_TABLE} WHERE dataset = ?", [ds.name]).fetchall()}
+    changed = {f for f in files.keys() | known.keys() if files.get(f) != known.get(f)}
+    if not changed and not full and _table_exists(con, tbl):
+        return res
+
+    keys = ", ".join(ds.key_cols)
+    con.execute("BEGIN TRANSACTION")
+    try:
+        if full or not _table_exists(con, tbl):
+            con.execute(f"CREATE OR REPLACE TABLE {tbl} AS SELECT * FROM {ds.view} ORDER BY {keys}")
+            res.update(mode="full", units=len(files))
+        else:
+            units = {_unit(f) for f in changed}
+            symbols = sorted(u for kind, u in units if kind == "symbol")
+            years = sorted(u for kind, u in units if kind == "year")
+            conds = []
+            if symbols:
+                conds.append("symbol IN (SELECT UNNEST(?::VARCHAR[]))")
+            if years:
+                conds.append("year(date) IN (SELECT UNNEST(?::INTEGER[]))")
+            where = " OR ".join(conds)
+            params = [p for p in (symbols, years) if p]
+            con.execute(f"DELETE FROM {tbl} WHERE {where}", params)
+            # BY NAME so column order differences between files and table don't matter
+            con.execute(f"INSERT INTO {tbl} BY NAME SELECT * FROM {ds.view} WHERE {where} ORDER BY {keys}", params)
+            res.update(mode="incremental", units=len(units))
+        _save_state(con, ds, files)
+        con.execute("COMMIT")
+    except duckdb.Error:
+        con.execute("ROLLBACK")
+        if full:
+            raise
+        # e.g. a new column appeared in the files: rebuild from scratch
+        log.warning("Incremental refresh of %s failed; rebuilding", tbl, exc_info=True)
+        return refresh_table(con, ds, full=True)
+    return res
+
+def refresh_tables(con: duckdb.DuckDBPyConnection, datasets: list[str] | None = None, full: bool = False) -> list[dict]:
+    return [refresh_table(con, DATASETS[name], full=full) for name in (datasets or list(DATASETS))]
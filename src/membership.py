@@ -0,0 +1,168 @@
+from __future__ import annotations
+import json, logging, os, threading, uuid
+from dataclasses import dataclass, field
+from datetime import date
+import pandas as pd
+
+from . import config, versions
+from .datasets import DATASETS
+
+log = logging.getLogger(__name__)
+
+# Dated constituent snapshots (<SNAPSHOT_DIR>/<YYYY-MM-DD>.parquet) are diffed on every
+# constituents fetch. Entrants are queued for a full-history backfill of every fetched
+# dataset (STATE_DIR/membership.json) until each dataset has written them; removed
+# symbols drop out of the fetch plan and keep the rows they have.
+
+_lock = threading.Lock()
+
+def _state_path():
+    return config.STATE_DIR / "membership.json"
+
+def _fetched_datasets() -> list[str]:
+    return [ds.name for ds in DATASETS.values() if ds.url]
+
+def snapshot_dates() -> list[date]:
+    return sorted(date.fromisoformat(p.stem) for p in config.CONSTITUENT_SNAPSHOTS_DIR.glob("*.parquet"))
+
+def read_snapshot(as_of: date) -> pd.DataFrame:
+    return pd.read_parquet(config.CONSTITUENT_SNAPSHOTS_DIR / f"{as_of.isoformat()}.parquet")
+
+@dataclass
+class MembershipDiff:
+    as_of: date
+    added: list[str] = field(default_factory=list)
+    removed: list[str] = field(default_factory=list)
+    kept: list[str] = field(default_factory=list)
+
+@dataclass
+class FetchPlan:
+    """Symbols for one dataset: incumbents refresh incrementally, entrants pull full history."""
+    dataset: str
+    incremental: list[str]
+    backfill: list[str]
+    frozen: list[str]
+
+    @property
+    def symbols(self) -> list[str]:
+        return sorted(self.incremental + self.backfill)
+
+def _load_state() -> dict:
+    try:
+        with open(_state_path(), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {"backfill": {}}
+
+def _save_state(state: dict):
+    path = _state_path()
+    tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(state, f, sort_keys=True, indent=0)
+    os.replace(tmp, path)  # atomic replace
+
+def record_snapshot(df: pd.DataFrame, as_of: date | None = None) -> MembershipDiff:
+    """
+    Store df as the snapshot for as_of (today) and diff it against the previous one.
+    Reruns on the same day diff against that day's earlier snapshot, so entrants are
+    queued once. The very first snapshot only seeds history: nothing is queued.
+    """
+    as_of = as_of or date.today()
+    config.CONSTITUENT_SNAPSHOTS_DIR.mkdir(parents=True, exist_ok=True)
+    prior = [d for d in snapshot_dates() if d <= as_of]
+    cur = set(df["symbol"].dropna())
+    diff = MembershipDiff(as_of)
+    if prior:
+        prev = set(read_snapshot(prior[-1])["symbol"].dropna())
+        diff.added, diff.removed, diff.kept = sorted(cur - prev), sorted(prev - cur), sorted(cur & prev)
+    else:
+        diff.kept = sorted(cur)
+
+    path = config.CONSTITUENT_SNAPSHOTS_DIR / f"{as_of.isoformat()}.parquet"
+    tmp = path.with_name(f".{path.name}.{uuid.uuid4().hex}.tmp")
+    df.assign(snapshot_date=pd.Timestamp(as_of)).to_parquet(tmp, index=False)
+    os.replace(tmp, path)
+
+    with _lock:
+        state = _load_state()
+        pending = state.setdefault("backfill", {})
+        for name in _fetched_datasets():
+            syms = set(pending.get(name, [])) - set(diff.removed) | set(diff.added)
+            pending[name] = sorted(syms)
+        _save_state(state)
+    write_membership()
+    log.info("Constituents %s: +%d -%d (%d kept)", as_of, len(diff.added), len(diff.removed), len(diff.kept))
+    return diff
+
+def membership_frame() -> pd.DataFrame:
+    """
+    One row per membership spell: (symbol, start, end), end NULL while still a member.
+    A symbol in the first snapshot starts at its dateFirstAdded when FMP reports one.
+    """
+    dates = snapshot_dates()
+    spells: list[tuple] = []
+    open_: dict[str, pd.Timestamp] = {}  # symbol -> start of its current spell
+    for i, d in enumerate(dates):
+        snap = read_snapshot(d)
+        cur = set(snap["symbol"].dropna())
+        first_added = {}
+        if i == 0 and "dateFirstAdded" in snap.columns:
+            first_added = dict(zip(snap["symbol"], pd.to_datetime(snap["dateFirstAdded"], errors="coerce")))
+        for sym in cur - set(open_):
+            start = first_added.get(sym)
+            open_[sym] = start if start is not None and not pd.isna(start) else pd.Timestamp(d)
+        for sym in set(open_) - cur:
+            spells.append((sym, open_.pop(sym), pd.Timestamp(d)))
+    spells += [(sym, start, pd.NaT) for sym, start in open_.items()]
+    out = pd.DataFrame(spells, columns=["symbol", "start", "end"])
+    return out.astype({"symbol": "string", "start": "datetime64[us]", "end": "datetime64[us]"}) \
+        .sort_values(["symbol", "start"], ignore_index=True)
+
+def write_membership():
+    """Rewrite the survivorship-aware membership table read by v_sp500_membership."""
+    path = config.PARQUET_MEMBERSHIP
+    tmp = path.with_name(f".{path.name}.{uuid.uuid4().hex}.tmp")
+    membership_frame().to_parquet(tmp, index=False)
+    os.replace(tmp, path)
+    versions.bump("sp500_membership")
+
+def fetch_plan(dataset: str) -> FetchPlan:
+    """Current members split into incremental / backfill for dataset, plus frozen ex-members."""
+    members = set(pd.read_parquet(config.PARQUET_CONSTITUENTS, columns=["symbol"])["symbol"].dropna())
+    seen = set()
+    if config.PARQUET_MEMBERSHIP.exists():
+        seen = set(pd.read_parquet(config.PARQUET_MEMBERSHIP, columns=["symbol"])["symbol"].dropna())
+    with _lock:
+        pending = set(_load_state().get("backfill", {}).get(dataset, []))
+    backfill = pending & members
+    return FetchPlan(dataset, sorted(members - backfill), sorted(backfill), sorted(seen - members))
+
+def mark_backfilled(dataset: str, symbols: list[str]):
+    if not symbols:
+        return
+    with _lock:
+        state = _load_state()
+        pending = state.setdefault("backfill", {})
+        pending[dataset] = sorted(set(pending.get(dataset, [])) - set(symbols))
+        _save_state(state)
+
+def track(task, plan: FetchPlan):
+    """Clear plan.backfill symbols from the queue once task's sink has committed them."""
+    if not plan.backfill:
+        return task
+    wanted, written = set(plan.backfill), []
+    on_written, on_close = task.on_written, task.on_close
+
+    def _written(sym: str, df: pd.DataFrame):
+        if on_written is not None:
+            on_written(sym, df)
+        if sym in wanted:
+            written.append(sym)
+
+    def _close():
+        if on_close is not None:
+            on_close()
+        mark_backfilled(plan.dataset, written)
+
+    task.on_written, task.on_close = _written, _close
+    return task
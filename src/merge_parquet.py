@@ -1,8 +1,43 @@
 from __future__ import annotations
-import os, uuid
+import os, time, uuid
+from itertools import chain
+from pathlib import Path
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 
-def upsert_parquet(df_new: pd.DataFrame, path: str, key_cols: list[str]) -> int:
+from . import changelog, config, metrics
+from .manifest import dataset_root, open_manifest
+from .writer_profiles import WriterProfile, matches, prepare, profile_for
+
+DELTA_DIRNAME = "_delta"
+
+def _to_table(df: pd.DataFrame, schema: pa.Schema | None) -> pa.Table:
+    if schema is None:
+        return pa.Table.from_pandas(df, preserve_index=False)
+    # conform to the dataset schema: same columns, order and types in every file
+    missing = [f.name for f in schema if f.name not in df.columns]
+    if missing:
+        df = df.assign(**{c: None for c in missing})
+    return pa.Table.from_pandas(df, schema=schema, preserve_index=False, safe=False)
+
+def write_parquet(df: pd.DataFrame | pa.Table, path: str | os.PathLike, schema: pa.Schema | None = None,
+                  profile: WriterProfile | None = None, **kwargs):
+    """
+    Atomically write df to path (temp file + rename), cast to schema when given,
+    and record the file's stats in its dataset manifest. Sort order, row groups,
+    codec and encodings come from the dataset's writer profile (kwargs override).
+    """
+    t0 = time.perf_counter()
+    table = df if isinstance(df, pa.Table) else _to_table(df, schema)
+    table, opts = prepare(table, profile or profile_for(path))
+    tmp = f"{os.fspath(path)}.{uuid.uuid4().hex}.tmp"
+    pq.write_table(table, tmp, **(opts | kwargs))
+    os.replace(tmp, path)  # atomic replace
+    metrics.observe("parquet_write", time.perf_counter() - t0, nbytes=os.path.getsize(path))
+    open_manifest(dataset_root(path)).record(path, table)
+
+def upsert_parquet(df_new: pd.DataFrame, path: str, key_cols: list[str], schema: pa.Schema | None = None) -> int:
     """
     Upsert df_new into parquet at path using key_cols as unique key.
     Returns number of newly added rows after dedup (updated rows count as 0 added).
@@ -11,16 +46,127 @@ def upsert_parquet(df_new: pd.DataFrame, path: str, key_cols: list[str]) -> int:
         return 0
 
     if os.path.exists(path):
-        df_old = pd.read_parquet(path)
+        with metrics.timed("upsert_read"):
+            df_old = pd.read_parquet(path)
         before = len(df_old)
-        df = pd.concat([df_old, df_new], ignore_index=True)
-        df = df.drop_duplicates(subset=key_cols, keep="last")
+        with metrics.timed("upsert_merge"):
+            df = pd.concat([df_old, df_new], ignore_index=True)
+            df = df.drop_duplicates(subset=key_cols, keep="last")
         added = len(df) - before
     else:
-        df = df_new
+        df_old, df = None, df_new
         added = len(df)
+    changes = changelog.diff_rows(df_old, df_new, key_cols) if config.CHANGELOG else None
 
-    tmp = f"{path}.{uuid.uuid4().hex}.tmp"
-    df.to_parquet(tmp, index=False)
-    os.replace(tmp, path)  # atomic replace
+    write_parquet(df, path, schema)
+    if changes is not None:  # only once the rows are published
+        changelog.record(dataset_root(path).name, *changes)
     return max(0, added)
+
+def symbol_of(path: str | os.PathLike) -> str:
+    """Symbol of a base file ({SYMBOL}.parquet) or delta segment; tickers may contain dots (BRK.B)."""
+    p = Path(path)
+    if p.parent.name == DELTA_DIRNAME:
+        return p.name.rsplit(".", 3)[0]  # {SYMBOL}.{time_ns:020d}.{uuid}.parquet
+    return p.name.removesuffix(".parquet")
+
+def delta_segments(path: str) -> list[Path]:
+    """Delta segments for the base file at path, oldest first."""
+    base = Path(path)
+    ddir = base.parent / DELTA_DIRNAME
+    if not ddir.is_dir():
+        return []
+    # names are {SYMBOL}.{time_ns:020d}.{uuid}.parquet, so lexical order == write order;
+    # the glob alone would also match BRK.B's segments for BRK
+    return sorted(p for p in ddir.glob(f"{base.stem}.*.parquet") if symbol_of(p) == base.stem)
+
+def append_delta(df_new: pd.DataFrame, path: str, key_cols: list[str], schema: pa.Schema | None = None) -> int:
+    """
+    Write df_new as a new delta segment next to the base file at path instead of
+    rewriting it. Returns rows written: inserts and updates are not distinguished, since
+    that would mean reading the base (SymbolFileSink reports them as rows_written).
+    Symbols without a base file yet are written as the base directly.
+    """
+    if df_new is None or df_new.empty:
+        return 0
+    if not os.path.exists(path):
+        return upsert_parquet(df_new, path, key_cols, schema)
+
+    base = Path(path)
+    ddir = base.parent / DELTA_DIRNAME
+    ddir.mkdir(exist_ok=True)
+    df = df_new.drop_duplicates(subset=key_cols, keep="last")
+    seg = ddir / f"{base.stem}.{time.time_ns():020d}.{uuid.uuid4().hex[:8]}.parquet"
+    write_parquet(df, seg, schema)  # atomic publish
+    changelog.record(dataset_root(path).name, upserted=df)  # base not read: insert vs update unknown
+
+    segs = delta_segments(path)
+    if (len(segs) >= config.DELTA_COMPACT_SEGMENTS
+            or sum(s.stat().st_size for s in segs) >= config.DELTA_COMPACT_BYTES):
+        compact_parquet(path, key_cols, schema)
+    return len(df)
+
+def compact_parquet(path: str, key_cols: list[str], schema: pa.Schema | None = None) -> int:
+    """
+    Merge the delta segments of path into the base file (last write wins on key_cols)
+    and remove them. Returns the number of segments merged.
+    """
+    segs = delta_segments(path)
+    if not segs:
+        return 0
+    frames = [pd.read_parquet(path)] if os.path.exists(path) else []
+    frames += [pd.read_parquet(s) for s in segs]
+    df = pd.concat(frames, ignore_index=True).drop_duplicates(subset=key_cols, keep="last")
+
+    write_parquet(df, path, schema)
+    # A crash before this point leaves segments that are already merged; replaying
+    # them later is harmless because they are identical to what the base now holds.
+    for s in segs:
+        os.remove(s)
+    open_manifest(dataset_root(path)).forget(segs)
+    return len(segs)
+
+def compact_dir(dir_path: Path, key_cols: list[str], min_bytes: int = 0, schema: pa.Schema | None = None) -> dict:
+    """Compact every symbol in dir_path whose pending deltas total at least min_bytes."""
+    totals = {"symbols_compacted": 0, "segments_merged": 0}
+    ddir = dir_path / DELTA_DIRNAME
+    if not ddir.is_dir():
+        return totals
+    for sym in sorted({symbol_of(p) for p in ddir.glob("*.parquet")}):
+        path = (dir_path / f"{sym}.parquet").as_posix()
+        if sum(s.stat().st_size for s in delta_segments(path)) < min_bytes:
+            continue
+        totals["segments_merged"] += compact_parquet(path, key_cols, schema)
+        totals["symbols_compacted"] += 1
+    open_manifest(dir_path).save()
+    return totals
+
+def rewrite_dir(dir_path: Path, force: bool = False) -> dict:
+    """
+    Rewrite every data file under dir_path (base files, delta segments, year partitions)
+    with its writer profile. Files already written with the profile's codec and sort
+    order are skipped unless force.
+    """
+    totals = {"files": 0, "rewritten": 0, "bytes_before": 0, "bytes_after": 0}
+    for p in sorted(chain(dir_path.glob("*.parquet"), (dir_path / DELTA_DIRNAME).glob("*.parquet"),
+                          dir_path.glob("year=*/*.parquet"))):
+        totals["files"] += 1
+        profile = profile_for(p)
+        if not force and matches(p, profile):
+            continue
+        before = p.stat().st_size
+        write_parquet(pq.ParquetFile(p).read(), p, profile=profile)  # no hive columns from the path
+        totals["rewritten"] += 1
+        totals["bytes_before"] += before
+        totals["bytes_after"] += p.stat().st_size
+    open_manifest(dir_path).save()
+    return totals
+
+def write_rows(df_new: pd.DataFrame, path: str, key_cols: list[str], mode: str | None = None,
+               schema: pa.Schema | None = None) -> int:
+    """Write df_new for one symbol file using the configured storage mode."""
+    if (mode or config.STORAGE_MODE) == "delta":
+        return append_delta(df_new, path, key_cols, schema)
+    # switching back from delta mode: fold pending segments first so they can't shadow this write
+    compact_parquet(path, key_cols, schema)
+    return upsert_parquet(df_new, path, key_cols, schema)
@@ -0,0 +1,116 @@
+"""
+Process-wide timing registry for the import path. Hooks call timed()/observe()/count();
+finish_run() writes a JSON report (and optionally a Prometheus textfile) with
+p50/p95/p99 per stage so a slow run shows where the wall-clock time went.
+
+Stages recorded: rate_limit_wait, http (per attempt), fetch / decode / write (per
+dataset and symbol), upsert_read, upsert_merge, parquet_write, ensure_db.
+"""
+from __future__ import annotations
+import json, os, threading, time, uuid
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+import numpy as np
+
+from . import config
+
+_lock = threading.Lock()
+_samples: dict[tuple[str, str], list[float]] = defaultdict(list)  # (stage, dataset) -> seconds
+_bytes: dict[tuple[str, str], int] = defaultdict(int)
+_counters: dict[str, int] = defaultdict(int)
+_per_symbol: dict[tuple[str, str], float] = defaultdict(float)    # (dataset, symbol) -> seconds
+_started = time.time()
+
+def observe(stage: str, seconds: float, dataset: str = "", symbol: str | None = None, nbytes: int = 0):
+    if not config.METRICS:
+        return
+    with _lock:
+        _samples[(stage, dataset)].append(seconds)
+        if nbytes:
+            _bytes[(stage, dataset)] += nbytes
+        if symbol is not None:
+            _per_symbol[(dataset, symbol)] += seconds
+
+@contextmanager
+def timed(stage: str, dataset: str = "", symbol: str | None = None):
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(stage, time.perf_counter() - t0, dataset, symbol)
+
+def count(name: str, n: int = 1):
+    if not config.METRICS:
+        return
+    with _lock:
+        _counters[name] += n
+
+def reset():
+    global _started
+    with _lock:
+        _samples.clear()
+        _bytes.clear()
+        _counters.clear()
+        _per_symbol.clear()
+        _started = time.time()
+
+def report(run: str = "run", top_symbols: int = 20) -> dict:
+    with _lock:
+        samples = {k: np.asarray(v) for k, v in _samples.items()}
+        nbytes, counters, per_symbol = dict(_bytes), dict(_counters), dict(_per_symbol)
+    stages = []
+    for (stage, dataset), v in sorted(samples.items()):
+        p50, p95, p99 = np.percentile(v, [50, 95, 99])
+        stages.append({"stage": stage, "dataset": dataset, "count": int(v.size), "total_s": round(float(v.sum()), 6),
+                       "p50_s": round(float(p50), 6), "p95_s": round(float(p95), 6), "p99_s": round(float(p99), 6),
+                       "max_s": round(float(v.max()), 6), "bytes": nbytes.get((stage, dataset), 0)})
+    slowest = sorted(per_symbol.items(), key=lambda kv: kv[1], reverse=True)[:top_symbols]
+    return {"run": run, "started": datetime.fromtimestamp(_started).isoformat(timespec="seconds"),
+            "wall_s": round(time.time() - _started, 3), "stages": stages, "counters": counters,
+            "slowest_symbols": [{"dataset": d, "symbol": s, "seconds": round(t, 6)} for (d, s), t in slowest]}
+
+def _atomic_write(path: Path, text: str):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+def _label(v: str) -> str:
+    return v.replace("\\", "\\\\").replace('"', '\\"')
+
+def prometheus_text(rep: dict) -> str:
+    run = _label(rep["run"])
+    lines = ["# HELP fmp_stage_seconds Import stage durations.", "# TYPE fmp_stage_seconds summary"]
+    for s in rep["stages"]:
+        lbl = f'run="{run}",stage="{_label(s["stage"])}",dataset="{_label(s["dataset"])}"'
+        for q, key in (("0.5", "p50_s"), ("0.95", "p95_s"), ("0.99", "p99_s")):
+            lines.append(f'fmp_stage_seconds{{{lbl},quantile="{q}"}} {s[key]}')
+        lines.append(f"fmp_stage_seconds_sum{{{lbl}}} {s['total_s']}")
+        lines.append(f"fmp_stage_seconds_count{{{lbl}}} {s['count']}")
+    lines += ["# HELP fmp_stage_bytes_total Bytes moved by each stage.", "# TYPE fmp_stage_bytes_total counter"]
+    for s in rep["stages"]:
+        if s["bytes"]:
+            lines.append(f'fmp_stage_bytes_total{{run="{run}",stage="{_label(s["stage"])}",dataset="{_label(s["dataset"])}"}} {s["bytes"]}')
+    lines += ["# HELP fmp_events_total Retries, throttles and other events.", "# TYPE fmp_events_total counter"]
+    for name, n in sorted(rep["counters"].items()):
+        lines.append(f'fmp_events_total{{run="{run}",event="{_label(name)}"}} {n}')
+    lines += ["# HELP fmp_run_wall_seconds Wall-clock time of the run.", "# TYPE fmp_run_wall_seconds gauge",
+              f'fmp_run_wall_seconds{{run="{run}"}} {rep["wall_s"]}',
+              "# HELP fmp_run_last_success_timestamp_seconds When the run finished.",
+              "# TYPE fmp_run_last_success_timestamp_seconds gauge",
+              f'fmp_run_last_success_timestamp_seconds{{run="{run}"}} {time.time():.0f}']
+    return "\n".join(lines) + "\n"
+
+def finish_run(run: str) -> Path | None:
+    """Write <REPORT_DIR>/<run>-<timestamp>.json (and METRICS_PROM_FILE if set). Returns the report path."""
+    if not config.METRICS:
+        return None
+    rep = report(run)
+    path = config.REPORT_DIR / f"{run}-{datetime.now():%Y%m%dT%H%M%S}.json"
+    _atomic_write(path, json.dumps(rep, indent=2))
+    if config.METRICS_PROM_FILE:
+        _atomic_write(Path(config.METRICS_PROM_FILE), prometheus_text(rep))
+    return path
@@ -0,0 +1,199 @@
+from __future__ import annotations
+import gzip, json, math, random, threading, time, zlib
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+
+from .schemas import SCHEMAS
+
+# path under /stable/ -> dataset whose schema shapes the synthetic payload
+ENDPOINTS = {
+    "historical-price-eod/dividend-adjusted": "prices",
+    "balance-sheet-statement": "balance_sheet",
+    "income-statement": "income_statement",
+    "key-metrics": "key_metrics",
+    "ratios": "ratios",
+    "revenue-product-segmentation": "revenue_segments",
+}
+_HEAD = {"symbol", "date", "reportedCurrency", "cik", "filingDate", "acceptedDate", "fiscalYear", "period"}
+
+def _seed(*parts) -> int:
+    return zlib.crc32("|".join(map(str, parts)).encode())
+
+def symbols(n: int) -> list[str]:
+    return [f"S{i:04d}" for i in range(n)]
+
+def constituents(n: int) -> list[dict]:
+    sectors = ["Information Technology", "Health Care", "Financials", "Industrials", "Energy"]
+    return [{"symbol": s, "name": f"Company {s}", "sector": sectors[i % len(sectors)], "subSector": "Synthetic",
+             "headQuarter": "Nowhere, USA", "dateFirstAdded": "2000-01-03", "cik": f"{i:010d}", "founded": "1990"}
+            for i, s in enumerate(symbols(n))]
+
+def prices(symbol: str, start: date, end: date) -> list[dict]:
+    """Business-day bars, newest first like FMP. A bar depends only on (symbol, day), so windows agree."""
+    phase = _seed(symbol) % 1000 / 100
+    rows, d = [], end
+    while d >= start:
+        if d.weekday() < 5:
+            t = d.toordinal()
+            close = round(50 + 0.01 * (t % 5000) + 10 * math.sin(t / 20 + phase), 4)
+            rows.append({"symbol": symbol, "date": d.isoformat(), "adjOpen": close * 0.995, "adjHigh": close * 1.01,
+                         "adjLow": close * 0.99, "adjClose": close, "volume": 1_000_000 + _seed(symbol, t) % 500_000})
+        d -= timedelta(days=1)
+    return rows
+
+def eod_bulk(n: int, day: date) -> str:
+    """CSV like FMP's eod-bulk: one row per symbol for day (no dividends, so close == adjClose)."""
+    lines = ["symbol,date,open,low,high,close,adjClose,volume"]
+    for sym in symbols(n):
+        for r in prices(sym, day, day):
+            lines.append(f"{sym},{r['date']},{r['adjOpen']},{r['adjLow']},{r['adjHigh']},{r['adjClose']},"
+                         f"{r['adjClose']},{r['volume']}")
+    return "\n".join(lines) + "\n"
+
+def fundamentals(dataset: str, symbol: str, periods: int, today: date) -> list[dict]:
+    """`periods` fiscal-year rows (newest first) with every schema field filled."""
+    rng = random.Random(_seed(dataset, symbol))
+    measures = [f.name for f in SCHEMAS[dataset] if f.name not in _HEAD and f.name not in ("segment", "revenue")]
+    rows = []
+    for k in range(periods):
+        fy = today.year - 1 - k
+        end = date(fy, 12, 31)
+        row = {"symbol": symbol, "date": end.isoformat(), "reportedCurrency": "USD", "cik": "0000000000",
+               "filingDate": (end + timedelta(days=60)).isoformat(),
+               "acceptedDate": f"{(end + timedelta(days=60)).isoformat()} 16:05:00",
+               "fiscalYear": str(fy), "period": "FY"}
+        if dataset == "revenue_segments":
+            row["data"] = {f"Segment {j}": rng.randrange(10**8, 10**10) for j in range(4)}
+        else:
+            row.update({m: round(rng.uniform(-1e9, 1e10), 2) for m in measures})
+        rows.append(row)
+    return rows
+
+class MockFMPServer:
+    """
+    Local stand-in for the FMP stable endpoints in config.FMP_*_URL (point FMP_BASE_URL
+    at .base_url). Serves synthetic payloads, or recorded ones from
+    record_dir/<endpoint path, / -> _>/<SYMBOL>.json when present, with optional latency and
+    injected 429s. Use as a context manager; GET /__stats returns request counters.
+    """
+    def __init__(self, n_symbols: int = 500, years: int = 5, periods: int = 5, latency: float = 0.0,
+                 jitter: float = 0.0, rate_429: float = 0.0, retry_after: float = 1.0,
+                 record_dir: Path | None = None, port: int = 0, seed: int = 0):
+        self.n_symbols, self.years, self.periods = n_symbols, years, periods
+        self.latency, self.jitter = latency, jitter
+        self.rate_429, self.retry_after = rate_429, retry_after
+        self.record_dir = Path(record_dir) if record_dir else None
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.stats = {"requests": 0, "ok": 0, "throttled": 0, "bytes_sent": 0}
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", port), self._handler())
+        self.httpd.daemon_threads = True
+        self.thread: threading.Thread | None = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.httpd.server_address[1]}"
+
+    def __enter__(self) -> MockFMPServer:
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True, name="mock-fmp")
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def payload(self, endpoint: str, params: dict) -> list[dict] | str | None:
+        sym = params.get("symbol", "")
+        if self.record_dir is not None:
+            rec = self.record_dir / endpoint.replace("/", "_") / f"{sym}.json"
+            if rec.exists():
+                return json.loads(rec.read_text(encoding="utf-8"))
+        today = date.today()
+        if endpoint == "sp500-constituent":
+            return constituents(self.n_symbols)
+        if endpoint == "eod-bulk":
+            day = date.fromisoformat(params["date"])
+            return eod_bulk(self.n_symbols, day) if day <= today else eod_bulk(0, day)
+        dataset = ENDPOINTS.get(endpoint)
+        if dataset is None:
+            return None
+        if dataset == "prices":
+            start = date.fromisoformat(params["from"]) if "from" in params else today - timedelta(days=365 * self.years)
+            end = min(date.fromisoformat(params["to"]) if "to" in params else today, today)
+            return prices(sym, start, end)
+        return fundamentals(dataset, sym, self.periods, today)
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive, like the real API
+
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status: int, body: bytes, headers: dict | None = None):
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                for k, v in (headers or {}).items():
+                    self.send_header(k, v)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+                with server.lock:
+                    server.stats["bytes_sent"] += len(body)
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                if url.path == "/__stats":
+                    with server.lock:
+                        body = json.dumps(server.stats).encode()
+                    return self._send(200, body)
+                with server.lock:
+                    server.stats["requests"] += 1
+                    throttle = server.rng.random() < server.rate_429
+                    delay = server.latency + server.jitter * server.rng.random()
+                if delay > 0:
+                    time.sleep(delay)
+                if throttle:
+                    with server.lock:
+                        server.stats["throttled"] += 1
+                    return self._send(429, b'{"Error Message": "Limit Reach"}', {"Retry-After": str(server.retry_after)})
+                params = {k: v[0] for k, v in parse_qs(url.query).items()}
+                data = server.payload(url.path.removeprefix("/stable/"), params)
+                if data is None:
+                    return self._send(404, b'{"Error Message": "unknown endpoint"}')
+                body, headers = (data if isinstance(data, str) else json.dumps(data)).encode(), {}
+                if "gzip" in self.headers.get("Accept-Encoding", ""):
+                    body, headers = gzip.compress(body, compresslevel=1), {"Content-Encoding": "gzip"}
+                with server.lock:
+                    server.stats["ok"] += 1
+                self._send(200, body, headers)
+
+        return Handler
+
+def serve(port_queue=None, **kwargs):
+    """Run a MockFMPServer until the process is killed (reports its port on port_queue)."""
+    with MockFMPServer(**kwargs) as srv:
+        if port_queue is not None:
+            port_queue.put(srv.httpd.server_address[1])
+        srv.thread.join()
+
+if __name__ == "__main__":
+    import argparse
+    ap = argparse.ArgumentParser(description="Local FMP stand-in (set FMP_BASE_URL to the printed URL)")
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--symbols", type=int, default=500)
+    ap.add_argument("--years", type=int, default=5, help="price history served when no from/to is given")
+    ap.add_argument("--periods", type=int, default=5, help="fiscal years per fundamentals payload")
+    ap.add_argument("--latency-ms", type=float, default=0.0)
+    ap.add_argument("--rate-429", type=float, default=0.0, help="fraction of requests answered with 429")
+    ap.add_argument("--record-dir", type=Path, help="serve <dir>/<endpoint path, / -> _>/<SYMBOL>.json where present")
+    a = ap.parse_args()
+    with MockFMPServer(a.symbols, a.years, a.periods, a.latency_ms / 1000, rate_429=a.rate_429,
+                       record_dir=a.record_dir, port=a.port) as srv:
+        print(f"FMP_BASE_URL={srv.base_url}", flush=True)
+        srv.thread.join()
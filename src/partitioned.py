@@ -0,0 +1,127 @@
+from __future__ import annotations
+import logging, os
+from pathlib import Path
+import duckdb
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from . import changelog, config
+from .datasets import Dataset
+from .manifest import open_manifest
+from .merge_parquet import compact_dir, write_parquet
+from .schemas import SCHEMAS
+
+log = logging.getLogger(__name__)
+
+PARTITION_GLOB = "year=*/*.parquet"
+
+def is_partitioned(ds: Dataset) -> bool:
+    return ds.name in config.PARTITIONED_DATASETS or any(ds.dir.glob("year=*"))
+
+def partition_path(dir_path: Path, year: int) -> Path:
+    return dir_path / f"year={year}" / "data.parquet"
+
+def _write_partition(df: pd.DataFrame, path: Path, schema: pa.Schema | None = None):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    write_parquet(df, path, schema)  # partition profile: sorted by (date, symbol), PARTITION_ROW_GROUP_SIZE
+
+def upsert_partitioned(df_new: pd.DataFrame, dir_path: Path, key_cols: list[str],
+                       schema: pa.Schema | None = None, overwrite: bool = True) -> int:
+    """
+    Upsert df_new into the year partitions it touches (last write wins on key_cols;
+    with overwrite=False rows already partitioned are kept and only new keys added).
+    Each touched partition is rewritten once, sorted by (date, symbol).
+    Returns number of newly added rows.
+    """
+    if df_new is None or df_new.empty:
+        return 0
+    dated = df_new.dropna(subset=["date"])
+    if len(dated) < len(df_new):
+        log.warning("Dropping %d rows without a date from %s", len(df_new) - len(dated), dir_path.name)
+
+    added = 0
+    for year, part in dated.groupby(dated["date"].dt.year):
+        path = partition_path(dir_path, int(year))
+        if path.exists():
+            df_old = pd.read_parquet(path)
+            if not overwrite:
+                stored = pd.MultiIndex.from_frame(df_old[key_cols])
+                part = part[~pd.MultiIndex.from_frame(part[key_cols]).isin(stored)]
+                if part.empty:
+                    continue
+            before = len(df_old)
+            df = pd.concat([df_old, part], ignore_index=True).drop_duplicates(subset=key_cols, keep="last")
+        else:
+            df_old, before, df = None, 0, part.drop_duplicates(subset=key_cols, keep="last")
+        changes = changelog.diff_rows(df_old, part, key_cols) if config.CHANGELOG else None
+        _write_partition(df, path, schema)
+        if changes is not None:
+            changelog.record(dir_path.name, *changes)
+        added += len(df) - before
+    return max(0, added)
+
+def _quote(p: Path) -> str:
+    return p.as_posix().replace("'", "''")
+
+def migrate_to_partitioned(ds: Dataset) -> dict:
+    """
+    Convert <dataset>/{SYMBOL}.parquet files into <dataset>/year=YYYY/data.parquet.
+    Pending delta segments are compacted first; symbol files are removed only after
+    the partitioned row count matches the source. Rows without a date have no year to
+    go to, so their presence refuses the migration before anything is copied.
+    """
+    schema = SCHEMAS.get(ds.name)
+    compact_dir(ds.dir, list(ds.key_cols), schema=schema)
+    files = sorted(ds.dir.glob("*.parquet"))
+    if not files:
+        return {"dataset": ds.name, "files_in": 0, "partitions": 0, "rows": 0}
+
+    src = f"read_parquet('{_quote(ds.dir / '*.parquet')}', union_by_name=true)"
+    con = duckdb.connect()
+    try:
+        undated = con.execute(f"SELECT COUNT(*) FROM {src} WHERE date IS NULL").fetchone()[0]
+        if undated:
+            raise RuntimeError(f"{ds.name}: {undated} rows without a date in the symbol files; "
+                               "fix or remove them before partitioning (nothing was migrated)")
+        keys = ", ".join(ds.key_cols)
+        expected = con.execute(
+            f"SELECT COUNT(*) FROM (SELECT DISTINCT {keys} FROM {src} WHERE date IS NOT NULL)").fetchone()[0]
+        years = [r[0] for r in con.execute(
+            f"SELECT DISTINCT year(date) FROM {src} WHERE date IS NOT NULL ORDER BY 1").fetchall()]
+        for year in years:
+            df = con.execute(f"SELECT * FROM {src} WHERE year(date) = ?", [year]).fetchdf()
+            # rows already partitioned were written after the layout switched, so they win
+            # (also makes re-running a half-finished migration a no-op for them)
+            upsert_partitioned(df, ds.dir, list(ds.key_cols), schema, overwrite=False)
+    finally:
+        con.close()
+
+    rows = sum(pq.read_metadata(p).num_rows for p in ds.dir.glob(PARTITION_GLOB))
+    if rows < expected:
+        raise RuntimeError(f"{ds.name}: partitioned rows {rows} < source keys {expected}; keeping symbol files")
+    for f in files:
+        os.remove(f)
+    m = open_manifest(ds.dir)
+    m.forget(files)
+    m.save()
+    return {"dataset": ds.name, "files_in": len(files), "partitions": len(years), "rows": rows}
+
+def migrate_to_symbol_files(ds: Dataset) -> dict:
+    """Reverse of migrate_to_partitioned: split year partitions back into {SYMBOL}.parquet."""
+    parts = sorted(ds.dir.glob(PARTITION_GLOB))
+    if not parts:
+        return {"dataset": ds.name, "partitions": 0, "files_out": 0}
+    df = pd.concat([pd.read_parquet(p) for p in parts], ignore_index=True)
+    n = 0
+    for sym, g in df.groupby("symbol"):
+        write_parquet(g, ds.dir / f"{sym}.parquet", SCHEMAS.get(ds.name))
+        n += 1
+    for p in parts:
+        os.remove(p)
+        if not any(p.parent.iterdir()):
+            p.parent.rmdir()
+    m = open_manifest(ds.dir)
+    m.forget(parts)
+    m.save()
+    return {"dataset": ds.name, "partitions": len(parts), "files_out": n}
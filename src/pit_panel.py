@@ -0,0 +1,159 @@
+from __future__ import annotations
+import logging, os, uuid
+from datetime import date
+from pathlib import Path
+import duckdb
+import pandas as pd
+
+from . import config, storage, versions
+from .datasets import DATASETS
+from .schemas import PIT_FIELDS, SCHEMAS
+from .sinks import open_sink
+
+log = logging.getLogger(__name__)
+
+BATCH_SYMBOLS = 50
+_FULL = pd.Timestamp("1900-01-01")
+
+def _view_exists(con: duckdb.DuckDBPyConnection, view: str) -> bool:
+    return con.execute("SELECT COUNT(*) FROM information_schema.views WHERE table_name = ?", [view]).fetchone()[0] > 0
+
+def _columns(con: duckdb.DuckDBPyConnection, view: str) -> set[str]:
+    return {r[0] for r in con.execute(f"DESCRIBE {view}").fetchall()}
+
+def _known_sql(con: duckdb.DuckDBPyConnection, name: str) -> str | None:
+    """
+    SELECT of (symbol, period_date, filed, fields...) for one dataset, or None if it has
+    no files yet. key_metrics / ratios carry no filing date: they borrow the income
+    statement's for the same period, else assume period end + PIT_FILING_LAG_DAYS.
+    """
+    ds = DATASETS[name]
+    if not _view_exists(con, ds.view):
+        return None
+    have = _columns(con, ds.view)  # files written before a field was added may lack it
+    cols = ", ".join(f"f.{c}" if c in have else f"NULL::DOUBLE AS {c}" for c in PIT_FIELDS[name])
+    lag = f"f.date + INTERVAL {config.PIT_FILING_LAG_DAYS} DAY"
+    if "filingDate" in have:
+        filed = ", ".join([f"f.{c}" for c in ("filingDate", "acceptedDate") if c in have] + [lag])
+        filed, join = f"coalesce({filed})", ""
+    elif (_view_exists(con, DATASETS["income_statement"].view)
+          and "filingDate" in _columns(con, DATASETS["income_statement"].view)):
+        filed = f"coalesce(i.filingDate, {lag})"
+        join = (f"LEFT JOIN (SELECT symbol, date, period, min(filingDate) AS filingDate "
+                f"FROM {DATASETS['income_statement'].view} GROUP BY ALL) i USING (symbol, date, period)")
+    else:
+        filed, join = lag, ""
+    # usable from the day after filing; one row per (symbol, filed): the newest period end
+    # wins, and on the same period end (FY and Q4 filed together) the annual report does
+    order = "f.date DESC" + (", f.period = 'FY' DESC, f.period DESC" if "period" in have else "")
+    return f"""
+        SELECT f.symbol, f.date AS period_date, CAST({filed} AS DATE) AS filed,
+               CAST({filed} AS DATE) + 1 AS usable, {cols}
+        FROM {ds.view} f {join}
+        WHERE f.date IS NOT NULL
+        QUALIFY row_number() OVER (PARTITION BY f.symbol, CAST({filed} AS DATE) ORDER BY {order}) = 1"""
+
+def _panel_sql(con: duckdb.DuckDBPyConnection) -> str:
+    ctes = ["px AS (SELECT p.symbol, p.date, p.adjClose FROM v_prices p JOIN starts s USING (symbol) "
+            "WHERE p.date >= s.start AND p.adjClose IS NOT NULL)"]
+    select, joins = ["px.symbol", "px.date", "px.adjClose"], []
+    for i, (name, fields) in enumerate(PIT_FIELDS.items()):
+        sql, a = _known_sql(con, name), f"f{i}"
+        if sql is None:
+            select += [f"NULL::TIMESTAMP AS {name}_date", f"NULL::TIMESTAMP AS {name}_filed"]
+            select += [f"NULL::DOUBLE AS {c}" for c in fields]
+            continue
+        ctes.append(f"{a} AS ({sql})")
+        joins.append(f"ASOF LEFT JOIN {a} ON px.symbol = {a}.symbol AND px.date >= {a}.usable")
+        select += [f"{a}.period_date AS {name}_date", f"CAST({a}.filed AS TIMESTAMP) AS {name}_filed"]
+        select += [f"{a}.{c}" for c in fields]
+    return (f"WITH {', '.join(ctes)}\nSELECT {', '.join(select)}\nFROM px\n" + "\n".join(joins)
+            + "\nORDER BY px.symbol, px.date")
+
+def _seen_path() -> Path:
+    return config.STATE_DIR / "pit_panel_filings.parquet"
+
+def _filings(con: duckdb.DuckDBPyConnection) -> pd.DataFrame:
+    """dataset, symbol, usable, h (hash of the filing's period, filed date and fields) of every known filing."""
+    parts = []
+    for name, fields in PIT_FIELDS.items():
+        sql = _known_sql(con, name)
+        if sql is not None:
+            parts.append(f"SELECT '{name}' AS dataset, symbol, usable, "
+                         f"hash(period_date, filed, {', '.join(fields)}) AS h FROM ({sql})")
+    if not parts:
+        return pd.DataFrame(columns=["dataset", "symbol", "usable", "h"])
+    return con.execute(" UNION ALL ".join(parts)).fetchdf()
+
+def _load_seen() -> pd.DataFrame:
+    """Filings the stored panel reflects (empty before the first build: every filing counts as new)."""
+    try:
+        return pd.read_parquet(_seen_path())
+    except FileNotFoundError:
+        return pd.DataFrame(columns=["dataset", "symbol", "usable", "h"])
+
+def _save_seen(filings: pd.DataFrame):
+    tmp = _seen_path().with_name(f"{_seen_path().name}.{uuid.uuid4().hex}.tmp")
+    filings.to_parquet(tmp, index=False)
+    os.replace(tmp, _seen_path())  # atomic replace
+
+def _starts(con: duckdb.DuckDBPyConnection, changed: dict[str, date] | None, full: bool,
+            filings: pd.DataFrame) -> pd.DataFrame:
+    """Per symbol, the first panel date to recompute (symbols with nothing new are left out)."""
+    prices, panel = DATASETS["prices"], DATASETS["pit_panel"]
+    syms = con.execute(f"SELECT symbol, max(date) AS last_price FROM {prices.view} GROUP BY 1").fetchdf()
+    if full or not _view_exists(con, panel.view):
+        return syms.assign(start=_FULL)[["symbol", "start"]]
+    last = con.execute(f"SELECT symbol, max(date) AS last_panel FROM {panel.view} GROUP BY 1").fetchdf()
+    df = syms.merge(last, on="symbol", how="left")
+    df["start"] = (df["last_panel"] + pd.Timedelta(days=1)).fillna(_FULL)
+    # filings added, restated or removed since the last build (backfilled older filings
+    # included) must be applied from their usable date
+    keys = ["dataset", "symbol", "usable", "h"]
+    diff = filings[keys].merge(_load_seen()[keys], on=keys, how="outer", indicator=True)
+    new = diff[diff["_merge"] != "both"].groupby("symbol")["usable"].min()
+    new = pd.to_datetime(df["symbol"].map(new.to_dict()))
+    df["start"] = df["start"].where(new.isna() | (df["start"] <= new), new)
+    for sym, d in (changed or {}).items():
+        df.loc[df["symbol"] == sym, "start"] = df.loc[df["symbol"] == sym, "start"].clip(upper=pd.Timestamp(d))
+    df = df[df["start"] <= df["last_price"]]
+    return df[["symbol", "start"]].reset_index(drop=True)
+
+def update_pit_panel(changed: dict[str, date] | None = None, full: bool = False) -> dict:
+    """
+    Bring the daily point-in-time panel (v_pit_panel) up to date: one row per
+    (symbol, trading day) with the latest fundamentals known by that day.
+    Only the tail from the first date touched by new prices or new, restated or
+    backfilled filings is recomputed per symbol; changed adds earliest price dates
+    rewritten by a price run. The filings the panel reflects are kept in
+    STATE_DIR/pit_panel_filings.parquet (a missing file recomputes every symbol once).
+    """
+    panel = DATASETS["pit_panel"]
+    totals = {"dataset": panel.name, "symbols_done": 0, "rows_added": 0, "rows_computed": 0}
+    con = duckdb.connect()
+    try:
+        for ds in DATASETS.values():
+            if ds.name in ("prices", "pit_panel", *PIT_FIELDS):
+                storage._maybe_create_view_for_dir(con, ds.view, ds.dir, ds.key_cols)
+        if not _view_exists(con, DATASETS["prices"].view):
+            return totals
+        filings = _filings(con)
+        starts = _starts(con, changed, full, filings)
+        sql = _panel_sql(con)
+        sink = open_sink(panel)
+        schema = SCHEMAS["pit_panel"]
+        for i in range(0, len(starts), BATCH_SYMBOLS):
+            con.register("starts", starts.iloc[i:i + BATCH_SYMBOLS])
+            df = con.execute(sql).fetchdf()[schema.names]
+            totals["rows_computed"] += len(df)
+            for sym, g in df.groupby("symbol", sort=False):
+                totals["rows_added"] += sink.write(sym, g.reset_index(drop=True))
+                totals["symbols_done"] += 1
+        totals["rows_added"] += sink.close()
+        _save_seen(filings)  # only once the panel holds them
+    finally:
+        con.close()
+    if totals["symbols_done"]:
+        versions.bump(panel.name)
+    log.info("PIT panel: %s", totals)
+    return totals
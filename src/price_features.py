@@ -0,0 +1,111 @@
+from __future__ import annotations
+import logging
+from datetime import date
+import duckdb
+import pandas as pd
+
+from . import storage, versions
+from .datasets import DATASETS
+from .schemas import SCHEMAS
+from .sinks import open_sink
+
+log = logging.getLogger(__name__)
+
+# Calendar days of history read before the first recomputed date: covers the longest
+# window (200 sessions) plus weekends and holidays.
+LOOKBACK_DAYS = 400
+BATCH_SYMBOLS = 50
+_FULL = pd.Timestamp("1900-01-01")
+
+def _sma(n: int) -> str:
+    w = f"(PARTITION BY symbol ORDER BY date ROWS BETWEEN {n - 1} PRECEDING AND CURRENT ROW)"
+    return f"CASE WHEN count(adjClose) OVER {w} = {n} THEN avg(adjClose) OVER {w} END AS sma_{n}"
+
+def _vol(n: int) -> str:
+    w = f"(PARTITION BY symbol ORDER BY date ROWS BETWEEN {n - 1} PRECEDING AND CURRENT ROW)"
+    return f"CASE WHEN count(log_ret_1d) OVER {w} = {n} THEN stddev_samp(log_ret_1d) OVER {w} * sqrt(252) END AS vol_{n}d"
+
+# Features for every row on/after each symbol's start date. `peak` (running max of
+# adjClose) is seeded from the stored row before start, so drawdowns stay exact
+# without re-reading the whole history.
+FEATURES_SQL = f"""
+WITH px AS (
+    SELECT p.symbol, p.date, p.adjClose, s.start, s.seed_peak
+    FROM v_prices p JOIN starts s USING (symbol)
+    WHERE p.date >= s.start - INTERVAL {LOOKBACK_DAYS} DAY AND p.adjClose IS NOT NULL
+), r AS (
+    SELECT *,
+        adjClose / lag(adjClose) OVER (PARTITION BY symbol ORDER BY date) - 1 AS ret_1d,
+        -- ln() raises on a non-positive ratio; a bad bar only loses its own log return
+        CASE WHEN adjClose > 0 AND lag(adjClose) OVER (PARTITION BY symbol ORDER BY date) > 0
+             THEN ln(adjClose / lag(adjClose) OVER (PARTITION BY symbol ORDER BY date)) END AS log_ret_1d,
+        max(adjClose) OVER (PARTITION BY symbol ORDER BY date ROWS UNBOUNDED PRECEDING) AS run_max
+    FROM px
+), f AS (
+    SELECT symbol, date, start, adjClose, ret_1d, log_ret_1d, {_vol(21)}, {_vol(63)},
+        {_sma(20)}, {_sma(50)}, {_sma(200)},
+        greatest(run_max, coalesce(seed_peak, run_max)) AS peak
+    FROM r
+)
+SELECT * EXCLUDE (start), adjClose / peak - 1 AS drawdown
+FROM f WHERE date >= start
+ORDER BY symbol, date
+"""
+
+def _view_exists(con: duckdb.DuckDBPyConnection, view: str) -> bool:
+    return con.execute("SELECT COUNT(*) FROM information_schema.views WHERE table_name = ?", [view]).fetchone()[0] > 0
+
+def update_price_features(changed: dict[str, date] | None = None) -> dict:
+    """
+    Bring the price_features dataset (v_price_features) up to date.
+    changed maps symbol -> earliest price date written in this run (prices_task
+    collects it); only rows from that date on are recomputed. None rebuilds every
+    symbol from its full history.
+    """
+    prices, feats = DATASETS["prices"], DATASETS["price_features"]
+    totals = {"dataset": feats.name, "symbols_done": 0, "rows_added": 0, "rows_computed": 0}
+    if changed is not None and not changed:
+        return totals
+    con = duckdb.connect()
+    try:
+        storage._maybe_create_view_for_dir(con, prices.view, prices.dir, prices.key_cols)
+        if not _view_exists(con, prices.view):
+            return totals
+        storage._maybe_create_view_for_dir(con, feats.view, feats.dir, feats.key_cols)
+        has_feats = _view_exists(con, feats.view)
+
+        if changed is None:
+            starts = pd.DataFrame({"symbol": [r[0] for r in con.execute(
+                f"SELECT DISTINCT symbol FROM {prices.view} ORDER BY 1").fetchall()]})
+            starts["start"] = _FULL
+        else:
+            starts = pd.DataFrame({"symbol": list(changed), "start": pd.to_datetime(list(changed.values()))})
+        starts["seed_peak"] = float("nan")
+        if changed is not None and has_feats:
+            con.register("wanted", starts[["symbol", "start"]])
+            seeds = con.execute(f"""
+                SELECT f.symbol, arg_max(f.peak, f.date) AS seed_peak, COUNT(*) AS n
+                FROM {feats.view} f JOIN wanted w USING (symbol)
+                WHERE f.date < w.start GROUP BY 1""").fetchdf().set_index("symbol")
+            starts["seed_peak"] = starts["symbol"].map(seeds["seed_peak"])
+            # no stored features before start yet: compute the symbol from scratch
+            starts.loc[~starts["symbol"].isin(seeds.index), "start"] = _FULL
+        elif changed is not None:
+            starts["start"] = _FULL
+
+        sink = open_sink(feats)
+        schema = SCHEMAS["price_features"]
+        for i in range(0, len(starts), BATCH_SYMBOLS):
+            con.register("starts", starts.iloc[i:i + BATCH_SYMBOLS])
+            df = con.execute(FEATURES_SQL).fetchdf()[schema.names]
+            totals["rows_computed"] += len(df)
+            for sym, g in df.groupby("symbol", sort=False):
+                totals["rows_added"] += sink.write(sym, g.reset_index(drop=True))
+                totals["symbols_done"] += 1
+        totals["rows_added"] += sink.close()
+    finally:
+        con.close()
+    if totals["symbols_done"]:
+        versions.bump(feats.name)
+    log.info("Price features: %s", totals)
+    return totals
@@ -1,31 +1,36 @@
 from __future__ import annotations
-import time, logging
+import json, logging
+from datetime import date
 import requests
-from .rate_limit import MinuteRateLimiter
+from .fmp_http import get_raw, new_session
+from .rate_limit import TokenBucketLimiter, shared_limiter
 from . import config
 
 log = logging.getLogger(__name__)
 
 class PricesClient:
-    def __init__(self, session: requests.Session | None = None, rpm: int = config.REQUESTS_PER_MINUTE):
-        self.session = session or requests.Session()
-        self.limiter = MinuteRateLimiter(rpm)
+    def __init__(self, session: requests.Session | None = None, rpm: int | None = None,
+                 limiter: TokenBucketLimiter | None = None):
+        self.session = session or new_session()
+        # one process-wide budget unless the caller asks for a dedicated one
+        self.limiter = limiter or (TokenBucketLimiter(rpm) if rpm else shared_limiter())
+        self.api_key = config.API_KEY  # raises now, not once per request, when it is missing
 
-    def historical_divadj(self, symbol: str) -> list[dict]:
-        params = {"symbol": symbol, "apikey": config.API_KEY}
-        for attempt in range(5):
-            self.limiter.acquire()
-            try:
-                r = self.session.get(config.FMP_PRICES_URL, params=params, timeout=30)
-                if r.status_code == 200:
-                    data = r.json() or []
-                    return data if isinstance(data, list) else []
-                elif r.status_code in (429, 503, 504):
-                    time.sleep(2 ** attempt)
-                else:
-                    log.error("HTTP %s %s: %s", r.status_code, symbol, r.text[:200])
-                    return []
-            except requests.RequestException as e:
-                log.warning("Request error %s (try %d): %s", symbol, attempt+1, e)
-                time.sleep(2 ** attempt)
-        return []
+    def historical_divadj_raw(self, symbol: str, start: date | None = None, end: date | None = None) -> bytes:
+        # No window means full history (backfills); otherwise FMP's inclusive from/to range.
+        params = {"symbol": symbol, "apikey": self.api_key}
+        if start is not None:
+            params["from"] = start.isoformat()
+        if end is not None:
+            params["to"] = end.isoformat()
+        return get_raw(self.session, self.limiter, config.FMP_PRICES_URL, params, symbol) or b""
+
+    def eod_bulk_raw(self, day: date) -> bytes:
+        # One trading day for every symbol (CSV); empty until the day's file is published.
+        params = {"date": day.isoformat(), "apikey": self.api_key}
+        return get_raw(self.session, self.limiter, config.FMP_EOD_BULK_URL, params, f"eod-bulk {day}")
+
+    def historical_divadj(self, symbol: str, start: date | None = None, end: date | None = None) -> list[dict]:
+        raw = self.historical_divadj_raw(symbol, start, end)
+        data = json.loads(raw) if raw else []
+        return data if isinstance(data, list) else []
@@ -0,0 +1,150 @@
+"""
+Read API for notebooks and services. One in-memory DuckDB connection per process
+holds the dataset views (no lock on market.duckdb, so importers keep running);
+results come back as Arrow tables and are kept in an LRU cache keyed by the query
+and the version stamps (versions.py) of the datasets it reads, so a repeated query
+is free until an import changes one of them.
+"""
+from __future__ import annotations
+import threading
+from collections import OrderedDict
+from datetime import date
+import duckdb
+import pyarrow as pa
+
+from . import config, storage, versions
+from .datasets import DATASETS
+from .materialize import relation
+
+_lock = threading.Lock()
+_con: duckdb.DuckDBPyConnection | None = None
+_con_versions: dict[str, int] | None = None
+_cache: OrderedDict[tuple, pa.Table] = OrderedDict()
+_cache_bytes = 0
+_BY_VIEW = {ds.view: ds.name for ds in DATASETS.values()} | {"v_sp500_constituents": "sp500_constituents",
+                                                                "v_sp500_membership": "sp500_membership"}
+
+def _cursor() -> duckdb.DuckDBPyConnection:
+    """Cursor on the shared connection; views are rebuilt once any dataset version moved."""
+    global _con, _con_versions
+    current = versions.snapshot()
+    with _lock:
+        if _con is None:
+            _con = duckdb.connect()
+            _con.execute("SET parquet_metadata_cache = true")  # footers parsed once per file, not per query
+        if _con_versions != current:
+            # new files or layouts (partitions, deltas) change what each view has to read
+            storage.create_views(_con)
+            if config.QUERY_SOURCE == "table":
+                # materialized tables live in market.duckdb; re-attach to see the latest refresh
+                _con.execute("DETACH DATABASE IF EXISTS db")
+                _con.execute(f"ATTACH '{storage._sql_quote_path(config.DB_FILE)}' AS db (READ_ONLY)")
+            _con_versions = current
+        return _con.cursor()
+
+def exists(view: str) -> bool:
+    cur = _cursor()
+    try:
+        return cur.execute("SELECT COUNT(*) FROM information_schema.views WHERE table_name = ?",
+                           [view]).fetchone()[0] > 0
+    finally:
+        cur.close()
+
+def sql(query: str, params: list | None = None, cache: bool = True) -> pa.Table:
+    """
+    Run query and return an Arrow table. Cached until any dataset whose view
+    (v_<name>) appears in the query gets a new version; queries that name no dataset
+    (e.g. read_parquet(...) directly) are not cached, since nothing would expire them.
+    """
+    global _cache_bytes
+    stamps = versions.snapshot()
+    read = tuple(sorted((name, stamps.get(name, 0)) for view, name in _BY_VIEW.items()
+                        if view in query or f"t_{name}" in query))
+    cache = cache and bool(read)
+    key = (query, tuple(tuple(p) if isinstance(p, list) else p for p in params or ()), read)
+    if cache:
+        with _lock:
+            hit = _cache.get(key)
+            if hit is not None:
+                _cache.move_to_end(key)
+                return hit
+    cur = _cursor()
+    try:
+        res = cur.execute(query, params or [])
+        # to_arrow_table() on newer duckdb; fetch_arrow_table() before it
+        table = res.to_arrow_table() if hasattr(res, "to_arrow_table") else res.fetch_arrow_table()
+    finally:
+        cur.close()
+    if cache and table.nbytes <= config.QUERY_CACHE_BYTES:
+        with _lock:
+            if key not in _cache:
+                _cache[key] = table
+                _cache_bytes += table.nbytes
+            while len(_cache) > config.QUERY_CACHE_SIZE or _cache_bytes > config.QUERY_CACHE_BYTES:
+                _cache_bytes -= _cache.popitem(last=False)[1].nbytes
+    return table
+
+def clear_cache():
+    global _cache_bytes
+    with _lock:
+        _cache.clear()
+        _cache_bytes = 0
+
+def _cols(columns: list[str] | None) -> str:
+    # quoted, so a column list can never carry SQL of its own
+    return ", ".join('"' + str(c).replace('"', '""') + '"' for c in columns) if columns else "*"
+
+def _in(symbols: list[str] | None) -> tuple[str, list]:
+    if not symbols:
+        return "TRUE", []
+    return "symbol IN (SELECT UNNEST(?::VARCHAR[]))", [sorted(symbols)]
+
+def check_select(query: str):
+    """Raise PermissionError unless query is exactly one SELECT statement."""
+    stmts = duckdb.extract_statements(query)
+    if len(stmts) != 1 or stmts[0].type != duckdb.StatementType.SELECT:
+        raise PermissionError("only a single SELECT statement is allowed")
+
+def price_history_sql(symbols: list[str] | None = None, start: date | str | None = None,
+                      end: date | str | None = None, columns: list[str] | None = None,
+                      dataset: str = "prices") -> tuple[str, list]:
+    where, params = _in(symbols)
+    if start is not None:
+        where, params = where + " AND date >= ?", params + [str(start)]
+    if end is not None:
+        where, params = where + " AND date <= ?", params + [str(end)]
+    rel = relation(DATASETS[dataset].view, schema="db")
+    return f"SELECT {_cols(columns)} FROM {rel} WHERE {where} ORDER BY symbol, date", params
+
+def price_history(symbols: list[str] | None = None, start: date | str | None = None,
+                  end: date | str | None = None, columns: list[str] | None = None,
+                  dataset: str = "prices") -> pa.Table:
+    """Daily rows of prices (or price_features / pit_panel) for symbols within [start, end], by symbol, date."""
+    return sql(*price_history_sql(symbols, start, end, columns, dataset))
+
+def latest_fundamentals_sql(dataset: str, symbols: list[str] | None = None, as_of: date | str | None = None,
+                            columns: list[str] | None = None) -> tuple[str, list]:
+    where, params = _in(symbols)
+    if as_of is not None:
+        where, params = where + " AND date <= ?", params + [str(as_of)]
+    rel = relation(DATASETS[dataset].view, schema="db")
+    return f"""
+        SELECT {_cols(columns)} FROM {rel} WHERE {where}
+        QUALIFY row_number() OVER (PARTITION BY symbol ORDER BY date DESC) = 1
+        ORDER BY symbol""", params
+
+def latest_fundamentals(dataset: str, symbols: list[str] | None = None, as_of: date | str | None = None,
+                        columns: list[str] | None = None) -> pa.Table:
+    """Most recent row per symbol of a fundamentals dataset (period end on or before as_of)."""
+    return sql(*latest_fundamentals_sql(dataset, symbols, as_of, columns))
+
+def cross_section_sql(on: date | str, dataset: str = "pit_panel", columns: list[str] | None = None) -> tuple[str, list]:
+    rel = relation(DATASETS[dataset].view, schema="db")
+    return f"""
+        SELECT {_cols(columns)} FROM {rel}
+        WHERE date = (SELECT max(date) FROM {rel} WHERE date <= ?)
+        ORDER BY symbol""", [str(on)]
+
+def cross_section(on: date | str, dataset: str = "pit_panel", columns: list[str] | None = None) -> pa.Table:
+    """Every symbol's row on the last date <= `on` that the dataset has (a trading day for daily data)."""
+    return sql(*cross_section_sql(on, dataset, columns))
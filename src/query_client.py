@@ -0,0 +1,85 @@
+"""
+Client for the local query server (query_server.py): requests go over a Unix socket
+as length-prefixed JSON, results come back as an Arrow IPC stream. Importing this
+module pulls in neither DuckDB nor pandas, and never needs an API key.
+"""
+from __future__ import annotations
+import json, os, socket, struct
+from pathlib import Path
+import pyarrow as pa
+import pyarrow.ipc as ipc
+
+from . import config
+
+_LEN = struct.Struct(">I")
+OK, ERR = b"\x00", b"\x01"
+
+def write_msg(f, obj: dict):
+    body = json.dumps(obj, default=str).encode()  # dates travel as ISO strings
+    f.write(_LEN.pack(len(body)) + body)
+
+def read_msg(f) -> dict | None:
+    head = f.read(_LEN.size)
+    if len(head) < _LEN.size:
+        return None
+    return json.loads(f.read(_LEN.unpack(head)[0]))
+
+def available(path: str | os.PathLike | None = None) -> bool:
+    """Whether a server is listening on path (config.QUERY_SOCKET by default)."""
+    path = Path(path or config.QUERY_SOCKET)
+    if not path.exists():
+        return False
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+            s.connect(os.fspath(path))
+        return True
+    except OSError:
+        return False
+
+class QueryError(RuntimeError):
+    pass
+
+class QueryClient:
+    """Same calls as src.query (sql, exists, price_history, ...) answered by the warm server."""
+    def __init__(self, path: str | os.PathLike | None = None, timeout: float | None = None):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(timeout)
+        self.sock.connect(os.fspath(path or config.QUERY_SOCKET))
+        self.rfile = self.sock.makefile("rb")
+        self.wfile = self.sock.makefile("wb")
+
+    def __enter__(self) -> QueryClient:
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.rfile.close()
+        self.wfile.close()
+        self.sock.close()
+
+    def call(self, op: str, *args, **kwargs) -> pa.Table:
+        write_msg(self.wfile, {"op": op, "args": args, "kwargs": kwargs})
+        self.wfile.flush()
+        status = self.rfile.read(1)
+        if status == ERR:
+            raise QueryError(read_msg(self.rfile)["error"])
+        if status != OK:
+            raise ConnectionError("query server closed the connection")
+        return ipc.open_stream(self.rfile).read_all()
+
+    def sql(self, query: str, params: list | None = None, cache: bool = True) -> pa.Table:
+        return self.call("sql", query, params, cache=cache)
+
+    def exists(self, view: str) -> bool:
+        return self.call("exists", view)["value"][0].as_py()
+
+    def price_history(self, *args, **kwargs) -> pa.Table:
+        return self.call("price_history", *args, **kwargs)
+
+    def latest_fundamentals(self, *args, **kwargs) -> pa.Table:
+        return self.call("latest_fundamentals", *args, **kwargs)
+
+    def cross_section(self, *args, **kwargs) -> pa.Table:
+        return self.call("cross_section", *args, **kwargs)
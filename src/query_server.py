@@ -0,0 +1,70 @@
+"""
+Read-only query daemon on a Unix socket (config.QUERY_SOCKET). One process keeps the
+warm DuckDB connection of src.query (views, Parquet metadata cache, result cache) for
+every client; views are rebuilt only after an import, compaction or migration bumps a
+dataset version. Every op, including the helper ones, runs only if its SQL is a single
+SELECT statement.
+"""
+from __future__ import annotations
+import logging, os, socket, socketserver
+from pathlib import Path
+import pyarrow as pa
+import pyarrow.ipc as ipc
+
+from . import config, query
+from .query_client import ERR, OK, read_msg, write_msg
+
+log = logging.getLogger(__name__)
+
+def _select(q: str, params: list | None = None, cache: bool = True) -> pa.Table:
+    query.check_select(q)
+    return query.sql(q, params, cache=cache)
+
+def _op(build):
+    # helper ops are checked on the SQL they build, like raw sql requests
+    return lambda *args, **kwargs: _select(*build(*args, **kwargs))
+
+OPS = {
+    "sql": _select,
+    "exists": lambda view: pa.table({"value": [query.exists(view)]}),
+    "price_history": _op(query.price_history_sql),
+    "latest_fundamentals": _op(query.latest_fundamentals_sql),
+    "cross_section": _op(query.cross_section_sql),
+}
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        while (req := read_msg(self.rfile)) is not None:  # one connection serves many requests
+            try:
+                fn = OPS.get(req.get("op"))
+                if fn is None:
+                    raise ValueError(f"unknown op {req.get('op')!r}")
+                table = fn(*req.get("args", ()), **req.get("kwargs", {}))
+            except Exception as e:
+                self.wfile.write(ERR)
+                write_msg(self.wfile, {"error": f"{type(e).__name__}: {e}"})
+                self.wfile.flush()
+                continue
+            self.wfile.write(OK)
+            with ipc.new_stream(self.wfile, table.schema) as w:
+                w.write_table(table)
+            self.wfile.flush()
+
+class QueryServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, path: str | os.PathLike | None = None):
+        self.path = Path(path or config.QUERY_SOCKET)
+        if self.path.exists():
+            try:  # a live server already owns it; otherwise it is left over from a crash
+                with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+                    s.connect(os.fspath(self.path))
+                raise RuntimeError(f"a query server is already listening on {self.path}")
+            except ConnectionRefusedError:
+                self.path.unlink()
+        super().__init__(os.fspath(self.path), _Handler)
+        os.chmod(self.path, 0o600)  # same-user clients only
+
+    def server_close(self):
+        super().server_close()
+        self.path.unlink(missing_ok=True)
@@ -1,26 +1,118 @@
 from __future__ import annotations
-import threading, time
-from collections import deque
+import os, struct, threading, time
 
-class MinuteRateLimiter:
-    def __init__(self, max_per_minute: int):
-        self.max = max_per_minute
-        self.q = deque()
+from . import config, metrics
+
+try:  # cross-process state file locking
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# tokens, last refill, current rpm, paused until, last penalty
+_STATE = struct.Struct("<5d")
+
+class TokenBucketLimiter:
+    """
+    Token bucket that spreads requests evenly at `rpm` with a small `burst` allowance.
+    Callers reserve a slot under the lock and sleep outside it, so waiting threads
+    never block each other. penalize() (on 429 / Retry-After) halves the rate and
+    pauses everyone; each reward() (on success) climbs back toward `rpm`.
+    With state_file set, the bucket lives in that file and is shared by every
+    process using it (guarded by an OS file lock).
+    """
+    def __init__(self, rpm: int, burst: int = 1, state_file: str | os.PathLike | None = None,
+                 min_fraction: float = 0.1):
+        self.max_rpm = float(rpm)
+        self.min_rpm = max(1.0, rpm * min_fraction)
+        self.burst = float(max(1, burst))
         self.lock = threading.Lock()
+        self.fd = None
+        self.state = (self.burst, time.time(), self.max_rpm, 0.0, 0.0)
+        if state_file:
+            self.fd = os.open(os.fspath(state_file), os.O_RDWR | os.O_CREAT, 0o644)
 
-    def acquire(self):
+    # --- state access (thread lock always; file lock when shared) ---
+    def _update(self, fn):
         with self.lock:
+            if self.fd is None:
+                self.state, out = fn(*self.state)
+                return out
+            self._lock_file()
+            try:
+                os.lseek(self.fd, 0, os.SEEK_SET)
+                raw = os.read(self.fd, _STATE.size)
+                state = _STATE.unpack(raw) if len(raw) == _STATE.size else self.state
+                state, out = fn(*state)
+                os.lseek(self.fd, 0, os.SEEK_SET)
+                os.write(self.fd, _STATE.pack(*state))
+                return out
+            finally:
+                self._unlock_file()
+
+    def _lock_file(self):
+        if fcntl is not None:
+            fcntl.flock(self.fd, fcntl.LOCK_EX)
+        else:
+            os.lseek(self.fd, 0, os.SEEK_SET)
+            msvcrt.locking(self.fd, msvcrt.LK_LOCK, _STATE.size)
+
+    def _unlock_file(self):
+        if fcntl is not None:
+            fcntl.flock(self.fd, fcntl.LOCK_UN)
+        else:
+            os.lseek(self.fd, 0, os.SEEK_SET)
+            msvcrt.locking(self.fd, msvcrt.LK_UNLCK, _STATE.size)
+
+    # --- public API ---
+    def reserve(self) -> float:
+        """Take one token and return how long the caller must wait before sending."""
+        def fn(tokens, last, rpm, paused_until, last_penalty):
             now = time.time()
-            cutoff = now - 60.0
-            while self.q and self.q[0] < cutoff:
-                self.q.popleft()
-            if len(self.q) >= self.max:
-                sleep_for = 60.0 - (now - self.q[0])
-                if sleep_for > 0:
-                    time.sleep(sleep_for)
-                # cleanup after sleep
-                now = time.time()
-                cutoff = now - 60.0
-                while self.q and self.q[0] < cutoff:
-                    self.q.popleft()
-            self.q.append(time.time())
+            start = max(now, paused_until)
+            per_sec = rpm / 60.0
+            tokens = min(self.burst, tokens + max(0.0, start - last) * per_sec) - 1.0
+            last = max(last, start)
+            # negative tokens are debt owed by earlier reservations: queue behind them
+            wait = (start - now) + (-tokens / per_sec if tokens < 0 else 0.0)
+            return (tokens, last, rpm, paused_until, last_penalty), wait
+        return self._update(fn)
+
+    def acquire(self):
+        wait = self.reserve()
+        metrics.observe("rate_limit_wait", max(0.0, wait))
+        if wait > 0:
+            time.sleep(wait)  # outside the lock
+
+    def penalize(self, retry_after: float | None = None):
+        """Back off after a throttling response."""
+        def fn(tokens, last, rpm, paused_until, last_penalty):
+            now = time.time()
+            if now - last_penalty >= 1.0:  # a burst of 429s counts once
+                rpm = max(self.min_rpm, rpm / 2.0)
+                last_penalty = now
+            pause = retry_after if retry_after is not None else 60.0 / rpm
+            return (min(tokens, 0.0), last, rpm, max(paused_until, now + pause), last_penalty), None
+        self._update(fn)
+
+    def reward(self):
+        """Additive recovery after a successful response."""
+        def fn(tokens, last, rpm, paused_until, last_penalty):
+            return (tokens, last, min(self.max_rpm, rpm + self.max_rpm / 100.0), paused_until, last_penalty), None
+        self._update(fn)
+
+    @property
+    def rpm(self) -> float:
+        return self._update(lambda *s: (s, s[2]))
+
+_shared: TokenBucketLimiter | None = None
+_shared_lock = threading.Lock()
+
+def shared_limiter() -> TokenBucketLimiter:
+    """The process-wide limiter every client uses unless given its own."""
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = TokenBucketLimiter(config.REQUESTS_PER_MINUTE, burst=config.RATE_LIMIT_BURST,
+                                         state_file=config.RATE_LIMIT_FILE or None)
+        return _shared
@@ -0,0 +1,60 @@
+from __future__ import annotations
+import logging
+
+from . import cadence, config, membership
+from .dense_panel import update_dense_panel
+from .fundamentals_client import FundamentalsClient
+from .import_fundamentals import FUNDAMENTALS, fundamentals_task
+from .import_prices import prices_task
+from .journal import RunJournal
+from .pit_panel import update_pit_panel
+from .price_features import update_price_features
+from .response_cache import ResponseCache
+from .scheduler import run_tasks
+
+log = logging.getLogger(__name__)
+
+ALL_DATASETS = ["prices", *FUNDAMENTALS]
+
+def refresh(datasets: list[str] | None = None, full_prices: bool = False,
+            max_workers: int = config.MAX_WORKERS, journal: RunJournal | None = None) -> list[dict]:
+    """
+    Refresh prices and every fundamentals dataset in one run: all (dataset, symbol)
+    jobs share one work queue and the process-wide rate limiter. Prices go first.
+    Index entrants get full history (membership.fetch_plan); removed symbols are skipped.
+    With a journal, jobs it already records are skipped and finished ones are added.
+    Returns one totals dict per dataset, same shape as the import_* functions.
+    """
+    names = datasets or ALL_DATASETS
+    client = FundamentalsClient()
+    cache = ResponseCache() if config.RESPONSE_CACHE else None
+    tasks, changed, sweeps, attempted = [], {}, [], {}
+    try:
+        for name in names:
+            plan = membership.fetch_plan(name)
+            if name == "prices":
+                task = prices_task(full=full_prices, symbols=plan.symbols, priority=0, changed=changed,
+                                   backfill=plan.backfill)
+            else:
+                symbols, sweep = cadence.due_symbols(plan)  # only symbols near their next filing
+                attempted[name] = symbols
+                if sweep:
+                    sweeps.append(name)
+                task = fundamentals_task(name, symbols=symbols, client=client, priority=1, cache=cache)
+            membership.track(task, plan)
+            tasks.append(journal.attach(task) if journal is not None else task)
+        totals = run_tasks(tasks, max_workers=max_workers)
+    finally:
+        if cache is not None:
+            cache.close()
+    for name, symbols in attempted.items():
+        cadence.record_attempts(name, symbols)
+    for name in sweeps:
+        cadence.record_sweep(name)
+    if "prices" in names and config.PRICE_FEATURES:
+        update_price_features(changed)
+    if config.PIT_PANEL:
+        update_pit_panel(changed)  # also picks up new filings
+    if "prices" in names and config.DENSE_PANEL:
+        update_dense_panel(changed)
+    return [totals[name] for name in names]
@@ -0,0 +1,99 @@
+from __future__ import annotations
+import hashlib, logging, sqlite3, threading, time, zlib
+from pathlib import Path
+from typing import Callable
+import pandas as pd
+
+from . import config
+
+log = logging.getLogger(__name__)
+
+def content_hash(raw: bytes) -> str:
+    return hashlib.blake2b(raw, digest_size=16).hexdigest()
+
+class ResponseCache:
+    """
+    SQLite table of (dataset, symbol) -> hash of the last response that made it to
+    disk, plus the zlib-compressed body when keep_payloads is on (needed for replay).
+    """
+    def __init__(self, path: Path | None = None, keep_payloads: bool | None = None):
+        self.path = Path(path or config.RESPONSE_CACHE_FILE)
+        self.keep_payloads = config.RESPONSE_CACHE_PAYLOADS if keep_payloads is None else keep_payloads
+        self.lock = threading.Lock()
+        self.con = sqlite3.connect(self.path.as_posix(), check_same_thread=False)
+        with self.lock, self.con:
+            self.con.execute("""CREATE TABLE IF NOT EXISTS responses (
+                dataset TEXT NOT NULL, symbol TEXT NOT NULL, hash TEXT NOT NULL,
+                payload BLOB, stored_at REAL NOT NULL, PRIMARY KEY (dataset, symbol))""")
+
+    def close(self):
+        self.con.close()
+
+    def hashes(self, dataset: str) -> dict[str, str]:
+        with self.lock:
+            return dict(self.con.execute("SELECT symbol, hash FROM responses WHERE dataset = ?", [dataset]))
+
+    def put_many(self, dataset: str, items: list[tuple[str, str, bytes]]):
+        """Record (symbol, hash, raw) rows in one transaction."""
+        now = time.time()
+        rows = [(dataset, sym, h, zlib.compress(raw) if self.keep_payloads else None, now) for sym, h, raw in items]
+        with self.lock, self.con:
+            self.con.executemany("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?)", rows)
+
+    def payload(self, dataset: str, symbol: str) -> bytes:
+        with self.lock:
+            row = self.con.execute("SELECT payload FROM responses WHERE dataset = ? AND symbol = ?",
+                                   [dataset, symbol]).fetchone()
+        return zlib.decompress(row[0]) if row and row[0] is not None else b""
+
+    def symbols(self, dataset: str, with_payload: bool = False) -> list[str]:
+        q = "SELECT symbol FROM responses WHERE dataset = ?" + (" AND payload IS NOT NULL" if with_payload else "")
+        with self.lock:
+            return [r[0] for r in self.con.execute(q + " ORDER BY symbol", [dataset])]
+
+    def clear(self, dataset: str | None = None):
+        with self.lock, self.con:
+            if dataset is None:
+                self.con.execute("DELETE FROM responses")
+            else:
+                self.con.execute("DELETE FROM responses WHERE dataset = ?", [dataset])
+
+class PayloadGate:
+    """
+    Per-run filter in front of one dataset's decode/merge/write path: payloads whose
+    hash matches the stored one come back as b"" (nothing to write). New hashes are
+    committed only in commit(), after the sink has written the symbol's rows, so a
+    failed run is simply redone next time.
+    """
+    def __init__(self, cache: ResponseCache, dataset: str, on_disk: Callable[[str], bool] = lambda sym: True):
+        self.cache = cache
+        self.dataset = dataset
+        self.on_disk = on_disk
+        self.known = cache.hashes(dataset)
+        self.lock = threading.Lock()
+        self.pending: dict[str, tuple[str, bytes]] = {}
+        self.written: list[str] = []
+        self.skipped = 0
+
+    def check(self, symbol: str, raw: bytes) -> bytes:
+        if not raw:
+            return raw
+        h = content_hash(raw)
+        if self.known.get(symbol) == h and self.on_disk(symbol):
+            with self.lock:
+                self.skipped += 1
+            return b""
+        with self.lock:
+            self.pending[symbol] = (h, raw)
+        return raw
+
+    def mark_written(self, symbol: str, df: pd.DataFrame):
+        self.written.append(symbol)
+
+    def commit(self):
+        with self.lock:
+            items = [(sym, *self.pending.pop(sym)) for sym in self.written if sym in self.pending]
+            self.written = []
+        if items:
+            self.cache.put_many(self.dataset, items)
+        log.info("[%s] %d unchanged payloads skipped, %d hashes stored", self.dataset, self.skipped, len(items))
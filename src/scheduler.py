@@ -0,0 +1,189 @@
+from __future__ import annotations
+import asyncio, itertools, logging, queue, threading, time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable
+import pandas as pd
+from tqdm.auto import tqdm
+
+from . import config, metrics, versions
+
+log = logging.getLogger(__name__)
+
+@dataclass
+class DatasetTask:
+    """Everything needed to refresh one dataset symbol by symbol."""
+    name: str
+    symbols: list[str]
+    fetch: Callable[[str], Any]                       # symbol -> payload (runs in workers)
+    decode: Callable[[str, Any], pd.DataFrame]        # (symbol, payload) -> rows
+    sink: Any                                         # see sinks.open_sink
+    priority: int = 0                                 # lower runs first
+    on_written: Callable[[str, pd.DataFrame], None] | None = None
+    on_close: Callable[[], None] | None = None
+    afetch: Callable[[Any, str], Awaitable[Any]] | None = None  # (AsyncFMPClient, symbol) for engine="async"
+
+def new_totals(name: str) -> dict:
+    # sinks that cannot tell new keys from updates (delta mode) count into rows_written instead
+    return {"dataset": name, "symbols_done": 0, "rows_added": 0, "files_touched": 0}
+
+def _fetch_async(by_name: dict[str, DatasetTask], order: list[tuple[str, str]], results: queue.Queue,
+                 max_in_flight: int, stop: threading.Event):
+    from .async_client import AsyncFMPClient
+    reported: set[tuple[str, str]] = set()
+
+    async def main():
+        async with AsyncFMPClient() as client:
+            sem = asyncio.Semaphore(max_in_flight)
+
+            async def one(name: str, sym: str):
+                async with sem:  # FIFO, so jobs start in priority order
+                    if stop.is_set():
+                        return
+                    t0 = time.perf_counter()
+                    try:
+                        out = (name, sym, await by_name[name].afetch(client, sym), None)
+                    except Exception as e:
+                        out = (name, sym, None, e)
+                    metrics.observe("fetch", time.perf_counter() - t0, name, sym)
+                    reported.add((name, sym))
+                    # a full queue must not freeze the event loop; waiting here still holds
+                    # the semaphore, so at most max_in_flight payloads are buffered
+                    await asyncio.to_thread(results.put, out)
+
+            await asyncio.gather(*(one(name, sym) for name, sym in order))
+
+    try:
+        asyncio.run(main())
+    except Exception as e:  # e.g. aiohttp missing: fail the remaining jobs rather than hang the consumer
+        for name, sym in order:
+            if (name, sym) not in reported and not stop.is_set():
+                results.put((name, sym, None, e))
+
+def _decode_stage(by_name: dict[str, DatasetTask], fetched: queue.Queue, decoded: queue.Queue,
+                  done: queue.Queue, procs: ProcessPoolExecutor | None, stop: threading.Event):
+    while (item := fetched.get()) is not None:
+        if stop.is_set():
+            continue  # the run failed: only drain, so fetchers can finish
+        name, sym, data, err = item
+        if err is None:
+            try:
+                decode = by_name[name].decode
+                with metrics.timed("decode", name, sym):
+                    df = procs.submit(decode, sym, data).result() if procs else decode(sym, data)
+                empty = df.empty  # a decode that returns no frame must fail the job, not the stage
+            except Exception as e:
+                err = e
+        if err is not None:
+            done.put((name, sym, None, 0, err))
+        elif empty:
+            done.put((name, sym, None, 0, None))
+        else:
+            decoded.put((name, sym, df))  # blocks when writers fall behind
+
+def _write_stage(by_name: dict[str, DatasetTask], decoded: queue.Queue, done: queue.Queue,
+                 stop: threading.Event):
+    while (item := decoded.get()) is not None:
+        if stop.is_set():
+            continue
+        name, sym, df = item
+        try:
+            with metrics.timed("write", name, sym):
+                added = by_name[name].sink.write(sym, df)
+            done.put((name, sym, df, added, None))
+        except Exception as e:
+            done.put((name, sym, None, 0, e))
+
+def run_tasks(tasks: list[DatasetTask], max_workers: int = config.MAX_WORKERS,
+              desc: str = "refresh", engine: str | None = None) -> dict[str, dict]:
+    """
+    Run every (dataset, symbol) job from all tasks through one priority queue, so
+    workers move straight on to the next dataset instead of idling on a tail.
+    engine="threads" fetches with a pool of max_workers threads; engine="async" runs
+    all fetches on one event loop (config.ASYNC_MAX_IN_FLIGHT at a time).
+
+    Fetch, decode (DECODE_WORKERS threads, or processes with DECODE_PROCESSES) and
+    write (WRITE_WORKERS threads) are separate stages joined by queues bounded at
+    PIPELINE_QUEUE_SIZE, so a slow stage stalls the one before it instead of
+    piling payloads up in memory. Returns totals per dataset.
+    """
+    engine = engine or config.HTTP_ENGINE
+    by_name = {t.name: t for t in tasks}
+    jobs: queue.PriorityQueue = queue.PriorityQueue()
+    seq = itertools.count()
+    for t in tasks:
+        for sym in t.symbols:
+            jobs.put((t.priority, next(seq), t.name, sym))
+    n_jobs = jobs.qsize()
+    fetched: queue.Queue = queue.Queue(maxsize=config.PIPELINE_QUEUE_SIZE)
+    decoded: queue.Queue = queue.Queue(maxsize=config.PIPELINE_QUEUE_SIZE)
+    done: queue.Queue = queue.Queue()
+    stop = threading.Event()  # set when the run fails, so every stage winds down
+
+    def worker():
+        while not stop.is_set():
+            try:
+                _, _, name, sym = jobs.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                with metrics.timed("fetch", name, sym):
+                    data = by_name[name].fetch(sym)
+                fetched.put((name, sym, data, None))
+            except Exception as e:
+                fetched.put((name, sym, None, e))
+
+    totals = {t.name: new_totals(t.name) for t in tasks}
+    n_fetch = max(1, min(max_workers, n_jobs))
+    n_decode, n_write = max(1, config.DECODE_WORKERS), max(1, config.WRITE_WORKERS)
+    procs = ProcessPoolExecutor(max_workers=n_decode) if config.DECODE_PROCESSES else None
+    try:
+        with ThreadPoolExecutor(max_workers=n_fetch + n_decode + n_write) as ex:
+            if engine == "async":
+                order = [jobs.get_nowait()[2:] for _ in range(n_jobs)]
+                fetchers = [ex.submit(_fetch_async, by_name, order, fetched, config.ASYNC_MAX_IN_FLIGHT, stop)]
+            else:
+                fetchers = [ex.submit(worker) for _ in range(n_fetch)]
+            for _ in range(n_decode):
+                ex.submit(_decode_stage, by_name, fetched, decoded, done, procs, stop)
+            for _ in range(n_write):
+                ex.submit(_write_stage, by_name, decoded, done, stop)
+
+            try:
+                for _ in tqdm(range(n_jobs), desc=desc):
+                    name, sym, df, added, err = done.get()
+                    if err is not None:
+                        log.error("[%s] error %s: %s", name, sym, err, exc_info=err)
+                        continue
+                    if df is None:
+                        continue
+                    task = by_name[name]
+                    if task.on_written:
+                        task.on_written(sym, df)
+                    field = getattr(task.sink, "count_field", "rows_added")
+                    totals[name][field] = totals[name].get(field, 0) + added
+                    totals[name]["files_touched"] += 1
+                    totals[name]["symbols_done"] += 1
+            except BaseException:
+                # e.g. on_written failed: stop fetching, and let in-flight fetches land in
+                # the (now draining) queue before the stages are told to exit
+                stop.set()
+                wait(fetchers)
+                raise
+            finally:
+                # every job is accounted for (or abandoned), so the stages can stop
+                for _ in range(n_decode):
+                    fetched.put(None)
+                for _ in range(n_write):
+                    decoded.put(None)
+    finally:
+        if procs is not None:
+            procs.shutdown()
+
+    for t in tasks:
+        with metrics.timed("sink_close", t.name):
+            totals[t.name]["rows_added"] += t.sink.close()
+        if t.on_close:
+            t.on_close()
+    versions.bump(*[n for n, tot in totals.items() if tot["rows_added"] or tot["files_touched"]])
+    return totals
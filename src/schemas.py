@@ -0,0 +1,153 @@
+from __future__ import annotations
+import json, logging
+import pandas as pd
+import pyarrow as pa
+
+try:  # optional fast JSON parser
+    import orjson
+    _loads = orjson.loads
+except ImportError:
+    _loads = json.loads
+
+log = logging.getLogger(__name__)
+
+STR, F64, I64, TS = pa.string(), pa.float64(), pa.int64(), pa.timestamp("ns")
+
+def _schema(head: list[tuple[str, pa.DataType]], measures: str) -> pa.Schema:
+    # every reported measure is a double, so int-looking and fractional payloads share one type
+    return pa.schema(head + [(m, F64) for m in measures.split()])
+
+_STATEMENT_HEAD = [("date", TS), ("symbol", STR), ("reportedCurrency", STR), ("cik", STR),
+                   ("filingDate", TS), ("acceptedDate", TS), ("fiscalYear", I64), ("period", STR)]
+_METRICS_HEAD = [("symbol", STR), ("date", TS), ("fiscalYear", I64), ("period", STR), ("reportedCurrency", STR)]
+
+# Column names and Arrow types of every stored dataset; payload fields not listed are dropped.
+SCHEMAS: dict[str, pa.Schema] = {
+    "prices": pa.schema([("symbol", STR), ("date", TS), ("adjOpen", F64), ("adjHigh", F64),
+                         ("adjLow", F64), ("adjClose", F64), ("volume", I64)]),
+    "balance_sheet": _schema(_STATEMENT_HEAD, """
+        cashAndCashEquivalents shortTermInvestments cashAndShortTermInvestments netReceivables
+        accountsReceivables otherReceivables inventory prepaids otherCurrentAssets totalCurrentAssets
+        propertyPlantEquipmentNet goodwill intangibleAssets goodwillAndIntangibleAssets longTermInvestments
+        taxAssets otherNonCurrentAssets totalNonCurrentAssets otherAssets totalAssets totalPayables
+        accountPayables otherPayables accruedExpenses shortTermDebt capitalLeaseObligationsCurrent
+        taxPayables deferredRevenue otherCurrentLiabilities totalCurrentLiabilities longTermDebt
+        capitalLeaseObligationsNonCurrent deferredRevenueNonCurrent deferredTaxLiabilitiesNonCurrent
+        otherNonCurrentLiabilities totalNonCurrentLiabilities otherLiabilities capitalLeaseObligations
+        totalLiabilities treasuryStock preferredStock commonStock retainedEarnings additionalPaidInCapital
+        accumulatedOtherComprehensiveIncomeLoss otherTotalStockholdersEquity totalStockholdersEquity
+        totalEquity minorityInterest totalLiabilitiesAndTotalEquity totalInvestments totalDebt netDebt"""),
+    "income_statement": _schema(_STATEMENT_HEAD, """
+        revenue costOfRevenue grossProfit researchAndDevelopmentExpenses generalAndAdministrativeExpenses
+        sellingAndMarketingExpenses sellingGeneralAndAdministrativeExpenses otherExpenses operatingExpenses
+        costAndExpenses netInterestIncome interestIncome interestExpense depreciationAndAmortization ebitda
+        ebit nonOperatingIncomeExcludingInterest operatingIncome totalOtherIncomeExpensesNet incomeBeforeTax
+        incomeTaxExpense netIncomeFromContinuingOperations netIncomeFromDiscontinuedOperations
+        otherAdjustmentsToNetIncome netIncome netIncomeDeductions bottomLineNetIncome eps epsDiluted
+        weightedAverageShsOut weightedAverageShsOutDil"""),
+    "key_metrics": _schema(_METRICS_HEAD, """
+        marketCap enterpriseValue evToSales evToOperatingCashFlow evToFreeCashFlow evToEBITDA netDebtToEBITDA
+        currentRatio incomeQuality grahamNumber grahamNetNet taxBurden interestBurden workingCapital
+        investedCapital returnOnAssets operatingReturnOnAssets returnOnTangibleAssets returnOnEquity
+        returnOnInvestedCapital returnOnCapitalEmployed earningsYield freeCashFlowYield capexToOperatingCashFlow
+        capexToDepreciation capexToRevenue salesGeneralAndAdministrativeToRevenue researchAndDevelopementToRevenue
+        stockBasedCompensationToRevenue intangiblesToTotalAssets averageReceivables averagePayables
+        averageInventory daysOfSalesOutstanding daysOfPayablesOutstanding daysOfInventoryOutstanding
+        operatingCycle cashConversionCycle freeCashFlowToEquity freeCashFlowToFirm tangibleAssetValue
+        netCurrentAssetValue"""),
+    "ratios": _schema(_METRICS_HEAD, """
+        grossProfitMargin ebitMargin ebitdaMargin operatingProfitMargin pretaxProfitMargin
+        continuousOperationsProfitMargin netProfitMargin bottomLineProfitMargin receivablesTurnover
+        payablesTurnover inventoryTurnover fixedAssetTurnover assetTurnover currentRatio quickRatio
+        solvencyRatio cashRatio priceToEarningsRatio priceToEarningsGrowthRatio forwardPriceToEarningsGrowthRatio
+        priceToBookRatio priceToSalesRatio priceToFreeCashFlowRatio priceToOperatingCashFlowRatio
+        debtToAssetsRatio debtToEquityRatio debtToCapitalRatio longTermDebtToCapitalRatio financialLeverageRatio
+        workingCapitalTurnoverRatio operatingCashFlowRatio operatingCashFlowSalesRatio
+        freeCashFlowOperatingCashFlowRatio debtServiceCoverageRatio interestCoverageRatio
+        shortTermOperatingCashFlowCoverageRatio operatingCashFlowCoverageRatio capitalExpenditureCoverageRatio
+        dividendPaidAndCapexCoverageRatio dividendPayoutRatio dividendYield dividendYieldPercentage
+        revenuePerShare netIncomePerShare interestDebtPerShare cashPerShare bookValuePerShare
+        tangibleBookValuePerShare shareholdersEquityPerShare operatingCashFlowPerShare capexPerShare
+        freeCashFlowPerShare netIncomePerEBT ebtPerEbit priceToFairValue debtToMarketCap effectiveTaxRate
+        enterpriseValueMultiple dividendPerShare"""),
+    "revenue_segments": pa.schema([("symbol", STR), ("reportedCurrency", STR), ("period", STR),
+                                   ("fiscalYear", I64), ("date", TS), ("segment", STR), ("revenue", F64)]),
+    # derived from prices; vol_* annualized from daily log returns, drawdown vs. running peak
+    "price_features": _schema([("symbol", STR), ("date", TS)], """
+        adjClose ret_1d log_ret_1d vol_21d vol_63d sma_20 sma_50 sma_200 peak drawdown"""),
+}
+
+# Fundamentals carried into the daily point-in-time panel (pit_panel.py), by source dataset.
+# Each source also contributes <name>_date (fiscal period end) and <name>_filed (when it became known).
+PIT_FIELDS: dict[str, list[str]] = {
+    "income_statement": ["revenue", "grossProfit", "operatingIncome", "ebitda", "netIncome", "eps", "epsDiluted",
+                         "weightedAverageShsOutDil"],
+    "balance_sheet": ["totalAssets", "totalLiabilities", "totalStockholdersEquity", "totalDebt", "netDebt",
+                      "cashAndCashEquivalents"],
+    "key_metrics": ["returnOnEquity", "returnOnInvestedCapital", "earningsYield", "freeCashFlowYield"],
+    "ratios": ["grossProfitMargin", "netProfitMargin", "debtToEquityRatio", "priceToBookRatio"],
+}
+SCHEMAS["pit_panel"] = pa.schema(
+    [("symbol", STR), ("date", TS), ("adjClose", F64)]
+    + [f for name, fields in PIT_FIELDS.items()
+       for f in [(f"{name}_date", TS), (f"{name}_filed", TS), *((c, F64) for c in fields)]])
+
+def parse_payload(payload) -> list[dict]:
+    """Response bytes (or already-parsed JSON) -> list of records."""
+    if payload is None:
+        return []
+    if isinstance(payload, (bytes, bytearray, memoryview, str)):
+        payload = _loads(payload) if len(payload) else None
+    if payload is None:
+        return []
+    return payload if isinstance(payload, list) else [payload]
+
+def _flatten_segments(records: list[dict]) -> list[dict]:
+    rows = []
+    for row in records:
+        for seg, rev in (row.get("data") or {}).items():
+            rows.append({**row, "segment": seg, "revenue": rev})
+    return rows
+
+def _column(values: list, typ: pa.DataType) -> pa.Array:
+    try:
+        if typ == TS:
+            return pa.array(values, type=STR).cast(TS)
+        return pa.array(values, type=typ)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        pass
+    # slow path for odd payloads: numbers sent as strings, unparseable dates, ...
+    s = pd.Series(values, dtype=object)
+    if typ == TS:
+        return pa.array(pd.to_datetime(s, errors="coerce"), type=TS, from_pandas=True)
+    if typ == STR:
+        return pa.array([None if v is None else str(v) for v in values], type=STR)
+    num = pd.to_numeric(s, errors="coerce")
+    return pa.array(num.astype("Int64") if typ == I64 else num.astype("float64"), type=typ, from_pandas=True)
+
+_warned: set[str] = set()
+
+def decode_table(dataset: str, symbol: str, payload) -> pa.Table:
+    """Decode one response straight into a pyarrow.Table with the dataset's fixed schema."""
+    schema = SCHEMAS[dataset]
+    records = parse_payload(payload)
+    if dataset == "revenue_segments":
+        records = _flatten_segments(records)
+    if not records:
+        return schema.empty_table()
+    extra = set(records[0]) - set(schema.names) - {"data"}
+    if extra and dataset not in _warned:
+        _warned.add(dataset)
+        log.info("[%s] ignoring fields not in schema: %s", dataset, sorted(extra))
+    cols = []
+    for field in schema:
+        if field.name == "symbol":
+            cols.append(pa.array([r.get("symbol") or symbol for r in records], type=STR))
+        else:
+            cols.append(_column([r.get(field.name) for r in records], field.type))
+    table = pa.Table.from_arrays(cols, schema=schema)
+    return table.filter(table["date"].is_valid())  # date is part of every key
+
+def decode_frame(dataset: str, symbol: str, payload) -> pd.DataFrame:
+    """decode_table as a pandas frame (nullable ints stay Int64) for the merge/write path."""
+    return decode_table(dataset, symbol, payload).to_pandas(types_mapper={I64: pd.Int64Dtype()}.get)
@@ -0,0 +1,91 @@
+from __future__ import annotations
+import logging, threading
+from typing import Callable
+import pandas as pd
+
+from . import changelog, config, versions
+from .datasets import Dataset
+from .manifest import open_manifest
+from .merge_parquet import DELTA_DIRNAME, write_rows
+from .partitioned import is_partitioned, migrate_to_partitioned, upsert_partitioned
+from .schemas import SCHEMAS
+
+log = logging.getLogger(__name__)
+
+class SymbolFileSink:
+    """
+    One {SYMBOL}.parquet per symbol, written immediately (rewrite or delta mode).
+    write() returns new keys in rewrite mode but rows written in delta mode, which
+    never reads the base file; count_field names the totals entry they go to.
+    """
+    def __init__(self, ds: Dataset, mode: str | None = None):
+        self.ds = ds
+        self.mode = mode
+
+    @property
+    def count_field(self) -> str:
+        return "rows_written" if (self.mode or config.STORAGE_MODE) == "delta" else "rows_added"
+
+    def write(self, symbol: str, df: pd.DataFrame) -> int:
+        path = (self.ds.dir / f"{symbol}.parquet").as_posix()
+        return write_rows(df, path, list(self.ds.key_cols), mode=self.mode, schema=SCHEMAS.get(self.ds.name))
+
+    def close(self) -> int:
+        open_manifest(self.ds.dir).save()  # one manifest write per run, not per file
+        changelog.flush(self.ds.name)
+        return 0
+
+class PartitionedSink:
+    """
+    Buffers rows and upserts them into <dataset>/year=YYYY/ once PARTITION_FLUSH_ROWS
+    are buffered and on close, so each touched partition is rewritten once per batch
+    rather than once per symbol, and a failed run loses at most one batch.
+    on_flush, if set, gets the symbols whose rows a flush has just committed.
+    """
+    def __init__(self, ds: Dataset, flush_rows: int | None = None):
+        self.ds = ds
+        self.flush_rows = flush_rows or config.PARTITION_FLUSH_ROWS
+        self.frames: list[pd.DataFrame] = []
+        self.symbols: list[str] = []
+        self.rows = 0
+        self.lock = threading.Lock()
+        self.on_flush: Callable[[list[str]], None] | None = None
+
+    def write(self, symbol: str, df: pd.DataFrame) -> int:
+        if df is None or df.empty:
+            return 0
+        with self.lock:
+            self.frames.append(df)
+            self.symbols.append(symbol)
+            self.rows += len(df)
+            # counted when the partitions are written
+            return self._flush() if self.rows >= self.flush_rows else 0
+
+    def _flush(self) -> int:
+        # caller holds self.lock: one partition rewrite at a time
+        if not self.frames:
+            return 0
+        added = upsert_partitioned(pd.concat(self.frames, ignore_index=True), self.ds.dir,
+                                   list(self.ds.key_cols), SCHEMAS.get(self.ds.name))
+        symbols = self.symbols  # kept buffered if the upsert failed, so close() retries them
+        self.frames, self.symbols, self.rows = [], [], 0
+        open_manifest(self.ds.dir).save()
+        changelog.flush(self.ds.name)
+        if self.on_flush is not None:
+            self.on_flush(symbols)
+        return added
+
+    def close(self) -> int:
+        with self.lock:
+            return self._flush()
+
+def open_sink(ds: Dataset):
+    if not is_partitioned(ds):
+        return SymbolFileSink(ds)
+    if any(ds.dir.glob("*.parquet")) or any((ds.dir / DELTA_DIRNAME).glob("*.parquet")):
+        # listed in PARTITIONED_DATASETS without running migrate_layout.py: move the symbol
+        # files into the partitions first, so new writes never shadow or strand them
+        log.warning("%s: migrating per-symbol files to year partitions before writing", ds.name)
+        log.info("%s", migrate_to_partitioned(ds))
+        versions.bump(ds.name)
+    return PartitionedSink(ds)
@@ -2,7 +2,10 @@
 from __future__ import annotations
 import duckdb
 from pathlib import Path
-from . import config
+from . import config, metrics
+from .datasets import DATASETS
+from .merge_parquet import DELTA_DIRNAME
+from .partitioned import PARTITION_GLOB
 
 def _sql_quote_path(p: Path) -> str:
     # Use forward slashes and escape single quotes for SQL string
@@ -12,26 +15,124 @@ def _create_view_for_parquet(con: duckdb.DuckDBPyConnection, view_name: str, pat
     pattern_sql = _sql_quote_path(pattern)
     con.execute(f"CREATE OR REPLACE VIEW {view_name} AS SELECT * FROM read_parquet('{pattern_sql}')")
 
-def _maybe_create_view_for_dir(con: duckdb.DuckDBPyConnection, view_name: str, dir_path: Path):
+def source_globs(dir_path: Path) -> list[Path]:
+    """Every file pattern under dir_path that currently holds data (base, delta, year partitions)."""
+    globs = ["*.parquet", f"{DELTA_DIRNAME}/*.parquet", PARTITION_GLOB]
+    return [dir_path / g for g in globs if any(dir_path.glob(g))]
+
+def pruned_source(ds, symbols: list[str] | None = None, start=None, end=None) -> str:
+    """
+    FROM-clause for ds restricted to the files the manifest says can hold the given
+    symbols / date range, instead of globbing every file. Falls back to the view while
+    delta segments are pending (they need its last-write-wins resolution).
+    """
+    from .manifest import load
+    m = load(ds.dir)
+    if not m.exact:
+        return ds.view
+    files = m.files_for(symbols, start, end)
+    if not files:
+        return f"(SELECT * FROM {ds.view} LIMIT 0)"
+    if len({p.parent.name.startswith("year=") for p in files}) > 1:
+        return ds.view  # both layouts during a migration: the view resolves overlapping keys
+    listed = ", ".join("'" + _sql_quote_path(p) + "'" for p in files)
+    hive = ", hive_partitioning=true" if any(p.parent.name.startswith("year=") for p in files) else ""
+    return f"read_parquet([{listed}], union_by_name=true{hive})"
+
+def _create_view_with_deltas(con: duckdb.DuckDBPyConnection, view_name: str, dir_path: Path,
+                             key_cols: tuple[str, ...]):
+    # Base files rank lowest (''), delta segments rank by file name, which encodes write order.
+    base_sql = _sql_quote_path(dir_path / "*.parquet")
+    delta_sql = _sql_quote_path(dir_path / DELTA_DIRNAME / "*.parquet")
+    keys = ", ".join(key_cols)
+    con.execute(f"""
+        CREATE OR REPLACE VIEW {view_name} AS
+        WITH src AS (
+            SELECT *, '' AS _segment FROM read_parquet('{base_sql}')
+            UNION ALL BY NAME
+            SELECT * EXCLUDE (filename), parse_filename(filename) AS _segment
+            FROM read_parquet('{delta_sql}', filename=true, union_by_name=true)
+        )
+        SELECT * EXCLUDE (_segment) FROM src
+        QUALIFY row_number() OVER (PARTITION BY {keys} ORDER BY _segment DESC) = 1
+    """)
+
+def _create_view_for_partitions(con: duckdb.DuckDBPyConnection, view_name: str, dir_path: Path):
+    # `year` comes from the directory names, so WHERE year = ... prunes whole partitions;
+    # files are sorted by date, so date predicates also skip row groups inside them.
+    pattern_sql = _sql_quote_path(dir_path / PARTITION_GLOB)
+    con.execute(f"""
+        CREATE OR REPLACE VIEW {view_name} AS
+        SELECT * FROM read_parquet('{pattern_sql}', hive_partitioning=true, union_by_name=true)
+    """)
+
+def _create_view_for_both_layouts(con: duckdb.DuckDBPyConnection, view_name: str, dir_path: Path,
+                                  key_cols: tuple[str, ...], has_deltas: bool):
+    # Symbol files next to year partitions (a dataset switched to PARTITIONED_DATASETS before
+    # its symbol files were migrated): read both, partitions winning on a shared key since
+    # they hold the newer writes, then delta segments, then base files.
+    parts_sql = _sql_quote_path(dir_path / PARTITION_GLOB)
+    base_sql = _sql_quote_path(dir_path / "*.parquet")
+    delta_sql = _sql_quote_path(dir_path / DELTA_DIRNAME / "*.parquet")
+    deltas = f"""
+            UNION ALL BY NAME
+            SELECT * EXCLUDE (filename), year(date) AS year, 1 AS _rank, parse_filename(filename) AS _segment
+            FROM read_parquet('{delta_sql}', filename=true, union_by_name=true)""" if has_deltas else ""
+    src = f"""
+            SELECT *, 2 AS _rank, '' AS _segment
+            FROM read_parquet('{parts_sql}', hive_partitioning=true, union_by_name=true)
+            UNION ALL BY NAME
+            SELECT *, year(date) AS year, 0 AS _rank, '' AS _segment
+            FROM read_parquet('{base_sql}', union_by_name=true){deltas}"""
+    if not key_cols:
+        con.execute(f"CREATE OR REPLACE VIEW {view_name} AS SELECT * EXCLUDE (_rank, _segment) FROM ({src})")
+        return
+    con.execute(f"""
+        CREATE OR REPLACE VIEW {view_name} AS
+        SELECT * EXCLUDE (_rank, _segment) FROM ({src})
+        QUALIFY row_number() OVER (PARTITION BY {", ".join(key_cols)} ORDER BY _rank DESC, _segment DESC) = 1
+    """)
+
+def _maybe_create_view_for_dir(con: duckdb.DuckDBPyConnection, view_name: str, dir_path: Path,
+                               key_cols: tuple[str, ...] = ()):
     # Only create the view if there are files to read; otherwise drop it if it exists.
     has_files = any(dir_path.glob("*.parquet"))
-    if has_files:
+    has_deltas = bool(key_cols) and any((dir_path / DELTA_DIRNAME).glob("*.parquet"))
+    if any(dir_path.glob(PARTITION_GLOB)):
+        if has_files or has_deltas:
+            _create_view_for_both_layouts(con, view_name, dir_path, key_cols, has_deltas)
+        else:
+            _create_view_for_partitions(con, view_name, dir_path)
+        return
+    if has_files and has_deltas:
+        _create_view_with_deltas(con, view_name, dir_path, key_cols)
+    elif has_files:
         _create_view_for_parquet(con, view_name, dir_path / "*.parquet")
     else:
         con.execute(f"DROP VIEW IF EXISTS {view_name}")
 
-def ensure_db():
-    con = duckdb.connect(config.DB_FILE.as_posix())
+def ensure_db(materialize: bool | None = None):
+    with metrics.timed("ensure_db"):
+        _ensure_db(materialize)
 
+def create_views(con: duckdb.DuckDBPyConnection):
+    """(Re)create every dataset view on con (the DB file, or an in-memory reader connection)."""
     # Constituents view (single file always exists after main.py run)
-    _create_view_for_parquet(con, "v_sp500_constituents", config.PARQUET_CONSTITUENTS)
+    if config.PARQUET_CONSTITUENTS.exists():
+        _create_view_for_parquet(con, "v_sp500_constituents", config.PARQUET_CONSTITUENTS)
+    if config.PARQUET_MEMBERSHIP.exists():
+        _create_view_for_parquet(con, "v_sp500_membership", config.PARQUET_MEMBERSHIP)
 
     # Prices & fundamentals: create only if there are files yet
-    _maybe_create_view_for_dir(con, "v_prices", config.PARQUET_PRICES_DIR)
-    _maybe_create_view_for_dir(con, "v_balance_sheet", config.PARQUET_BALANCE_SHEET_DIR)
-    _maybe_create_view_for_dir(con, "v_income_statement", config.PARQUET_INCOME_STATEMENT_DIR)
-    _maybe_create_view_for_dir(con, "v_key_metrics", config.PARQUET_KEY_METRICS_DIR)
-    _maybe_create_view_for_dir(con, "v_ratios", config.PARQUET_RATIOS_DIR)
-    _maybe_create_view_for_dir(con, "v_revenue_segments", config.PARQUET_REVENUE_SEGMENTS_DIR)
+    for ds in DATASETS.values():
+        _maybe_create_view_for_dir(con, ds.view, ds.dir, ds.key_cols)
+
+def _ensure_db(materialize: bool | None):
+    con = duckdb.connect(config.DB_FILE.as_posix())
+    create_views(con)
+
+    if config.MATERIALIZE if materialize is None else materialize:
+        from .materialize import refresh_tables
+        refresh_tables(con)
 
     con.close()
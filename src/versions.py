@@ -0,0 +1,78 @@
+from __future__ import annotations
+import json, os, threading, time, uuid
+
+from . import config
+
+try:  # cross-process locking of the read-modify-write in bump()
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# Per-dataset version stamps in STATE_DIR/versions.json, bumped whenever an import,
+# derived-table update, compaction or migration changes a dataset's files. Stamps are
+# time_ns values, so concurrent writers never hand out the same one twice and a
+# reader only has to compare them for equality. bump() holds an OS file lock
+# (STATE_DIR/versions.lock) around its read/update/replace, so importers running as
+# separate processes never write back each other's old stamps.
+
+_lock = threading.Lock()
+_cache: tuple[tuple, dict[str, int]] | None = None  # ((path, inode, mtime_ns), stamps)
+
+def _path():
+    return config.STATE_DIR / "versions.json"
+
+class _FileLock:
+    """Exclusive OS lock on STATE_DIR/versions.lock (the JSON file itself is replaced, not locked)."""
+    def __enter__(self):
+        self.fd = os.open(config.STATE_DIR / "versions.lock", os.O_RDWR | os.O_CREAT, 0o644)
+        if fcntl is not None:
+            fcntl.flock(self.fd, fcntl.LOCK_EX)
+        else:
+            msvcrt.locking(self.fd, msvcrt.LK_LOCK, 1)
+        return self
+
+    def __exit__(self, *exc):
+        if fcntl is not None:
+            fcntl.flock(self.fd, fcntl.LOCK_UN)
+        else:
+            os.lseek(self.fd, 0, os.SEEK_SET)
+            msvcrt.locking(self.fd, msvcrt.LK_UNLCK, 1)
+        os.close(self.fd)
+
+def snapshot() -> dict[str, int]:
+    """Current stamp of every dataset that has one (re-read only when the file changed)."""
+    global _cache
+    path = _path()
+    try:
+        st = path.stat()
+    except FileNotFoundError:
+        return {}
+    # every bump os.replace()s a new inode, so this changes even within one mtime tick
+    sig = (str(path), st.st_ino, st.st_mtime_ns)
+    with _lock:
+        if _cache is None or _cache[0] != sig:
+            with open(path, "r", encoding="utf-8") as f:
+                _cache = (sig, json.load(f))
+        return dict(_cache[1])
+
+def get(dataset: str) -> int:
+    return snapshot().get(dataset, 0)
+
+def bump(*datasets: str):
+    if not datasets:
+        return
+    path = _path()
+    with _lock, _FileLock():
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                stamps = json.load(f)
+        except FileNotFoundError:
+            stamps = {}
+        now = time.time_ns()
+        for name in datasets:
+            stamps[name] = max(now, stamps.get(name, 0) + 1)
+        tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(stamps, f, sort_keys=True)
+        os.replace(tmp, path)  # atomic replace
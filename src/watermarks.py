@@ -0,0 +1,66 @@
+from __future__ import annotations
+import json, os, threading, uuid
+from datetime import date
+from pathlib import Path
+import duckdb
+
+from . import config
+from .storage import source_globs
+
+class WatermarkStore:
+    """
+    Per-dataset map of symbol -> max `date` already on disk, persisted as JSON in
+    config.STATE_DIR. Seeded from the dataset's Parquet files on first use.
+    """
+    def __init__(self, dataset: str, data_dir: Path | None = None, state_dir: Path | None = None):
+        self.dataset = dataset
+        self.data_dir = data_dir
+        self.path = (state_dir or config.STATE_DIR) / f"{dataset}_watermarks.json"
+        self.lock = threading.Lock()
+        self.marks: dict[str, str] = {}
+        if self.path.exists():
+            with open(self.path, "r", encoding="utf-8") as f:
+                self.marks = json.load(f)
+        elif data_dir is not None:
+            self.rebuild()
+
+    def rebuild(self) -> int:
+        """Recompute every watermark from the files on disk. Returns number of symbols."""
+        marks: dict[str, str] = {}
+        patterns = source_globs(self.data_dir) if self.data_dir is not None else []
+        if patterns:
+            files = ", ".join("'" + p.as_posix().replace("'", "''") + "'" for p in patterns)
+            con = duckdb.connect()
+            try:
+                rows = con.execute(
+                    f"SELECT symbol, CAST(MAX(date) AS DATE) FROM read_parquet([{files}], union_by_name=true, hive_partitioning=false) GROUP BY 1"
+                ).fetchall()
+            finally:
+                con.close()
+            marks = {sym: d.isoformat() for sym, d in rows if sym is not None and d is not None}
+        with self.lock:
+            self.marks = marks
+        return len(marks)
+
+    def get(self, symbol: str) -> date | None:
+        v = self.marks.get(symbol)
+        return date.fromisoformat(v) if v else None
+
+    def update(self, symbol: str, value: date):
+        # watermarks only move forward; backfills that add older rows leave them alone
+        with self.lock:
+            cur = self.marks.get(symbol)
+            if cur is None or value.isoformat() > cur:
+                self.marks[symbol] = value.isoformat()
+
+    def reset(self, symbol: str):
+        with self.lock:
+            self.marks.pop(symbol, None)
+
+    def save(self):
+        with self.lock:
+            payload = json.dumps(self.marks, sort_keys=True, indent=0)
+        tmp = f"{self.path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(payload)
+        os.replace(tmp, self.path)  # atomic replace
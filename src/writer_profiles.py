@@ -0,0 +1,84 @@
+from __future__ import annotations
+import inspect, os
+from dataclasses import dataclass, replace
+from pathlib import Path
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+from . import config
+from .datasets import DATASETS
+from .manifest import dataset_root
+
+_HAS_BLOOM = "bloom_filter_options" in inspect.signature(pq.write_table).parameters  # pyarrow >= 21
+
+@dataclass(frozen=True)
+class WriterProfile:
+    """How one dataset's Parquet files are laid out; applied by merge_parquet.write_parquet."""
+    sort_by: tuple[str, ...] = ("date",)        # rows sorted so min/max stats prune row groups
+    row_group_size: int = config.PARQUET_ROW_GROUP_SIZE
+    compression: str = config.PARQUET_COMPRESSION
+    compression_level: int | None = config.PARQUET_COMPRESSION_LEVEL
+    dictionary: tuple[str, ...] | None = None   # None: every string column
+    page_index: bool = True                     # per-page min/max for readers that use it
+    bloom_filter: tuple[str, ...] = ()          # equality lookups on multi-symbol files
+
+_FUNDAMENTALS = WriterProfile(sort_by=("date", "period"))
+PROFILES: dict[str, WriterProfile] = {
+    "prices": WriterProfile(),
+    "price_features": WriterProfile(),
+    "pit_panel": WriterProfile(),
+    "balance_sheet": _FUNDAMENTALS,
+    "income_statement": _FUNDAMENTALS,
+    "key_metrics": _FUNDAMENTALS,
+    "ratios": _FUNDAMENTALS,
+    "revenue_segments": WriterProfile(sort_by=("date", "segment")),
+}
+DEFAULT = WriterProfile(sort_by=())
+
+def profile_for(path: str | os.PathLike) -> WriterProfile:
+    """Profile of the dataset path belongs to; year= partitions hold every symbol, so they sort by (date, symbol)."""
+    root = dataset_root(path)
+    name = next((ds.name for ds in DATASETS.values() if ds.dir == root), None)
+    profile = PROFILES.get(name, DEFAULT)
+    if Path(path).parent.name.startswith("year="):
+        bloom = ("symbol",) if config.PARQUET_BLOOM_FILTERS else ()
+        profile = replace(profile, sort_by=("date", "symbol"), row_group_size=config.PARTITION_ROW_GROUP_SIZE,
+                          bloom_filter=bloom)
+    return profile
+
+def prepare(table: pa.Table, profile: WriterProfile) -> tuple[pa.Table, dict]:
+    """Sort table per profile and build the pq.write_table options that go with it."""
+    keys = [c for c in profile.sort_by if c in table.column_names]
+    if keys and table.num_rows > 1:
+        table = table.sort_by([(c, "ascending") for c in keys])
+    strings = [f.name for f in table.schema if pa.types.is_string(f.type) or pa.types.is_large_string(f.type)]
+    dictionary = [c for c in (profile.dictionary if profile.dictionary is not None else strings)
+                  if c in table.column_names]
+    opts = {
+        "row_group_size": profile.row_group_size,
+        "compression": profile.compression,
+        "compression_level": profile.compression_level,
+        "use_dictionary": dictionary or False,
+        "write_statistics": True,
+        "write_page_index": profile.page_index,
+    }
+    if keys:
+        opts["sorting_columns"] = pq.SortingColumn.from_ordering(table.schema, [(c, "ascending") for c in keys])
+    bloom = [c for c in profile.bloom_filter if c in table.column_names]
+    if bloom and _HAS_BLOOM:
+        opts["bloom_filter_options"] = {c: {"ndv": max(pc.count_distinct(table[c]).as_py(), 1), "fpp": 0.05}
+                                        for c in bloom}
+    return table, opts
+
+def matches(path: str | os.PathLike, profile: WriterProfile) -> bool:
+    """Whether the file at path already has the profile's codec and sort order (rewrite can skip it)."""
+    md = pq.read_metadata(path)
+    if md.num_row_groups == 0:
+        return True
+    rg = md.row_group(0)
+    if rg.num_columns and rg.column(0).compression.lower() != profile.compression.lower():
+        return False
+    want = [c for c in profile.sort_by if c in md.schema.names]
+    have = [md.schema.column(s.column_index).name for s in (rg.sorting_columns or ())]
+    return have == want
@@ -0,0 +1,13 @@
+# tests/conftest.py
+import pytest
+from src import config
+
+@pytest.fixture(autouse=True)
+def _isolated_state(tmp_path_factory, monkeypatch):
+    # version stamps, watermarks, journals etc. must never land in the real data/state
+    monkeypatch.setattr(config, "STATE_DIR", tmp_path_factory.mktemp("state"))
+
+@pytest.fixture(autouse=True)
+def _isolated_changelog(tmp_path_factory, monkeypatch):
+    # every upsert stages change rows; keep them out of the real data/changelog
+    monkeypatch.setattr(config, "CHANGELOG_DIR", tmp_path_factory.mktemp("changelog"))
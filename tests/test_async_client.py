@@ -0,0 +1,45 @@
+# tests/test_async_client.py
+import asyncio, json, threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+
+pytest.importorskip("aiohttp")
+from src.async_client import AsyncFMPClient
+from src.rate_limit import TokenBucketLimiter
+
+class _Handler(BaseHTTPRequestHandler):
+    hits = 0
+    def do_GET(self):
+        type(self).hits += 1
+        if type(self).hits == 1:
+            self.send_response(429)
+            self.send_header("Retry-After", "0")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        body = json.dumps([{"date": "2024-01-02", "adjClose": 1.5}]).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    def log_message(self, *args):
+        pass
+
+def test_get_json_retries_after_429(monkeypatch):
+    monkeypatch.setenv("API_KEY", "test")  # clients read the key when constructed
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}/stable/historical-price-eod/dividend-adjusted"
+    limiter = TokenBucketLimiter(60000, burst=10)
+
+    async def go():
+        async with AsyncFMPClient(limiter=limiter) as client:
+            return await asyncio.gather(*(client.get_json(url, {"symbol": s}, s) for s in ["AAA", "BBB", "CCC"]))
+
+    try:
+        out = asyncio.run(go())
+    finally:
+        server.shutdown()
+    assert out == [[{"date": "2024-01-02", "adjClose": 1.5}]] * 3
+    assert limiter.rpm < 60000  # the 429 slowed the shared budget down
@@ -0,0 +1,62 @@
+# tests/test_batch_prices.py
+from datetime import date
+import pandas as pd
+import pytest
+from src import batch_prices, config, import_prices, mock_fmp
+from src.datasets import Dataset
+from src.mock_fmp import MockFMPServer
+from src.prices_client import PricesClient
+from src.rate_limit import TokenBucketLimiter
+from src.schemas import decode_frame
+from src.watermarks import WatermarkStore
+
+TODAY, WM = date(2024, 1, 10), date(2024, 1, 5)  # Wednesday; watermark the Friday before
+
+@pytest.fixture
+def stored(tmp_path, monkeypatch):
+    monkeypatch.setenv("API_KEY", "test")  # PricesClient reads it when constructed
+    ds = Dataset("prices", "v_prices", tmp_path / "prices", ("symbol", "date"))
+    ds.dir.mkdir()
+    monkeypatch.setitem(batch_prices.DATASETS, "prices", ds)
+    marks = WatermarkStore("prices", ds.dir, state_dir=tmp_path)
+    for sym in ["S0000", "S0001", "S0002", "S0003", "S0004", "ZZZ"]:
+        df = decode_frame("prices", sym, mock_fmp.prices(sym, date(2024, 1, 1), WM))
+        if sym == "S0002":
+            df["adjClose"] *= 0.98  # stored before a dividend rescaled the past
+        df.to_parquet(ds.dir / f"{sym}.parquet", index=False)
+        marks.update(sym, WM)
+    return marks
+
+def test_bulk_files_route_recent_symbols_and_leave_the_rest(stored, monkeypatch):
+    with MockFMPServer(n_symbols=6) as srv:
+        monkeypatch.setattr(config, "FMP_EOD_BULK_URL", f"{srv.base_url}/stable/eod-bulk")
+        client = PricesClient(limiter=TokenBucketLimiter(60000, burst=10))
+        symbols = ["S0000", "S0001", "S0002", "S0003", "S0004", "S0005", "ZZZ"]
+        res = batch_prices.ingest(client, stored, symbols, today=TODAY)
+        assert res.requests == srv.stats["requests"] == 4  # Fri (overlap), Mon, Tue, Wed
+    assert sorted(res.routed) == ["S0000", "S0001", "S0003", "S0004"]
+    assert res.refetch == {"S0002"}  # ZZZ (not in the bulk file) and S0005 (no watermark) go per symbol
+    df = res.routed["S0001"]
+    assert df["date"].dt.date.tolist() == [date(2024, 1, 8), date(2024, 1, 9), date(2024, 1, 10)]
+    want = decode_frame("prices", "S0001", mock_fmp.prices("S0001", date(2024, 1, 8), TODAY))
+    assert df["adjClose"].tolist() == want.sort_values("date")["adjClose"].tolist()
+    assert df.dtypes.equals(want.dtypes)
+
+    # routed symbols skip the HTTP path entirely
+    assert import_prices._fetch_window(None, stored, {}, "S0001", routed=res.routed) is df
+    assert "S0001" not in res.routed
+
+def test_bulk_frame_adjusts_raw_bars_and_reads_json():
+    csv = b"symbol,date,open,low,high,close,adjClose,volume\nAAA,2024-01-02,8,6,12,10,5,100\n"
+    row = batch_prices.bulk_frame(csv).iloc[0]
+    assert (row.adjOpen, row.adjLow, row.adjHigh, row.adjClose, row.volume) == (4, 3, 6, 5, 100)
+    js = b'[{"symbol": "AAA", "date": "2024-01-02", "adjClose": 5.0, "volume": 7}]'
+    assert batch_prices.bulk_frame(js)["volume"].tolist() == [7]
+    assert batch_prices.bulk_frame(b"").empty and batch_prices.bulk_frame(None).empty
+
+def test_no_batch_when_it_would_not_save_requests(stored):
+    class NoCalls:
+        def eod_bulk_raw(self, day):
+            raise AssertionError("unexpected bulk request")
+    assert batch_prices.ingest(NoCalls(), stored, ["S0000", "S0001"], today=TODAY).routed == {}
+    assert batch_prices.ingest(NoCalls(), stored, ["S0000"] * 9, today=date(2024, 1, 20)).routed == {}  # stale
@@ -0,0 +1,69 @@
+# tests/test_cadence.py
+from datetime import date
+import pandas as pd
+import pytest
+from src import cadence, config
+from src.datasets import Dataset
+from src.membership import FetchPlan
+
+@pytest.fixture
+def dsets(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "STATE_DIR", tmp_path)
+    monkeypatch.setattr(config, "FILING_WINDOW_DAYS", 7)
+    monkeypatch.setattr(config, "FUNDAMENTALS_SWEEP_DAYS", 28)
+    out = {}
+    for name in ("income_statement", "ratios"):
+        ds = Dataset(name, f"v_{name}", tmp_path / name, ("symbol", "date", "period"))
+        ds.dir.mkdir()
+        monkeypatch.setitem(cadence.DATASETS, name, ds)
+        out[name] = ds
+    return out
+
+def _write(ds, sym, periods, filed=None):
+    df = pd.DataFrame({"symbol": sym, "date": pd.to_datetime(periods), "period": "Q"})
+    if filed is not None:
+        df["filingDate"] = pd.to_datetime(filed)
+    df.to_parquet(ds.dir / f"{sym}.parquet", index=False)
+
+def test_only_symbols_near_their_next_filing_are_fetched(dsets):
+    q = ["2023-12-31", "2024-03-31", "2024-06-30"]
+    _write(dsets["income_statement"], "AAA", q, ["2024-02-01", "2024-05-01", "2024-08-01"])  # next ~2024-10-31
+    _write(dsets["income_statement"], "BBB", q, ["2024-01-20", "2024-04-20", "2024-07-20"])  # next ~2024-10-19
+    _write(dsets["ratios"], "AAA", q)
+    _write(dsets["ratios"], "BBB", q[:2])  # still missing the period the income statement has
+
+    sched = cadence.schedule("income_statement", date(2024, 10, 15))
+    assert sched["AAA"] == (date(2024, 10, 31), date(2024, 10, 24))
+
+    today = date(2024, 10, 15)
+    cadence.record_sweep("income_statement", date(2024, 10, 1))
+    cadence.record_sweep("ratios", date(2024, 10, 1))
+    plan = FetchPlan("income_statement", ["AAA", "BBB", "NEW"], ["ENT"], [])
+    assert cadence.due_symbols(plan, today) == (["BBB", "ENT", "NEW"], False)
+    plan = FetchPlan("ratios", ["AAA", "BBB"], [], [])
+    assert cadence.due_symbols(plan, today) == (["BBB"], False)
+
+    assert cadence.due_symbols(plan, date(2024, 10, 29)) == (["AAA", "BBB"], True)  # 28 days since the sweep
+
+def test_unscheduled_symbols_back_off_after_an_attempt(dsets, monkeypatch):
+    monkeypatch.setattr(config, "FUNDAMENTALS_SWEEP_DAYS", 1000)
+    q = ["2023-12-31", "2024-03-31", "2024-06-30"]
+    _write(dsets["income_statement"], "AAA", q, ["2024-02-01", "2024-05-01", "2024-08-01"])
+    _write(dsets["ratios"], "AAA", q[:2])  # stopped following the income statement
+    cadence.record_sweep("ratios", date(2024, 10, 1))
+    plan = FetchPlan("ratios", ["AAA", "NONE"], [], [])  # NONE never had ratios stored
+    assert cadence.due_symbols(plan, date(2024, 10, 2)) == (["AAA", "NONE"], False)
+    cadence.record_attempts("ratios", ["AAA", "NONE"], date(2024, 10, 2))
+    assert cadence.due_symbols(plan, date(2024, 10, 3)) == ([], False)
+    assert cadence.due_symbols(plan, date(2024, 10, 2) + pd.Timedelta(days=cadence.DEFAULT_CADENCE_DAYS)) \
+        == (["AAA", "NONE"], False)
+
+def test_lagging_dataset_is_retried_right_after_the_reference_files(dsets):
+    q = ["2024-03-31", "2024-06-30"]
+    _write(dsets["income_statement"], "AAA", q, ["2024-05-01", "2024-08-01"])
+    _write(dsets["ratios"], "AAA", q[:1])
+    cadence.record_sweep("ratios", date(2024, 8, 1))
+    cadence.record_attempts("ratios", ["AAA"], date(2024, 8, 2))
+    plan = FetchPlan("ratios", ["AAA"], [], [])
+    assert cadence.due_symbols(plan, date(2024, 8, 3)) == (["AAA"], False)  # within the window: daily
+    assert cadence.due_symbols(plan, date(2024, 8, 20)) == ([], False)      # past it: backed off
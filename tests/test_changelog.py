@@ -0,0 +1,41 @@
+# tests/test_changelog.py
+import pandas as pd
+import pytest
+from src import changelog, config
+from src.merge_parquet import upsert_parquet
+
+@pytest.fixture
+def log_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "CHANGELOG_DIR", tmp_path / "changelog")
+    monkeypatch.setattr(config, "STATE_DIR", tmp_path)
+    (tmp_path / "prices").mkdir()
+    return tmp_path
+
+def _rows(closes):
+    return pd.DataFrame({"symbol": "AAA", "date": pd.bdate_range("2024-01-01", periods=len(closes)), "adjClose": closes})
+
+def test_upserts_log_inserts_and_real_updates_only(log_dir):
+    path = (log_dir / "prices" / "AAA.parquet").as_posix()
+    upsert_parquet(_rows([1.0, 2.0]), path, ["symbol", "date"])
+    first = changelog.flush("prices")
+    upsert_parquet(_rows([1.0, 2.5, 3.0]), path, ["symbol", "date"])  # day 1 unchanged
+    second = changelog.flush("prices")
+    assert changelog.flush("prices") == [] and second[0] > first[0]
+
+    all_rows = changelog.read_since("prices")
+    assert all_rows["_op"].tolist() == ["insert", "insert", "insert", "update"]
+    since = changelog.read_since("prices", first[0])
+    assert sorted(zip(since["_op"], since["adjClose"])) == [("insert", 3.0), ("update", 2.5)]
+    assert (since["_seq"] == second[0]).all() and changelog.latest_seq("prices") == second[0]
+
+    assert changelog.prune("prices", first[0]) == 1
+    assert len(changelog.read_since("prices")) == 2
+
+def test_staged_changes_survive_a_killed_process(log_dir):
+    path = (log_dir / "prices" / "AAA.parquet").as_posix()
+    upsert_parquet(_rows([1.0, 2.0]), path, ["symbol", "date"])
+    changelog._staged_rows.clear()  # the process died before its sink closed
+    assert changelog.read_since("prices").empty
+    seq = changelog.flush("prices")  # e.g. the --resume run's sink close
+    assert changelog.read_since("prices")["_seq"].tolist() == seq * 2
+    assert changelog.flush() == []
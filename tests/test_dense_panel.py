@@ -0,0 +1,68 @@
+# tests/test_dense_panel.py
+from datetime import date
+import numpy as np
+import pandas as pd
+import pytest
+from src import config, dense_panel
+from src.datasets import Dataset
+
+@pytest.fixture
+def prices(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "DENSE_PANEL_DIR", tmp_path / "dense")
+    monkeypatch.setattr(config, "STATE_DIR", tmp_path)
+    ds = Dataset("prices", "v_prices", tmp_path / "prices", ("symbol", "date"))
+    ds.dir.mkdir()
+    monkeypatch.setitem(dense_panel.DATASETS, "prices", ds)
+    return ds
+
+def _write(ds, sym, days, close):
+    pd.DataFrame({"symbol": sym, "date": pd.to_datetime(days), "adjClose": close, "volume": 100}) \
+        .to_parquet(ds.dir / f"{sym}.parquet", index=False)
+
+def test_append_rows_and_entrants_in_place(prices):
+    days = pd.bdate_range("2024-01-01", "2024-01-05")
+    _write(prices, "AAA", days, 1.0)
+    _write(prices, "BBB", days[1:], 2.0)
+    assert dense_panel.update_dense_panel(None)["rebuilt"]
+    p = dense_panel.load()
+    assert p.symbols == ["AAA", "BBB"] and len(p.dates) == 5
+    assert isinstance(p["adjClose"].base, np.memmap) and np.isnan(p["adjClose"][0, 1])
+    gen = dense_panel._read_meta()["gen"]
+
+    more = pd.bdate_range("2024-01-01", "2024-01-09")
+    _write(prices, "AAA", more, 1.5)
+    _write(prices, "CCC", more[-2:], 3.0)  # index entrant fills a spare column
+    res = dense_panel.update_dense_panel({"AAA": date(2024, 1, 4), "CCC": date(2024, 1, 8)})
+    assert not res["rebuilt"] and res["appended_dates"] == 2
+    assert dense_panel._read_meta()["gen"] == gen
+
+    q = dense_panel.load()
+    assert q.symbols == ["AAA", "BBB", "CCC"] and q.dates[-1] == np.datetime64("2024-01-09")
+    aaa = q["adjClose"][:, q.col("AAA")]
+    assert aaa.tolist() == [1.0, 1.0, 1.0, 1.5, 1.5, 1.5, 1.5]  # rows from the changed date were rewritten
+    assert np.isnan(q["adjClose"][q.rows("2024-01-02", "2024-01-05"), q.col("CCC")]).all()
+    assert p["adjClose"].shape == (5, 2)  # an older mapping keeps its own shape
+
+def test_dates_before_the_panel_trigger_a_rebuild(prices):
+    _write(prices, "AAA", pd.bdate_range("2024-01-08", "2024-01-12"), 1.0)
+    dense_panel.update_dense_panel(None)
+    _write(prices, "AAA", pd.bdate_range("2024-01-01", "2024-01-12"), 1.0)
+    assert dense_panel.update_dense_panel({"AAA": date(2024, 1, 1)})["rebuilt"]
+    assert len(dense_panel.load().dates) == 10
+
+def test_rebuild_keeps_the_previous_generation(prices, monkeypatch):
+    _write(prices, "AAA", pd.bdate_range("2024-01-08", "2024-01-12"), 1.0)
+    gens = []
+    for _ in range(3):
+        dense_panel.update_dense_panel(None)
+        gens.append(dense_panel._read_meta()["gen"])
+    d = config.DENSE_PANEL_DIR
+    assert (d / f"dates.{gens[1]}.npy").exists() and dense_panel._file("adjClose", gens[1]).exists()
+    assert not list(d.glob(f"*.{gens[0]}.*"))
+
+    # a reader that read meta.json before a rebuild removed that generation retries once
+    stale = {**dense_panel._read_meta(), "gen": gens[0]}
+    reads = iter([stale])
+    real = dense_panel._read_meta
+    monkeypatch.setattr(dense_panel, "_read_meta", lambda: next(reads, None) or real())
+    assert len(dense_panel.load().dates) == 5
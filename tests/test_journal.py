@@ -0,0 +1,88 @@
+# tests/test_journal.py
+import json
+import pandas as pd
+import pytest
+from src import config
+from src.journal import RunJournal
+from src.scheduler import DatasetTask, run_tasks
+
+class FlakySink:
+    def __init__(self, fail_on=()):
+        self.fail_on, self.written = set(fail_on), []
+    def write(self, symbol, df):
+        if symbol in self.fail_on:
+            raise OSError("disk full")
+        self.written.append(symbol)
+        return len(df)
+    def close(self):
+        return 0
+
+def _task(sink, fetched):
+    def fetch(sym):
+        fetched.append(sym)
+        return b"[]" if sym == "EMPTY" else json.dumps([{"date": "2024-01-02", "v": 1}]).encode()
+    decode = lambda sym, raw: pd.DataFrame(json.loads(raw)).assign(date=lambda d: pd.to_datetime(d["date"]))
+    return DatasetTask("prices", ["AAA", "BBB", "CCC", "EMPTY"], fetch, decode, sink)
+
+def test_resume_skips_only_committed_jobs(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "STATE_DIR", tmp_path)
+    fetched = []
+    journal = RunJournal("prices")
+    run_tasks([journal.attach(_task(FlakySink(fail_on={"BBB"}), fetched))], max_workers=1)
+    journal.close()  # the run "crashed" here: no finish()
+
+    resumed = RunJournal("prices", resume=True)
+    assert resumed.done("prices") == {"AAA", "CCC", "EMPTY"}  # BBB's write failed, so it was never journaled
+    assert resumed.first_dates("prices")["AAA"].isoformat() == "2024-01-02"
+    fetched.clear()
+    sink = FlakySink()
+    run_tasks([resumed.attach(_task(sink, fetched))], max_workers=1)
+    assert fetched == ["BBB"] and sink.written == ["BBB"]
+    resumed.finish()
+    assert not (tmp_path / "journal" / "prices.jsonl").exists()
+    assert RunJournal("prices", resume=True).done("prices") == set()
+
+def test_resume_replays_committed_jobs_into_the_task(tmp_path, monkeypatch):
+    from src import membership
+    monkeypatch.setattr(config, "STATE_DIR", tmp_path)
+    journal = RunJournal("prices")
+    run_tasks([journal.attach(_task(FlakySink(fail_on={"BBB"}), []))], max_workers=1)
+    journal.close()
+
+    seen, closed = {}, []
+    task = _task(FlakySink(), [])
+    task.on_written = lambda sym, df: seen.setdefault(sym, (df["date"].min().date().isoformat(),
+                                                            df["date"].max().date().isoformat()))
+    task.on_close = lambda: closed.append(dict(seen))
+    monkeypatch.setattr(membership, "mark_backfilled", lambda ds, syms: closed.append(sorted(syms)))
+    plan = membership.FetchPlan("prices", incremental=["AAA", "BBB", "CCC", "EMPTY"], backfill=["AAA"], frozen=[])
+    run_tasks([RunJournal("prices", resume=True).attach(membership.track(task, plan))], max_workers=1)
+    # AAA and CCC were committed before the "crash"; watermarks and backfill still see them
+    assert closed[0] == {s: ("2024-01-02", "2024-01-02") for s in ("AAA", "BBB", "CCC")}
+    assert closed[1] == ["AAA"]
+
+def test_partitioned_jobs_are_journaled_once_flushed(tmp_path, monkeypatch):
+    from src.datasets import Dataset
+    from src.sinks import PartitionedSink
+    monkeypatch.setattr(config, "STATE_DIR", tmp_path)
+    ds = Dataset("prices", "v_prices", tmp_path / "prices", ("symbol", "date"))
+    ds.dir.mkdir()
+    monkeypatch.setattr(config, "PARTITIONED_DATASETS", {"prices"})
+    monkeypatch.setattr(config, "DECODE_WORKERS", 1)  # jobs reach the main loop in order
+    monkeypatch.setattr(config, "WRITE_WORKERS", 1)
+
+    task = _task(PartitionedSink(ds, flush_rows=2), [])
+    task.decode = lambda sym, raw: pd.DataFrame(json.loads(raw) or {"date": []}).assign(
+        symbol=sym, date=lambda d: pd.to_datetime(d["date"]))
+    def on_written(sym, df):
+        if sym == "CCC":
+            raise RuntimeError("crash after the first flush")
+    task.on_written = on_written
+    journal = RunJournal("prices")
+    with pytest.raises(RuntimeError):
+        run_tasks([journal.attach(task)], max_workers=1)
+    journal.close()
+    # AAA and BBB were flushed together; CCC's row was only buffered when the run died
+    done = RunJournal("prices", resume=True).done("prices")
+    assert {"AAA", "BBB"} <= done and "CCC" not in done
+    assert pd.read_parquet(ds.dir / "year=2024" / "data.parquet")["symbol"].tolist() == ["AAA", "BBB"]
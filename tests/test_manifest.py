@@ -0,0 +1,61 @@
+# tests/test_manifest.py
+import json
+import duckdb
+import pandas as pd
+from src import manifest, storage
+from src.datasets import Dataset
+from src.merge_parquet import append_delta, compact_parquet, upsert_parquet
+from src.partitioned import migrate_to_partitioned
+from src.sinks import SymbolFileSink
+
+def _prices(symbol, dates, close=1.0):
+    return pd.DataFrame({"symbol": symbol, "date": pd.to_datetime(dates), "adjClose": close})
+
+def test_writes_are_recorded(tmp_path):
+    keys = ["symbol", "date"]
+    upsert_parquet(_prices("AAA", ["2024-01-02", "2024-01-03"]), (tmp_path / "AAA.parquet").as_posix(), keys)
+    upsert_parquet(_prices("BBB", ["2023-06-01"]), (tmp_path / "BBB.parquet").as_posix(), keys)
+
+    m = manifest.open_manifest(tmp_path)
+    assert m.files["AAA.parquet"]["symbols"] == {"AAA": [2, "2024-01-02", "2024-01-03"]}
+    s = m.summary()
+    assert (s["total_rows"], s["distinct_symbols"], s["min_symbol"], s["max_symbol"]) == (3, 2, "BBB", "AAA")
+    assert m.files_for(start="2024-01-01") == [(tmp_path / "AAA.parquet").resolve()]
+    assert m.files_for(symbols=["BBB"], end="2023-12-31") == [(tmp_path / "BBB.parquet").resolve()]
+
+    append_delta(_prices("AAA", ["2024-01-04"]), (tmp_path / "AAA.parquet").as_posix(), keys)
+    assert not m.exact
+    compact_parquet((tmp_path / "AAA.parquet").as_posix(), keys)
+    assert m.exact and m.row_count() == 4
+
+def test_sync_and_pruned_source(tmp_path):
+    ds = Dataset("prices", "v_prices", tmp_path, ("symbol", "date"))
+    # written behind the manifest's back: picked up by sync()
+    _prices("AAA", ["2023-12-29", "2024-01-02"]).to_parquet(tmp_path / "AAA.parquet", index=False)
+    _prices("BBB", ["2024-01-02"]).to_parquet(tmp_path / "BBB.parquet", index=False)
+    assert manifest.load(tmp_path).coverage()["rows"].tolist() == [2, 1]
+
+    migrate_to_partitioned(ds)
+    m = manifest.load(tmp_path)
+    assert sorted(m.files) == ["year=2023/data.parquet", "year=2024/data.parquet"]
+
+    con = duckdb.connect()
+    storage._maybe_create_view_for_dir(con, ds.view, ds.dir, ds.key_cols)
+    src = storage.pruned_source(ds, start="2024-01-01")
+    assert "year=2023" not in src
+    assert con.execute(f"SELECT COUNT(*) FROM {src}").fetchone()[0] == 2
+
+def test_saved_once_per_batch_and_readers_never_write(tmp_path):
+    ds = Dataset("prices", "v_prices", tmp_path, ("symbol", "date"))
+    sink = SymbolFileSink(ds, mode="rewrite")
+    sink.write("AAA", _prices("AAA", ["2024-01-02"]))
+    sink.write("BBB", _prices("BBB", ["2024-01-02"]))
+    path = tmp_path / manifest.MANIFEST_NAME
+    assert not path.exists()  # recorded in memory only
+    sink.close()
+    assert sorted(json.loads(path.read_text())["files"]) == ["AAA.parquet", "BBB.parquet"]
+
+    _prices("CCC", ["2024-01-02"]).to_parquet(tmp_path / "CCC.parquet", index=False)
+    before = path.stat().st_mtime_ns
+    assert manifest.load(tmp_path).coverage()["symbol"].tolist() == ["AAA", "BBB", "CCC"]
+    assert path.stat().st_mtime_ns == before
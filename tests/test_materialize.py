@@ -0,0 +1,48 @@
+# tests/test_materialize.py
+import duckdb
+import pandas as pd
+from src import storage
+from src.datasets import Dataset
+from src.materialize import refresh_table
+
+def _prices(symbol, dates, close=1.0):
+    return pd.DataFrame({"symbol": symbol, "date": pd.to_datetime(dates), "adjClose": close})
+
+def test_incremental_refresh_reingests_changed_symbols(tmp_path):
+    ds = Dataset("prices", "v_prices", tmp_path, ("symbol", "date"))
+    _prices("AAA", ["2024-01-02", "2024-01-03"]).to_parquet(tmp_path / "AAA.parquet", index=False)
+    _prices("BBB", ["2024-01-02"]).to_parquet(tmp_path / "BBB.parquet", index=False)
+    con = duckdb.connect()
+    storage._maybe_create_view_for_dir(con, ds.view, ds.dir, ds.key_cols)
+
+    assert refresh_table(con, ds)["mode"] == "full"
+    assert con.execute("SELECT COUNT(*) FROM t_prices").fetchone()[0] == 3
+    assert refresh_table(con, ds)["mode"] == "noop"
+
+    _prices("BBB", ["2024-01-02", "2024-01-03"], 2.0).to_parquet(tmp_path / "BBB.parquet", index=False)
+    res = refresh_table(con, ds)
+    assert res["mode"] == "incremental" and res["units"] == 1
+    rows = con.execute("SELECT symbol, adjClose, COUNT(*) FROM t_prices GROUP BY ALL ORDER BY 1").fetchall()
+    assert rows == [("AAA", 1.0, 2), ("BBB", 2.0, 2)]
+
+    (tmp_path / "AAA.parquet").unlink()
+    refresh_table(con, ds)
+    assert con.execute("SELECT DISTINCT symbol FROM t_prices").fetchall() == [("BBB",)]
+
+def test_new_column_triggers_rebuild(tmp_path):
+    ds = Dataset("prices", "v_prices", tmp_path, ("symbol", "date"))
+    _prices("AAA", ["2024-01-02"]).to_parquet(tmp_path / "AAA.parquet", index=False)
+    con = duckdb.connect()
+    storage._maybe_create_view_for_dir(con, ds.view, ds.dir, ds.key_cols)
+    refresh_table(con, ds)
+
+    _prices("AAA", ["2024-01-02"]).assign(volume=10).to_parquet(tmp_path / "AAA.parquet", index=False)
+    storage._maybe_create_view_for_dir(con, ds.view, ds.dir, ds.key_cols)
+    assert refresh_table(con, ds)["mode"] == "full"
+    assert con.execute("SELECT volume FROM t_prices").fetchone()[0] == 10
+
+def test_relation_maps_only_materialized_views():
+    from src.materialize import relation
+    assert relation("v_prices", "view") == "v_prices"
+    assert relation("v_prices", "table", schema="db") == "db.t_prices"
+    assert relation("v_sp500_constituents", "table", schema="db") == "v_sp500_constituents"
@@ -0,0 +1,48 @@
+# tests/test_membership.py
+from datetime import date
+import pandas as pd
+import pytest
+from src import config, membership
+from src.scheduler import DatasetTask
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "STATE_DIR", tmp_path)
+    monkeypatch.setattr(config, "CONSTITUENT_SNAPSHOTS_DIR", tmp_path / "snapshots")
+    monkeypatch.setattr(config, "PARQUET_MEMBERSHIP", tmp_path / "membership.parquet")
+    monkeypatch.setattr(config, "PARQUET_CONSTITUENTS", tmp_path / "constituents.parquet")
+    return tmp_path
+
+def _snap(day, symbols, added="2010-01-04"):
+    df = pd.DataFrame({"symbol": symbols, "dateFirstAdded": added})
+    df.to_parquet(config.PARQUET_CONSTITUENTS, index=False)
+    return membership.record_snapshot(df, as_of=date.fromisoformat(day))
+
+def test_diff_queues_entrants_and_freezes_leavers(store):
+    first = _snap("2024-01-02", ["AAA", "BBB"])
+    assert first.added == [] and first.kept == ["AAA", "BBB"]  # first snapshot only seeds history
+    assert membership.fetch_plan("prices").backfill == []
+
+    diff = _snap("2024-03-01", ["AAA", "CCC"])
+    assert (diff.added, diff.removed, diff.kept) == (["CCC"], ["BBB"], ["AAA"])
+    assert _snap("2024-03-01", ["AAA", "CCC"]).added == []  # same-day rerun diffs against itself
+
+    plan = membership.fetch_plan("ratios")
+    assert (plan.incremental, plan.backfill, plan.frozen) == (["AAA"], ["CCC"], ["BBB"])
+    assert plan.symbols == ["AAA", "CCC"]
+
+    spells = membership.membership_frame().set_index("symbol")
+    assert spells.loc["AAA", "start"] == pd.Timestamp("2010-01-04") and pd.isna(spells.loc["AAA", "end"])
+    assert spells.loc["BBB", "end"] == pd.Timestamp("2024-03-01")
+    assert spells.loc["CCC", "start"] == pd.Timestamp("2024-03-01")
+
+def test_backfill_cleared_once_written(store):
+    _snap("2024-01-02", ["AAA"])
+    _snap("2024-02-01", ["AAA", "CCC", "DDD"])
+    plan = membership.fetch_plan("prices")
+    task = DatasetTask("prices", plan.symbols, fetch=None, decode=None, sink=None)
+    membership.track(task, plan)
+    task.on_written("CCC", pd.DataFrame())
+    task.on_close()
+    assert membership.fetch_plan("prices").backfill == ["DDD"]  # DDD returned nothing yet
+    assert membership.fetch_plan("ratios").backfill == ["CCC", "DDD"]  # tracked per dataset
@@ -0,0 +1,59 @@
+# tests/test_merge_parquet.py
+import duckdb
+import pandas as pd
+from src import storage
+from src.merge_parquet import append_delta, compact_dir, compact_parquet, delta_segments, symbol_of, upsert_parquet
+
+KEYS = ["symbol", "date"]
+
+def _prices(dates, close):
+    return pd.DataFrame({"symbol": "AAA", "date": pd.to_datetime(dates), "adjClose": close})
+
+def test_upsert_counts_only_new_rows(tmp_path):
+    path = (tmp_path / "AAA.parquet").as_posix()
+    assert upsert_parquet(_prices(["2024-01-02", "2024-01-03"], 1.0), path, KEYS) == 2
+    assert upsert_parquet(_prices(["2024-01-03", "2024-01-04"], 2.0), path, KEYS) == 1
+    df = pd.read_parquet(path).sort_values("date")
+    assert df["adjClose"].tolist() == [1.0, 2.0, 2.0]
+
+def test_delta_view_last_write_wins_then_compaction(tmp_path):
+    path = (tmp_path / "AAA.parquet").as_posix()
+    append_delta(_prices(["2024-01-02", "2024-01-03"], 1.0), path, KEYS)  # becomes the base
+    append_delta(_prices(["2024-01-03", "2024-01-04"], 2.0), path, KEYS)
+    append_delta(_prices(["2024-01-04"], 3.0), path, KEYS)
+    assert len(delta_segments(path)) == 2
+
+    con = duckdb.connect()
+    storage._maybe_create_view_for_dir(con, "v", tmp_path, tuple(KEYS))
+    rows = con.execute("SELECT CAST(date AS DATE)::VARCHAR, adjClose FROM v ORDER BY date").fetchall()
+    assert rows == [("2024-01-02", 1.0), ("2024-01-03", 2.0), ("2024-01-04", 3.0)]
+
+    assert compact_parquet(path, KEYS) == 2
+    assert delta_segments(path) == []
+    df = pd.read_parquet(path).sort_values("date")
+    assert df["adjClose"].tolist() == [1.0, 2.0, 3.0]
+
+def test_dotted_tickers_keep_their_own_segments(tmp_path):
+    def rows(sym, dates, close):
+        return pd.DataFrame({"symbol": sym, "date": pd.to_datetime(dates), "adjClose": close})
+    brk, brkb = (tmp_path / "BRK.parquet").as_posix(), (tmp_path / "BRK.B.parquet").as_posix()
+    for path, sym in ((brk, "BRK"), (brkb, "BRK.B")):
+        append_delta(rows(sym, ["2024-01-02"], 1.0), path, KEYS)
+        append_delta(rows(sym, ["2024-01-03"], 2.0), path, KEYS)
+    assert [symbol_of(p) for p in delta_segments(brk)] == ["BRK"]
+    assert compact_dir(tmp_path, KEYS) == {"symbols_compacted": 2, "segments_merged": 2}
+    assert pd.read_parquet(brk)["symbol"].unique().tolist() == ["BRK"]
+    assert pd.read_parquet(brkb)["symbol"].unique().tolist() == ["BRK.B"]
+
+def test_delta_mode_totals_count_rows_written(tmp_path, monkeypatch):
+    import json
+    from src.datasets import Dataset
+    from src.scheduler import DatasetTask, run_tasks
+    from src.sinks import SymbolFileSink
+    ds = Dataset("prices", "v_prices", tmp_path, tuple(KEYS))
+    _prices(["2024-01-02", "2024-01-03"], 1.0).to_parquet(tmp_path / "AAA.parquet", index=False)
+    decode = lambda sym, raw: _prices(json.loads(raw), 1.0)
+    task = DatasetTask("prices", ["AAA"], lambda sym: json.dumps(["2024-01-03", "2024-01-04"]).encode(),
+                       decode, SymbolFileSink(ds, mode="delta"))
+    totals = run_tasks([task], max_workers=1)["prices"]
+    assert totals["rows_written"] == 2 and totals["rows_added"] == 0  # overlap row is not a new key
@@ -0,0 +1,29 @@
+# tests/test_metrics.py
+import json
+import pandas as pd
+from src import config, metrics
+from src.merge_parquet import upsert_parquet
+
+def test_stage_timings_and_reports(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "REPORT_DIR", tmp_path / "reports")
+    monkeypatch.setattr(config, "METRICS_PROM_FILE", str(tmp_path / "fmp.prom"))
+    metrics.reset()
+    df = pd.DataFrame({"symbol": "AAA", "date": pd.to_datetime(["2024-01-02"]), "adjClose": 1.0})
+    path = (tmp_path / "AAA.parquet").as_posix()
+    upsert_parquet(df, path, ["symbol", "date"])
+    upsert_parquet(df, path, ["symbol", "date"])
+    for s in (0.1, 0.2, 0.3):
+        metrics.observe("fetch", s, "prices", "AAA")
+    metrics.count("http_429", 2)
+
+    rep = json.loads(metrics.finish_run("test").read_text())
+    stages = {(s["stage"], s["dataset"]): s for s in rep["stages"]}
+    assert stages[("parquet_write", "")]["count"] == 2 and stages[("parquet_write", "")]["bytes"] > 0
+    assert stages[("upsert_read", "")]["count"] == 1
+    assert stages[("fetch", "prices")]["p50_s"] == 0.2
+    assert rep["counters"] == {"http_429": 2}
+    assert rep["slowest_symbols"][0] == {"dataset": "prices", "symbol": "AAA", "seconds": 0.6}
+
+    prom = (tmp_path / "fmp.prom").read_text()
+    assert 'fmp_stage_seconds{run="test",stage="fetch",dataset="prices",quantile="0.5"} 0.2' in prom
+    assert 'fmp_events_total{run="test",event="http_429"} 2' in prom
@@ -0,0 +1,22 @@
+# tests/test_mock_fmp.py
+import json
+from datetime import date
+from src.fmp_http import get_raw, new_session
+from src.mock_fmp import MockFMPServer
+from src.rate_limit import TokenBucketLimiter
+from src.schemas import decode_frame
+
+def test_mock_serves_windows_records_and_throttles(tmp_path, monkeypatch):
+    rec = tmp_path / "income-statement"
+    rec.mkdir()
+    (rec / "AAA.json").write_text(json.dumps([{"symbol": "AAA", "date": "2020-12-31", "period": "FY"}]))
+    with MockFMPServer(n_symbols=3, rate_429=0.5, retry_after=0.0, record_dir=tmp_path, seed=1) as srv:
+        session, limiter = new_session(2), TokenBucketLimiter(60000, burst=10)
+        url = f"{srv.base_url}/stable/historical-price-eod/dividend-adjusted"
+        raw = get_raw(session, limiter, url, {"symbol": "S0001", "from": "2024-01-01", "to": "2024-01-07"}, "S0001", attempts=20)
+        df = decode_frame("prices", "S0001", raw)
+        assert df["date"].dt.date.tolist() == [date(2024, 1, d) for d in (5, 4, 3, 2, 1)]
+
+        raw = get_raw(session, limiter, f"{srv.base_url}/stable/income-statement", {"symbol": "AAA"}, "AAA", attempts=20)
+        assert json.loads(raw)[0]["date"] == "2020-12-31"
+        assert srv.stats["throttled"] > 0 and srv.stats["ok"] == 2
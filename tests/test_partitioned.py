@@ -0,0 +1,72 @@
+# tests/test_partitioned.py
+import duckdb
+import pandas as pd
+import pyarrow.parquet as pq
+import pytest
+from src import storage
+from src.datasets import Dataset
+from src.partitioned import migrate_to_partitioned, migrate_to_symbol_files, partition_path, upsert_partitioned
+
+def _prices(symbol, dates, close=1.0):
+    return pd.DataFrame({"symbol": symbol, "date": pd.to_datetime(dates), "adjClose": close})
+
+def test_migrate_and_upsert_partitions(tmp_path):
+    ds = Dataset("prices", "v_prices", tmp_path, ("symbol", "date"))
+    _prices("BBB", ["2023-12-29", "2024-01-02"]).to_parquet(tmp_path / "BBB.parquet", index=False)
+    _prices("AAA", ["2023-12-29", "2024-01-02"]).to_parquet(tmp_path / "AAA.parquet", index=False)
+
+    res = migrate_to_partitioned(ds)
+    assert res["partitions"] == 2 and res["rows"] == 4
+    assert not list(tmp_path.glob("*.parquet"))
+    df = pd.read_parquet(partition_path(tmp_path, 2024))
+    assert df["symbol"].tolist() == ["AAA", "BBB"]  # sorted by (date, symbol)
+
+    added = upsert_partitioned(_prices("AAA", ["2024-01-02", "2024-01-03"], 2.0), tmp_path, ["symbol", "date"])
+    assert added == 1
+    assert pq.read_metadata(partition_path(tmp_path, 2023)).num_rows == 2
+
+    con = duckdb.connect()
+    storage._maybe_create_view_for_dir(con, "v", tmp_path, ds.key_cols)
+    rows = con.execute("SELECT symbol, adjClose FROM v WHERE year = 2024 AND date = '2024-01-02' ORDER BY 1").fetchall()
+    assert rows == [("AAA", 2.0), ("BBB", 1.0)]
+
+    assert migrate_to_symbol_files(ds)["files_out"] == 2
+    assert len(pd.read_parquet(tmp_path / "AAA.parquet")) == 3
+
+def test_switching_layout_without_migration_keeps_symbol_files(tmp_path, monkeypatch):
+    from src import config
+    from src.sinks import PartitionedSink, open_sink
+    ds = Dataset("prices", "v_prices", tmp_path, ("symbol", "date"))
+    _prices("AAA", ["2023-12-29", "2024-01-02"]).to_parquet(tmp_path / "AAA.parquet", index=False)
+    upsert_partitioned(_prices("BBB", ["2024-01-02"]), tmp_path, ["symbol", "date"])  # layout flipped early
+    upsert_partitioned(_prices("AAA", ["2024-01-02"], 2.0), tmp_path, ["symbol", "date"])
+
+    con = duckdb.connect()
+    storage._maybe_create_view_for_dir(con, "v", tmp_path, ds.key_cols)
+    rows = con.execute("SELECT symbol, year, adjClose FROM v ORDER BY date, symbol").fetchall()
+    assert rows == [("AAA", 2023, 1.0), ("AAA", 2024, 2.0), ("BBB", 2024, 1.0)]  # both layouts, partitions win
+
+    monkeypatch.setattr(config, "PARTITIONED_DATASETS", {"prices"})
+    assert isinstance(open_sink(ds), PartitionedSink)
+    assert not list(tmp_path.glob("*.parquet"))  # migrated before any write
+    storage._maybe_create_view_for_dir(con, "v", tmp_path, ds.key_cols)
+    assert con.execute("SELECT symbol, year, adjClose FROM v ORDER BY date, symbol").fetchall() == rows
+
+def test_migration_refuses_rows_without_a_date(tmp_path):
+    ds = Dataset("prices", "v_prices", tmp_path, ("symbol", "date"))
+    df = _prices("AAA", ["2024-01-02", None])
+    df.to_parquet(tmp_path / "AAA.parquet", index=False)
+    with pytest.raises(RuntimeError, match="1 rows without a date"):
+        migrate_to_partitioned(ds)
+    assert len(pd.read_parquet(tmp_path / "AAA.parquet")) == 2 and not list(tmp_path.glob("year=*"))
+
+def test_partitioned_sink_flushes_mid_run(tmp_path):
+    from src.sinks import PartitionedSink
+    ds = Dataset("prices", "v_prices", tmp_path, ("symbol", "date"))
+    sink, flushed = PartitionedSink(ds, flush_rows=3), []
+    sink.on_flush = flushed.append
+    assert sink.write("AAA", _prices("AAA", ["2024-01-02", "2024-01-03"])) == 0
+    assert sink.write("BBB", _prices("BBB", ["2024-01-02"])) == 3  # threshold reached: on disk now
+    assert flushed == [["AAA", "BBB"]] and pq.read_metadata(partition_path(tmp_path, 2024)).num_rows == 3
+    sink.write("CCC", _prices("CCC", ["2024-01-02"]))
+    assert sink.close() == 1 and flushed[-1] == ["CCC"]
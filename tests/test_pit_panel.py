@@ -0,0 +1,81 @@
+# tests/test_pit_panel.py
+import pandas as pd
+import pytest
+from src import pit_panel
+from src.datasets import Dataset
+
+@pytest.fixture
+def dsets(tmp_path, monkeypatch):
+    out = {}
+    for name, keys in [("prices", ("symbol", "date")), ("pit_panel", ("symbol", "date")),
+                       ("income_statement", ("symbol", "date", "period")), ("ratios", ("symbol", "date", "period")),
+                       ("balance_sheet", ("symbol", "date", "period")), ("key_metrics", ("symbol", "date", "period"))]:
+        ds = Dataset(name, f"v_{name}", tmp_path / name, keys)
+        ds.dir.mkdir()
+        monkeypatch.setitem(pit_panel.DATASETS, name, ds)
+        out[name] = ds
+    return out
+
+def _income(ds, rows):
+    pd.DataFrame([{"symbol": "AAA", "date": pd.Timestamp(d), "period": "FY", "filingDate": pd.Timestamp(f), "revenue": r}
+                  for d, f, r in rows]).to_parquet(ds.dir / "AAA.parquet", index=False)
+
+def test_panel_uses_only_filed_data_and_updates_incrementally(dsets):
+    dates = pd.bdate_range("2024-01-01", "2024-03-29")
+    pd.DataFrame({"symbol": "AAA", "date": dates, "adjClose": 10.0}).to_parquet(dsets["prices"].dir / "AAA.parquet", index=False)
+    _income(dsets["income_statement"], [("2023-09-30", "2023-11-01", 1.0)])
+    pd.DataFrame([{"symbol": "AAA", "date": pd.Timestamp("2023-09-30"), "period": "FY", "priceToBookRatio": 3.0}]) \
+        .to_parquet(dsets["ratios"].dir / "AAA.parquet", index=False)
+
+    assert pit_panel.update_pit_panel()["rows_computed"] == len(dates)
+    # a filing for FY2023-12 on 2024-02-15 is usable from the next day
+    _income(dsets["income_statement"], [("2023-09-30", "2023-11-01", 1.0), ("2023-12-31", "2024-02-15", 2.0)])
+    res = pit_panel.update_pit_panel()
+    assert res["rows_computed"] == len(dates[dates >= "2024-02-16"])
+
+    panel = pd.read_parquet(dsets["pit_panel"].dir / "AAA.parquet").set_index("date")
+    assert panel.index.is_monotonic_increasing and len(panel) == len(dates)
+    assert panel.loc["2024-02-15", "revenue"] == 1.0 and panel.loc["2024-02-16", "revenue"] == 2.0
+    assert panel.loc["2024-02-16", "income_statement_filed"] == pd.Timestamp("2024-02-15")
+    # ratios borrow the income statement's filing date for the same period
+    assert panel.loc["2024-01-02", "priceToBookRatio"] == 3.0
+    assert panel["totalAssets"].isna().all()
+
+    assert pit_panel.update_pit_panel()["rows_computed"] == 0
+
+def _build(dsets, income_rows):
+    dates = pd.bdate_range("2024-01-01", "2024-03-29")
+    pd.DataFrame({"symbol": "AAA", "date": dates, "adjClose": 10.0}).to_parquet(dsets["prices"].dir / "AAA.parquet", index=False)
+    _income(dsets["income_statement"], income_rows)
+    pit_panel.update_pit_panel()
+    return dates
+
+def _panel(dsets):
+    return pd.read_parquet(dsets["pit_panel"].dir / "AAA.parquet").set_index("date")
+
+def test_backfilled_and_restated_filings_are_applied(dsets):
+    dates = _build(dsets, [("2023-12-31", "2024-02-15", 2.0)])
+    # an older filing that arrived late (entrant backfill, earlier fetch failure)
+    _income(dsets["income_statement"], [("2023-09-30", "2023-11-01", 1.0), ("2023-12-31", "2024-02-15", 2.0)])
+    assert pit_panel.update_pit_panel()["rows_computed"] == len(dates)
+    assert _panel(dsets).loc["2024-01-02", "revenue"] == 1.0
+    # restated under the same filing date
+    _income(dsets["income_statement"], [("2023-09-30", "2023-11-01", 1.0), ("2023-12-31", "2024-02-15", 2.5)])
+    assert pit_panel.update_pit_panel()["rows_computed"] == len(dates[dates >= "2024-02-16"])
+    assert _panel(dsets).loc["2024-02-16", "revenue"] == 2.5
+    assert pit_panel.update_pit_panel()["rows_computed"] == 0
+
+def test_missing_filing_state_recomputes_once(dsets):
+    dates = _build(dsets, [("2023-09-30", "2023-11-01", 1.0)])
+    pit_panel._seen_path().unlink()
+    assert pit_panel.update_pit_panel()["rows_computed"] == len(dates)
+    assert pit_panel.update_pit_panel()["rows_computed"] == 0
+
+def test_annual_report_wins_over_a_quarter_filed_the_same_day(dsets):
+    dates = pd.bdate_range("2024-01-01", "2024-03-29")
+    pd.DataFrame({"symbol": "AAA", "date": dates, "adjClose": 10.0}).to_parquet(dsets["prices"].dir / "AAA.parquet", index=False)
+    pd.DataFrame([{"symbol": "AAA", "date": pd.Timestamp("2023-12-31"), "period": p,
+                   "filingDate": pd.Timestamp("2024-02-15"), "revenue": r} for p, r in (("Q4", 1.0), ("FY", 4.0))]) \
+        .to_parquet(dsets["income_statement"].dir / "AAA.parquet", index=False)
+    pit_panel.update_pit_panel()
+    assert _panel(dsets).loc["2024-02-16", "revenue"] == 4.0
@@ -0,0 +1,58 @@
+# tests/test_price_drift.py
+import json
+from datetime import date, timedelta
+import pandas as pd
+import pytest
+from src import import_prices
+from src.datasets import Dataset
+from src.watermarks import WatermarkStore
+
+class FakeClient:
+    def __init__(self, bars):
+        self.bars, self.calls = bars, []
+    def historical_divadj_raw(self, symbol, start=None, end=None):
+        self.calls.append(start)
+        rows = [{"symbol": symbol, "date": d, "adjClose": c} for d, c in self.bars.items()
+                if start is None or d >= start.isoformat()]
+        return json.dumps(rows).encode()
+
+@pytest.fixture
+def stored(tmp_path, monkeypatch):
+    ds = Dataset("prices", "v_prices", tmp_path / "prices", ("symbol", "date"))
+    ds.dir.mkdir()
+    monkeypatch.setitem(import_prices.DATASETS, "prices", ds)
+    wm = date.today() - timedelta(days=7)
+    days = pd.bdate_range(wm - timedelta(days=30), wm)
+    pd.DataFrame({"symbol": "AAA", "date": days, "adjClose": 100.0}).to_parquet(ds.dir / "AAA.parquet", index=False)
+    marks = WatermarkStore("prices", ds.dir, state_dir=tmp_path)
+    return days, marks
+
+def _bars(days, close):
+    return {d.date().isoformat(): close for d in days}
+
+def test_unchanged_adjustment_appends_only_new_rows(stored):
+    days, marks = stored
+    new_days = pd.bdate_range(days[-1] + timedelta(days=1), date.today())
+    client = FakeClient(_bars(days, 100.0) | _bars(new_days, 101.0))
+    rows = json.loads(import_prices._fetch_window(client, marks, import_prices._stored_overlap(marks, ["AAA"]), "AAA"))
+    assert [r["date"] for r in rows] == [d.date().isoformat() for d in new_days]
+    assert len(client.calls) == 1 and client.calls[0] < days[-1].date()  # window overlaps stored days
+
+def test_changed_adjustment_refetches_full_history(stored):
+    days, marks = stored
+    new_days = pd.bdate_range(days[-1] + timedelta(days=1), date.today())
+    client = FakeClient(_bars(days, 99.5) | _bars(new_days, 101.0))  # a dividend rescaled the past
+    rows = json.loads(import_prices._fetch_window(client, marks, import_prices._stored_overlap(marks, ["AAA"]), "AAA"))
+    assert client.calls[1] is None and len(rows) == len(days) + len(new_days)
+
+def test_overlap_read_for_all_symbols_at_once(stored):
+    days, marks = stored
+    ds = import_prices.DATASETS["prices"]
+    pd.DataFrame({"symbol": "BBB", "date": days, "adjClose": 50.0}).to_parquet(ds.dir / "BBB.parquet", index=False)
+    marks.update("AAA", days[-1].date())
+    marks.update("BBB", days[-1].date())
+    overlap = import_prices._stored_overlap(marks, ["AAA", "BBB", "CCC"])  # CCC: no watermark, full history
+    assert sorted(overlap) == ["AAA", "BBB"]
+    assert set(overlap["BBB"].values()) == {50.0}
+    assert max(overlap["AAA"]) == days[-1].date().isoformat()
+    assert min(overlap["AAA"]) >= (days[-1] - timedelta(days=import_prices.config.PRICE_OVERLAP_DAYS)).date().isoformat()
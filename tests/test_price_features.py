@@ -0,0 +1,51 @@
+# tests/test_price_features.py
+import numpy as np
+import pandas as pd
+import pytest
+from src import price_features
+from src.datasets import Dataset
+
+@pytest.fixture
+def dirs(tmp_path, monkeypatch):
+    prices = Dataset("prices", "v_prices", tmp_path / "prices", ("symbol", "date"))
+    feats = Dataset("price_features", "v_price_features", tmp_path / "feats", ("symbol", "date"))
+    for ds in (prices, feats):
+        ds.dir.mkdir()
+        monkeypatch.setitem(price_features.DATASETS, ds.name, ds)
+    return prices, feats
+
+def _write_prices(ds, symbol, dates, closes):
+    pd.DataFrame({"symbol": symbol, "date": dates, "adjClose": closes}).to_parquet(ds.dir / f"{symbol}.parquet", index=False)
+
+def test_tail_recompute_matches_full_rebuild(dirs):
+    prices, feats = dirs
+    dates = pd.bdate_range("2022-01-03", periods=320)
+    closes = 100 + np.cumsum(np.sin(np.arange(320) / 7.0))
+    _write_prices(prices, "AAA", dates[:300], closes[:300])
+    assert price_features.update_price_features(None)["rows_computed"] == 300
+
+    _write_prices(prices, "AAA", dates, closes)
+    res = price_features.update_price_features({"AAA": dates[300].date()})
+    assert res["rows_computed"] == 20 and res["rows_added"] == 20
+    incremental = pd.read_parquet(feats.dir / "AAA.parquet")
+
+    (feats.dir / "AAA.parquet").unlink()
+    price_features.update_price_features(None)
+    full = pd.read_parquet(feats.dir / "AAA.parquet")
+    pd.testing.assert_frame_equal(incremental, full)
+
+    row = full.iloc[-1]
+    assert row["sma_20"] == pytest.approx(closes[-20:].mean())
+    assert row["peak"] == pytest.approx(closes.max())
+    assert row["drawdown"] == pytest.approx(closes[-1] / closes.max() - 1)
+    assert full["sma_200"].isna().sum() == 199 and full["ret_1d"].isna().sum() == 1
+
+def test_non_positive_bar_does_not_abort_the_batch(dirs):
+    prices, feats = dirs
+    dates = pd.bdate_range("2024-01-01", periods=5)
+    _write_prices(prices, "AAA", dates, [10.0, 0.0, 11.0, -1.0, 12.0])
+    _write_prices(prices, "BBB", dates, [5.0, 6.0, 7.0, 8.0, 9.0])
+    assert price_features.update_price_features(None)["rows_computed"] == 10
+    aaa = pd.read_parquet(feats.dir / "AAA.parquet")
+    assert aaa["log_ret_1d"].isna().tolist() == [True] * 5
+    assert pd.read_parquet(feats.dir / "BBB.parquet")["log_ret_1d"].notna().sum() == 4
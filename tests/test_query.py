@@ -0,0 +1,68 @@
+# tests/test_query.py
+import multiprocessing
+import pandas as pd
+import pytest
+from src import config, query, storage, versions
+from src.datasets import Dataset
+
+@pytest.fixture
+def prices(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "STATE_DIR", tmp_path)
+    monkeypatch.setattr(config, "PARQUET_CONSTITUENTS", tmp_path / "missing.parquet")
+    ds = Dataset("prices", "v_prices", tmp_path / "prices", ("symbol", "date"))
+    ds.dir.mkdir()
+    monkeypatch.setattr(storage, "DATASETS", {"prices": ds})
+    monkeypatch.setitem(query.DATASETS, "prices", ds)
+    monkeypatch.setattr(query, "_con", None)
+    monkeypatch.setattr(query, "_con_versions", None)
+    query.clear_cache()
+    yield ds
+    query.clear_cache()
+
+def _write(ds, sym, closes):
+    pd.DataFrame({"symbol": sym, "date": pd.bdate_range("2024-01-01", periods=len(closes)), "adjClose": closes}) \
+        .to_parquet(ds.dir / f"{sym}.parquet", index=False)
+
+def test_results_are_cached_until_the_dataset_version_moves(prices):
+    _write(prices, "AAA", [1.0, 2.0, 3.0])
+    versions.bump("prices")
+    t1 = query.price_history(["AAA"], start="2024-01-02")
+    assert t1.column("adjClose").to_pylist() == [2.0, 3.0]
+    assert query.price_history(["AAA"], start="2024-01-02") is t1  # served from the cache
+
+    assert query.price_history(start="2024-01-01").num_rows == 3
+    _write(prices, "BBB", [5.0])
+    assert query.price_history(start="2024-01-01").num_rows == 3  # stale until the version moves
+    versions.bump("prices")
+    t2 = query.price_history(start="2024-01-01")
+    assert t2.column("symbol").to_pylist() == ["AAA", "AAA", "AAA", "BBB"]
+    assert query.exists("v_prices") and not query.exists("v_ratios")
+
+def test_cache_is_bounded(prices, monkeypatch):
+    _write(prices, "AAA", [1.0, 2.0, 3.0])
+    monkeypatch.setattr(config, "QUERY_CACHE_SIZE", 2)
+    for n in range(4):
+        query.sql(f"SELECT {n} AS n FROM v_prices")
+    assert len(query._cache) == 2
+    assert query.sql("SELECT 1 AS x", cache=False).num_rows == 1 and len(query._cache) == 2
+
+def _bump_many(name):
+    for _ in range(50):
+        versions.bump(name)
+
+def test_bumps_from_concurrent_processes_are_all_kept(prices):
+    ctx = multiprocessing.get_context("fork")  # children inherit the patched STATE_DIR
+    procs = [ctx.Process(target=_bump_many, args=(name,)) for name in ("prices", "ratios", "income")]
+    for p in procs:
+        p.start()
+    for p in procs:
+        p.join()
+    assert set(versions.snapshot()) == {"prices", "ratios", "income"}
+
+def test_queries_naming_no_dataset_are_not_cached(prices):
+    _write(prices, "AAA", [1.0])
+    src = f"read_parquet('{(prices.dir / '*.parquet').as_posix()}')"
+    assert query.sql(f"SELECT COUNT(*) AS n FROM {src}").column("n")[0].as_py() == 1
+    _write(prices, "BBB", [1.0])
+    assert query.sql(f"SELECT COUNT(*) AS n FROM {src}").column("n")[0].as_py() == 2
+    assert not query._cache
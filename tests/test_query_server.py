@@ -0,0 +1,75 @@
+# tests/test_query_server.py
+import os, subprocess, sys, threading
+import pandas as pd
+import pytest
+from src import config, query, storage, versions
+from src.datasets import Dataset
+from src.query_client import QueryClient, QueryError, available
+from src.query_server import QueryServer
+
+@pytest.fixture
+def server(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "STATE_DIR", tmp_path)
+    monkeypatch.setattr(config, "PARQUET_CONSTITUENTS", tmp_path / "missing.parquet")
+    ds = Dataset("prices", "v_prices", tmp_path / "prices", ("symbol", "date"))
+    ds.dir.mkdir()
+    pd.DataFrame({"symbol": "AAA", "date": pd.bdate_range("2024-01-01", periods=3), "adjClose": [1.0, 2.0, 3.0]}) \
+        .to_parquet(ds.dir / "AAA.parquet", index=False)
+    monkeypatch.setattr(storage, "DATASETS", {"prices": ds})
+    monkeypatch.setitem(query.DATASETS, "prices", ds)
+    monkeypatch.setattr(query, "_con", None)
+    monkeypatch.setattr(query, "_con_versions", None)
+    query.clear_cache()
+    versions.bump("prices")
+    srv = QueryServer(tmp_path / "q.sock")
+    t = threading.Thread(target=srv.serve_forever, daemon=True)
+    t.start()
+    yield srv
+    srv.shutdown()
+    srv.server_close()
+    query.clear_cache()
+
+def test_client_round_trip(server):
+    assert available(server.path)
+    with QueryClient(server.path) as c:
+        t = c.price_history(["AAA"], start="2024-01-02")
+        assert t.column("adjClose").to_pylist() == [2.0, 3.0]
+        assert c.sql("SELECT COUNT(*) AS n FROM v_prices WHERE adjClose > ?", [1.5])["n"][0].as_py() == 2
+        assert c.exists("v_prices") and not c.exists("v_ratios")
+        with pytest.raises(QueryError):
+            c.sql("COPY (SELECT 1) TO 'x.csv'")  # read-only
+        with pytest.raises(QueryError):
+            c.sql("SELECT * FROM no_such_view")
+        out = server.path.parent / "pwn.csv"
+        with pytest.raises(QueryError):  # helper columns cannot smuggle statements in either
+            c.price_history(columns=[f"* FROM v_prices; COPY (SELECT 42) TO '{out}'; SELECT *"])
+        assert not out.exists()
+        assert c.price_history(["AAA"], columns=["adjClose"]).column_names == ["adjClose"]
+        assert c.sql("SELECT 1 AS one")["one"][0].as_py() == 1  # connection still usable after errors
+
+def test_stale_socket_is_replaced(server, tmp_path):
+    stale = tmp_path / "stale.sock"
+    import socket
+    s = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    s.bind(str(stale))
+    s.close()  # bound but nobody listening, as after a crash
+    srv = QueryServer(stale)
+    srv.server_close()
+    assert not stale.exists()
+    with pytest.raises(RuntimeError):
+        QueryServer(server.path)
+
+def test_config_imports_without_api_key(tmp_path):
+    # a fresh interpreter: reloading config here would reset every setting for later tests
+    code = """
+from src import config, query_client
+from src.prices_client import PricesClient
+try:
+    PricesClient()
+except RuntimeError as e:
+    print(e)
+"""
+    env = {**os.environ, "API_KEY": "", "DATA_DIR": str(tmp_path), "DB_DIR": str(tmp_path)}  # "" beats any .env
+    out = subprocess.run([sys.executable, "-c", code], cwd=config.ROOT, env=env, capture_output=True, text=True,
+                         check=True)
+    assert "Missing API_KEY" in out.stdout
@@ -0,0 +1,34 @@
+# tests/test_rate_limit.py
+import pytest
+from src.fmp_http import retry_after_seconds
+from src.rate_limit import TokenBucketLimiter
+
+def test_reservations_are_spread_after_burst():
+    lim = TokenBucketLimiter(600, burst=2)  # one token every 0.1s
+    waits = [lim.reserve() for _ in range(5)]
+    assert waits[0] == 0 and waits[1] == 0
+    assert waits[2] == pytest.approx(0.1, abs=0.02)
+    assert waits[4] == pytest.approx(0.3, abs=0.02)
+
+def test_penalize_halves_rate_and_pauses():
+    lim = TokenBucketLimiter(600, burst=1)
+    lim.penalize(retry_after=2.0)
+    assert lim.rpm == 300
+    assert lim.reserve() == pytest.approx(2.0, abs=0.05)
+    lim.penalize()  # within a second of the last one: counted once
+    assert lim.rpm == 300
+    for _ in range(200):
+        lim.reward()
+    assert lim.rpm == 600
+
+def test_state_file_is_shared(tmp_path):
+    state = tmp_path / "rate.bin"
+    a = TokenBucketLimiter(600, burst=1, state_file=state)
+    b = TokenBucketLimiter(600, burst=1, state_file=state)
+    assert a.reserve() == 0
+    assert b.reserve() == pytest.approx(0.1, abs=0.02)
+
+def test_retry_after_parsing():
+    assert retry_after_seconds("3") == 3.0
+    assert retry_after_seconds(None) is None
+    assert retry_after_seconds("garbage") is None
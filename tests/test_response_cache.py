@@ -0,0 +1,57 @@
+# tests/test_response_cache.py
+import json
+import sqlite3
+import pytest
+import pandas as pd
+from src import import_fundamentals
+from src.datasets import Dataset
+from src.import_fundamentals import fundamentals_task, replay_task
+from src.response_cache import ResponseCache
+from src.scheduler import run_tasks
+
+class FakeClient:
+    def __init__(self):
+        self.calls = 0
+    def get_symbol_raw(self, url, symbol):
+        self.calls += 1
+        return json.dumps([{"symbol": symbol, "date": "2024-09-28", "period": "FY", "revenue": 1.0}]).encode()
+
+def test_unchanged_payloads_skip_the_write_path(tmp_path, monkeypatch):
+    ds = Dataset("income_statement", "v_income_statement", tmp_path / "is", ("symbol", "date", "period"))
+    ds.dir.mkdir()
+    monkeypatch.setitem(import_fundamentals.DATASETS, ds.name, ds)
+    cache = ResponseCache(tmp_path / "responses.sqlite", keep_payloads=True)
+    client = FakeClient()
+
+    def run():
+        task = fundamentals_task(ds.name, symbols=["AAA", "BBB"], client=client, cache=cache)
+        return run_tasks([task], max_workers=2)[ds.name]
+
+    assert run()["symbols_done"] == 2
+    mtime = (ds.dir / "AAA.parquet").stat().st_mtime_ns
+    assert run()["symbols_done"] == 0  # fetched, but nothing decoded or written
+    assert client.calls == 4 and (ds.dir / "AAA.parquet").stat().st_mtime_ns == mtime
+
+    (ds.dir / "BBB.parquet").unlink()
+    assert run()["symbols_done"] == 1  # missing file is restored despite the identical payload
+
+    for p in ds.dir.glob("*.parquet"):
+        p.unlink()
+    totals = run_tasks([replay_task(ds.name, cache)], max_workers=2)[ds.name]
+    assert totals["symbols_done"] == 2 and client.calls == 6
+    assert pd.read_parquet(ds.dir / "AAA.parquet")["revenue"].tolist() == [1.0]
+
+def test_a_cache_opened_by_the_task_is_closed_with_it(tmp_path, monkeypatch):
+    from src import config
+    ds = Dataset("income_statement", "v_income_statement", tmp_path / "is", ("symbol", "date", "period"))
+    ds.dir.mkdir()
+    monkeypatch.setitem(import_fundamentals.DATASETS, ds.name, ds)
+    monkeypatch.setattr(config, "RESPONSE_CACHE", True)
+    monkeypatch.setattr(config, "RESPONSE_CACHE_FILE", tmp_path / "responses.sqlite")
+    opened = []
+    monkeypatch.setattr(import_fundamentals, "ResponseCache", lambda: opened.append(ResponseCache()) or opened[-1])
+    run_tasks([fundamentals_task(ds.name, symbols=["AAA"], client=FakeClient())], max_workers=1)
+    assert len(opened) == 1
+    with pytest.raises(sqlite3.ProgrammingError):  # closed by on_close, after the hashes were committed
+        opened[0].hashes(ds.name)
+    assert ResponseCache(tmp_path / "responses.sqlite").hashes(ds.name).keys() == {"AAA"}
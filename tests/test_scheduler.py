@@ -0,0 +1,62 @@
+# tests/test_scheduler.py
+import pandas as pd
+from src.scheduler import DatasetTask, run_tasks
+
+class ListSink:
+    def __init__(self):
+        self.rows = []
+    def write(self, symbol, df):
+        self.rows.append(symbol)
+        return len(df)
+    def close(self):
+        return 0
+
+def test_jobs_run_in_priority_order_with_per_dataset_totals():
+    fetched = []
+    def fetch(tag):
+        def _f(sym):
+            fetched.append((tag, sym))
+            if sym == "BAD":
+                raise RuntimeError("boom")
+            return [{"v": 1}] * (2 if sym == "AAA" else 1)
+        return _f
+    decode = lambda sym, data: pd.DataFrame(data)
+    low = DatasetTask("ratios", ["AAA", "BAD"], fetch("ratios"), decode, ListSink(), priority=1)
+    high = DatasetTask("prices", ["AAA", "BBB", "EMPTY"], fetch("prices"), lambda s, d: pd.DataFrame() if s == "EMPTY" else decode(s, d), ListSink(), priority=0)
+
+    totals = run_tasks([low, high], max_workers=1)
+
+    assert [t for t, _ in fetched] == ["prices"] * 3 + ["ratios"] * 2
+    assert totals["prices"] == {"dataset": "prices", "symbols_done": 2, "rows_added": 3, "files_touched": 2}
+    assert totals["ratios"]["symbols_done"] == 1 and totals["ratios"]["rows_added"] == 2
+
+def test_process_pool_decode_and_small_queues(monkeypatch):
+    from src import config
+    from functools import partial
+    from src.schemas import decode_frame
+    monkeypatch.setattr(config, "DECODE_PROCESSES", True)
+    monkeypatch.setattr(config, "PIPELINE_QUEUE_SIZE", 1)
+    rows = [{"date": "2024-01-02", "adjOpen": 1, "adjHigh": 1, "adjLow": 1, "adjClose": 1, "volume": 10}]
+    sink = ListSink()
+    symbols = [f"S{i}" for i in range(20)]
+    task = DatasetTask("prices", symbols, lambda sym: rows, partial(decode_frame, "prices"), sink)
+
+    totals = run_tasks([task], max_workers=4, engine="threads")
+
+    assert totals["prices"]["symbols_done"] == 20 and totals["prices"]["rows_added"] == 20
+    assert sorted(sink.rows) == sorted(symbols)
+
+def test_failures_outside_fetch_fail_the_run_instead_of_hanging(monkeypatch):
+    import pytest
+    from src import config
+    monkeypatch.setattr(config, "PIPELINE_QUEUE_SIZE", 1)
+    symbols = [f"S{i}" for i in range(20)]
+    fetch = lambda sym: [{"v": 1}]
+    odd = DatasetTask("ratios", ["AAA", "NONE"], fetch, lambda s, d: None if s == "NONE" else pd.DataFrame(d), ListSink())
+    assert run_tasks([odd], max_workers=2)["ratios"]["symbols_done"] == 1  # decode returned no frame: job error
+
+    def on_written(sym, df):
+        raise OSError("journal fsync failed")
+    task = DatasetTask("prices", symbols, fetch, lambda s, d: pd.DataFrame(d), ListSink(), on_written=on_written)
+    with pytest.raises(OSError):
+        run_tasks([task], max_workers=4)
@@ -0,0 +1,40 @@
+# tests/test_schemas.py
+import json
+import pyarrow.parquet as pq
+from src.merge_parquet import upsert_parquet
+from src.schemas import SCHEMAS, decode_frame, decode_table
+
+def test_prices_bytes_to_fixed_schema():
+    payload = json.dumps([
+        {"symbol": "AAA", "date": "2024-01-03", "adjOpen": 1, "adjHigh": 2.5, "adjLow": 1, "adjClose": 2, "volume": 100, "vwap": 9},
+        {"date": None, "adjClose": 3.0},
+    ]).encode()
+    t = decode_table("prices", "AAA", payload)
+    assert t.schema == SCHEMAS["prices"]
+    assert t.num_rows == 1  # rows without a date are dropped
+    assert t["adjOpen"].to_pylist() == [1.0]
+
+def test_fundamentals_odd_values_are_coerced():
+    payload = json.dumps([{"date": "2024-06-30", "symbol": "AAA", "period": "FY", "fiscalYear": "2024",
+                           "cik": 12345, "filingDate": "not a date", "acceptedDate": "2024-08-01 16:05:00",
+                           "revenue": 10, "eps": "1.5"}]).encode()
+    t = decode_table("income_statement", "AAA", payload)
+    row = t.to_pylist()[0]
+    assert row["fiscalYear"] == 2024 and row["cik"] == "12345"
+    assert row["filingDate"] is None and row["eps"] == 1.5 and row["revenue"] == 10.0
+
+def test_segments_flattened_and_empty_payloads():
+    payload = b'[{"symbol":"AAA","period":"FY","fiscalYear":2024,"date":"2024-09-28","data":{"Phone":5,"Mac":2}}]'
+    df = decode_frame("revenue_segments", "AAA", payload)
+    assert sorted(df["segment"]) == ["Mac", "Phone"]
+    assert decode_frame("ratios", "AAA", b"").empty
+    assert decode_frame("ratios", "AAA", b"[]").empty
+
+def test_files_keep_the_schema_across_writes(tmp_path):
+    path = (tmp_path / "AAA.parquet").as_posix()
+    ints = b'[{"date":"2023-12-31","symbol":"AAA","period":"FY","revenue":10}]'
+    floats = b'[{"date":"2024-12-31","symbol":"AAA","period":"FY","revenue":10.5}]'
+    for payload in (ints, floats):
+        upsert_parquet(decode_frame("income_statement", "AAA", payload), path, ["symbol", "date", "period"],
+                       SCHEMAS["income_statement"])
+    assert pq.read_schema(path).remove_metadata() == SCHEMAS["income_statement"]
@@ -0,0 +1,31 @@
+# tests/test_watermarks.py
+from datetime import date
+import pandas as pd
+from src.watermarks import WatermarkStore
+
+def _write_prices(dir_path, symbol, dates):
+    df = pd.DataFrame({"symbol": symbol, "date": pd.to_datetime(dates), "adjClose": 1.0})
+    df.to_parquet(dir_path / f"{symbol}.parquet", index=False)
+
+def test_seeded_from_parquet_and_roundtrip(tmp_path):
+    data_dir, state_dir = tmp_path / "prices", tmp_path / "state"
+    data_dir.mkdir(); state_dir.mkdir()
+    _write_prices(data_dir, "AAA", ["2024-01-02", "2024-01-05"])
+    _write_prices(data_dir, "BBB", ["2024-01-03"])
+
+    marks = WatermarkStore("prices", data_dir, state_dir=state_dir)
+    assert marks.get("AAA") == date(2024, 1, 5)
+    assert marks.get("BBB") == date(2024, 1, 3)
+    assert marks.get("CCC") is None
+
+    marks.update("AAA", date(2024, 1, 8))
+    marks.update("BBB", date(2023, 12, 29))  # never moves backwards
+    marks.save()
+
+    reloaded = WatermarkStore("prices", data_dir, state_dir=state_dir)
+    assert reloaded.get("AAA") == date(2024, 1, 8)
+    assert reloaded.get("BBB") == date(2024, 1, 3)
+
+def test_empty_dir_has_no_marks(tmp_path):
+    marks = WatermarkStore("prices", tmp_path, state_dir=tmp_path)
+    assert marks.marks == {}
@@ -0,0 +1,39 @@
+# tests/test_writer_profiles.py
+import pandas as pd
+import pyarrow.parquet as pq
+from src import writer_profiles
+from src.datasets import Dataset
+from src.merge_parquet import rewrite_dir, write_parquet
+
+def _prices(tmp_path, monkeypatch):
+    ds = Dataset("prices", "v_prices", tmp_path / "prices", ("symbol", "date"))
+    ds.dir.mkdir()
+    monkeypatch.setitem(writer_profiles.DATASETS, "prices", ds)
+    return ds
+
+def _frame(symbols):
+    days = pd.bdate_range("2024-01-01", periods=20)[::-1]  # newest first, like the API
+    return pd.DataFrame([{"symbol": s, "date": d, "adjClose": float(i)} for s in symbols for i, d in enumerate(days)])
+
+def test_rewrite_applies_the_profile_once(tmp_path, monkeypatch):
+    ds = _prices(tmp_path, monkeypatch)
+    _frame(["AAA"]).to_parquet(ds.dir / "AAA.parquet", index=False, compression="snappy")
+
+    res = rewrite_dir(ds.dir)
+    assert res["files"] == 1 and res["rewritten"] == 1
+    md = pq.read_metadata(ds.dir / "AAA.parquet")
+    col = md.row_group(0).column(md.schema.names.index("symbol"))
+    assert col.compression == "ZSTD" and "RLE_DICTIONARY" in col.encodings and col.statistics.has_min_max
+    assert [md.schema.column(s.column_index).name for s in md.row_group(0).sorting_columns] == ["date"]
+    assert pd.read_parquet(ds.dir / "AAA.parquet")["date"].is_monotonic_increasing
+    assert rewrite_dir(ds.dir)["rewritten"] == 0  # already matches
+
+def test_partitions_sort_by_date_then_symbol(tmp_path, monkeypatch):
+    ds = _prices(tmp_path, monkeypatch)
+    path = ds.dir / "year=2024" / "data.parquet"
+    path.parent.mkdir()
+    write_parquet(_frame(["BBB", "AAA"]), path)
+    md = pq.read_metadata(path)
+    assert [md.schema.column(s.column_index).name for s in md.row_group(0).sorting_columns] == ["date", "symbol"]
+    df = pq.ParquetFile(path).read().to_pandas()
+    assert list(df["symbol"][:2]) == ["AAA", "BBB"] and df["date"].is_monotonic_increasing